@@ -0,0 +1,237 @@
+import re
+import time
+import asyncio
+import hashlib
+import threading
+from typing import Optional
+
+from app.config import settings
+from app.agents.llm_cache import cached_ainvoke
+from app.agents.prompting import build_prompt
+
+# ==========================================
+# 🔑 FAILURE SIGNATURE
+# ==========================================
+def _dtc_list(telematics: dict) -> list:
+    codes = telematics.get("active_dtc_codes") or telematics.get("dtc_readable") or []
+    if isinstance(codes, str):
+        codes = re.findall(r"[PBCU][0-9A-F]{4}", codes.upper())
+    return sorted({str(c).upper() for c in codes})
+
+
+# Rule-engine issue text -> failing subsystem. Readings and trend wording
+# ("Critical Overheating (121°C)", "Rising Engine Temperature") don't split groups.
+FAILURE_CLASSES = [
+    ("overheat", "cooling"),
+    ("temperature", "cooling"),
+    ("oil", "lubrication"),
+    ("battery", "electrical"),
+    ("voltage", "electrical"),
+    ("rpm", "drivetrain"),
+]
+
+
+def failure_signature(state: dict) -> dict:
+    """
+    What makes two failures "the same" for engineering purposes:
+    the vehicle model, the DTCs and the affected subsystems.
+    """
+    issues = state.get("detected_issues") or []
+    if isinstance(issues, str):
+        issues = [issues]
+    systems = {cls for issue in issues for keyword, cls in FAILURE_CLASSES if keyword in str(issue).lower()}
+    return {
+        "model": (state.get("vehicle_metadata") or {}).get("model", "Unknown Model"),
+        "dtcs": _dtc_list(state.get("telematics_data") or {}),
+        "systems": sorted(systems),
+    }
+
+
+def group_id_for(signature: dict) -> str:
+    raw = f"{signature['model']}|{','.join(signature['dtcs'])}|{','.join(signature['systems'])}"
+    return "CAPA-" + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:8].upper()
+
+# ==========================================
+# 🗂️ GROUP REGISTRY
+# ==========================================
+class CapaGroups:
+    """
+    Recent critical diagnoses grouped by failure signature. Runs register
+    here instead of calling the LLM; run_batch() writes one CAPA report per
+    group that needs one. A group is (re)generated when it has no report yet
+    or has doubled in size since its report was written.
+    """
+
+    def __init__(self, window_s: int, samples_per_group: int = 3):
+        self.window_s = window_s
+        self.samples_per_group = samples_per_group
+        self._groups = {}  # group_id -> group dict
+        self._lock = threading.Lock()
+        self.llm_calls = 0
+        self.batches = 0
+
+    def register(self, state: dict) -> dict:
+        """Adds one vehicle's diagnosis to its group and returns a copy of the group."""
+        signature = failure_signature(state)
+        gid = group_id_for(signature)
+        now = time.time()
+        with self._lock:
+            group = self._groups.get(gid)
+            if group is None:
+                group = self._groups[gid] = {
+                    "group_id": gid,
+                    **signature,
+                    "vehicles": {},        # vehicle_id -> last seen
+                    "samples": [],         # recent diagnosis reports (prompt material)
+                    "report": None,
+                    "report_vehicle_count": 0,
+                    "generated_at": None,
+                    "first_seen": now,
+                }
+            group["vehicles"][state.get("vehicle_id")] = now
+            diagnosis = state.get("diagnosis_report")
+            if diagnosis:
+                group["samples"] = (group["samples"] + [diagnosis])[-self.samples_per_group:]
+            group["last_seen"] = now
+            return self._public(group)
+
+    def _expire(self, now: float):
+        cutoff = now - self.window_s
+        for gid in list(self._groups):
+            group = self._groups[gid]
+            group["vehicles"] = {v: ts for v, ts in group["vehicles"].items() if ts >= cutoff}
+            if not group["vehicles"]:
+                del self._groups[gid]
+
+    @staticmethod
+    def needs_report(group: dict) -> bool:
+        return group["report"] is None or len(group["vehicles"]) >= 2 * max(group["report_vehicle_count"], 1)
+
+    def _public(self, group: dict) -> dict:
+        return {
+            "group_id": group["group_id"],
+            "model": group["model"],
+            "dtcs": group["dtcs"],
+            "systems": group["systems"],
+            "vehicle_count": len(group["vehicles"]),
+            "vehicles": sorted(group["vehicles"]),
+            "report": group["report"],
+            "report_vehicle_count": group["report_vehicle_count"],
+            "generated_at": group["generated_at"],
+            "pending": self.needs_report(group),
+        }
+
+    def get(self, group_id: str) -> Optional[dict]:
+        with self._lock:
+            group = self._groups.get(group_id)
+            return self._public(group) if group else None
+
+    def list(self) -> list:
+        with self._lock:
+            self._expire(time.time())
+            groups = [self._public(g) for g in self._groups.values()]
+        return sorted(groups, key=lambda g: g["vehicle_count"], reverse=True)
+
+    async def run_batch(self, group_ids=None) -> dict:
+        """One LLM call per group needing a report. Returns a summary of the batch."""
+        with self._lock:
+            self._expire(time.time())
+            todo = [dict(g, vehicles=dict(g["vehicles"]), samples=list(g["samples"]))
+                    for gid, g in self._groups.items()
+                    if self.needs_report(g) and (group_ids is None or gid in group_ids)]
+
+        generated, failed = [], []
+        results = await asyncio.gather(*(self._generate(g) for g in todo), return_exceptions=True)
+        for group, result in zip(todo, results):
+            if isinstance(result, Exception):
+                print(f"❌ [CAPA Batch] {group['group_id']} failed: {result}")
+                failed.append(group["group_id"])
+                continue
+            with self._lock:
+                live = self._groups.get(group["group_id"])
+                if live is not None:
+                    live["report"] = result
+                    live["report_vehicle_count"] = len(group["vehicles"])
+                    live["generated_at"] = time.time()
+            generated.append(group["group_id"])
+
+        self.batches += 1
+        print(f"🏭 [CAPA Batch] {len(generated)} reports generated, {len(failed)} failed "
+              f"({len(self._groups)} active groups)")
+        return {"generated": generated, "failed": failed, "groups": len(self._groups)}
+
+    async def _generate(self, group: dict) -> str:
+        count = len(group["vehicles"])
+        dtcs = ", ".join(group["dtcs"]) or "none"
+        systems = ", ".join(group["systems"]) or "unspecified"
+
+        prompt, _ = build_prompt("manufacturing", lambda reports: f"""
+    You are a Senior Automotive Product Engineer.
+    The same failure mode has occurred in **{count} {group['model']}** vehicle(s) in the fleet.
+
+    Failure Signature:
+    - Fault Codes: {dtcs}
+    - Affected Systems: {systems}
+
+    Sample Diagnosis Reports:
+    {reports}
+
+    TASK: Propose ONE "Corrective and Preventive Action" (CAPA) plan covering all affected vehicles.
+
+    IMPORTANT: Format your response EXACTLY like this template. Use Markdown headers and bullets.
+
+    ### 🏭 Design Flaw Analysis
+    * **Vulnerability:** [What specific part of the design failed?]
+    * **Root Cause:** [Why did it fail? e.g., lack of redundancy, poor material]
+
+    ### 🔧 Engineering Fix (CAPA)
+    * **Hardware Upgrade:** [e.g., Replace plastic pump impellers with brass]
+    * **Sensor Logic:** [e.g., Add cross-validation between oil/temp sensors]
+    * **Fail-Safe Mechanism:** [e.g., Auto-shutdown if Temp > 120°C]
+
+    ### 🧪 Validation Plan
+    * **Testing:** [e.g., Run HIL simulation for 500 hours]
+    * **Expected Result:** [e.g., Reduce field failure rate by 80%]
+    """, [f"--- Sample {i + 1} ---\n{s}" for i, s in enumerate(group["samples"])])
+
+        self.llm_calls += 1
+        return await cached_ainvoke(prompt, "manufacturing", {
+            "group": group["group_id"],
+            "vehicle_count": count,
+        })
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = sum(1 for g in self._groups.values() if self.needs_report(g))
+            vehicles = sum(len(g["vehicles"]) for g in self._groups.values())
+            return {
+                "mode": settings.CAPA_MODE,
+                "groups": len(self._groups),
+                "pending_groups": pending,
+                "vehicles": vehicles,
+                "batches": self.batches,
+                "llm_calls": self.llm_calls,
+                "interval_s": settings.CAPA_BATCH_INTERVAL_S,
+            }
+
+
+CAPA_GROUPS = CapaGroups(window_s=settings.CAPA_WINDOW_S)
+
+
+def format_group_reference(group: dict) -> str:
+    """manufacturing_recommendations text for a run that belongs to `group`."""
+    header = (f"**Fleet CAPA group {group['group_id']}** · {group['model']} · "
+              f"{group['vehicle_count']} vehicle(s) with this failure signature")
+    if group["report"]:
+        return f"{header}\n\n{group['report']}"
+    return f"{header}\n\n⏳ Engineering report pending (generated by the next fleet CAPA batch)."
+
+
+async def capa_batch_loop(interval_s: float):
+    """Background task: runs a batch every `interval_s` seconds."""
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            await CAPA_GROUPS.run_batch()
+        except Exception as e:
+            print(f"❌ [CAPA Batch] Loop error: {e}")
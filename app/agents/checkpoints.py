@@ -0,0 +1,202 @@
+import json
+import time
+import sqlite3
+import threading
+import functools
+import inspect
+from contextvars import ContextVar
+from typing import Optional
+
+from app.config import settings
+
+RUNNING, COMPLETED, PARTIAL, FAILED = "running", "completed", "partial", "failed"
+
+# ==========================================
+# 💾 CHECKPOINT STORE (SQLite)
+# ==========================================
+class CheckpointStore:
+    """
+    Per-run record of the graph input and of every node's state update.
+    A node counts as done when it returned normally and didn't list itself
+    in `failed_nodes` (nodes do that when they fall back after an LLM/TTS
+    error). db_path="" keeps everything in memory.
+    """
+
+    def __init__(self, db_path: str = "", ttl_s: int = 86400):
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        try:
+            self._db = sqlite3.connect(db_path or ":memory:", check_same_thread=False)
+        except sqlite3.Error as e:
+            print(f"⚠️ [Checkpoints] {db_path} unavailable ({e}), using memory")
+            self._db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT PRIMARY KEY, vehicle_id TEXT, request TEXT, initial_state TEXT,"
+            " status TEXT, error TEXT, attempts INTEGER, created_at REAL, updated_at REAL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS node_updates ("
+            " run_id TEXT, node TEXT, ok INTEGER, update_json TEXT, error TEXT, finished_at REAL,"
+            " PRIMARY KEY (run_id, node))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_runs_status ON runs(status)")
+        self._db.commit()
+
+    def _write(self, sql: str, args: tuple):
+        with self._lock:
+            self._db.execute(sql, args)
+            self._db.commit()
+
+    def begin(self, run_id: str, request: dict, initial_state: dict):
+        now = time.time()
+        self._prune(now)
+        self._write(
+            "INSERT OR REPLACE INTO runs (run_id, vehicle_id, request, initial_state, status, error,"
+            " attempts, created_at, updated_at) VALUES (?, ?, ?, ?, ?, NULL, 1, ?, ?)",
+            (run_id, request.get("vehicle_id"), json.dumps(request, default=str),
+             json.dumps(initial_state, default=str), RUNNING, now, now)
+        )
+
+    def retry(self, run_id: str):
+        self._write("UPDATE runs SET status = ?, error = NULL, attempts = attempts + 1, updated_at = ?"
+                    " WHERE run_id = ?", (RUNNING, time.time(), run_id))
+
+    def save_node(self, run_id: str, node: str, update: Optional[dict], ok: bool, error: str = None):
+        self._write(
+            "INSERT OR REPLACE INTO node_updates (run_id, node, ok, update_json, error, finished_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (run_id, node, int(ok), json.dumps(update or {}, default=str), error, time.time())
+        )
+
+    def finish(self, run_id: str, status: str, error: str = None):
+        self._write("UPDATE runs SET status = ?, error = ?, updated_at = ? WHERE run_id = ?",
+                    (status, error, time.time(), run_id))
+
+    def completed_updates(self, run_id: str) -> dict:
+        """{node: update} for every node that finished successfully."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT node, update_json FROM node_updates WHERE run_id = ? AND ok = 1", (run_id,)
+            ).fetchall()
+        return {node: json.loads(update) for node, update in rows}
+
+    def get_run(self, run_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT run_id, vehicle_id, request, initial_state, status, error, attempts,"
+                " created_at, updated_at FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            nodes = self._db.execute(
+                "SELECT node, ok, error, finished_at FROM node_updates WHERE run_id = ?"
+                " ORDER BY finished_at", (run_id,)
+            ).fetchall()
+        run = dict(zip(["run_id", "vehicle_id", "request", "initial_state", "status", "error",
+                        "attempts", "created_at", "updated_at"], row))
+        run["request"] = json.loads(run["request"])
+        run["initial_state"] = json.loads(run["initial_state"])
+        run["nodes"] = [{"node": n, "ok": bool(ok), "error": err, "finished_at": ts}
+                        for n, ok, err, ts in nodes]
+        return run
+
+    def list_runs(self, status: str = None, limit: int = 50) -> list:
+        sql = "SELECT run_id, vehicle_id, status, error, attempts, updated_at FROM runs"
+        args = ()
+        if status:
+            sql += " WHERE status = ?"
+            args = (status,)
+        sql += " ORDER BY updated_at DESC LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(sql, args + (limit,)).fetchall()
+        return [dict(zip(["run_id", "vehicle_id", "status", "error", "attempts", "updated_at"], r))
+                for r in rows]
+
+    def _prune(self, now: float):
+        cutoff = now - self.ttl_s
+        with self._lock:
+            self._db.execute("DELETE FROM node_updates WHERE run_id IN"
+                             " (SELECT run_id FROM runs WHERE updated_at < ?)", (cutoff,))
+            self._db.execute("DELETE FROM runs WHERE updated_at < ?", (cutoff,))
+            self._db.commit()
+
+
+CHECKPOINTS = CheckpointStore(
+    db_path=settings.CHECKPOINT_PATH if settings.CHECKPOINTS_ENABLED else "",
+    ttl_s=settings.CHECKPOINT_TTL_S,
+)
+
+# ==========================================
+# ⏭️ NODE WRAPPER (save / replay)
+# ==========================================
+class RunCheckpoint:
+    """What the node wrapper needs for one run: its ID and the nodes it may replay."""
+
+    def __init__(self, run_id: str, completed: dict = None):
+        self.run_id = run_id
+        self.completed = completed or {}
+        self.rerun = set()  # nodes that must execute again because an ancestor did
+
+    def should_replay(self, node: str) -> bool:
+        return node in self.completed and node not in self.rerun
+
+
+_current_checkpoint: ContextVar[Optional[RunCheckpoint]] = ContextVar("current_checkpoint", default=None)
+
+
+def bind_checkpoint(run_id: str, completed: dict = None) -> RunCheckpoint:
+    ckpt = RunCheckpoint(run_id, completed)
+    _current_checkpoint.set(ckpt)
+    return ckpt
+
+
+def _record(ckpt: RunCheckpoint, name: str, update, descendants: dict):
+    # Anything downstream consumed the old output, so it has to run again too
+    ckpt.rerun.update(descendants.get(name, ()))
+    failed = name in ((update or {}).get("failed_nodes") or [])
+    CHECKPOINTS.save_node(ckpt.run_id, name, update, ok=not failed,
+                          error="node reported a fallback" if failed else None)
+
+
+def checkpointed_node(name: str, fn, descendants: dict):
+    """
+    Wraps a graph node (sync or async). On a resumed run, nodes that already
+    succeeded return their stored update instead of running again; otherwise
+    the node runs and its update is saved. `descendants` maps node -> every
+    node reachable from it (filled in by build_graph after wiring the edges).
+    """
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state):
+            ckpt = _current_checkpoint.get()
+            if ckpt is None:
+                return await fn(state)
+            if ckpt.should_replay(name):
+                print(f"⏭️ [Checkpoint] {name} already done for run {ckpt.run_id}, replaying")
+                return ckpt.completed[name]
+            try:
+                update = await fn(state)
+            except Exception as e:
+                CHECKPOINTS.save_node(ckpt.run_id, name, None, ok=False, error=str(e))
+                raise
+            _record(ckpt, name, update, descendants)
+            return update
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def sync_wrapper(state):
+        ckpt = _current_checkpoint.get()
+        if ckpt is None:
+            return fn(state)
+        if ckpt.should_replay(name):
+            print(f"⏭️ [Checkpoint] {name} already done for run {ckpt.run_id}, replaying")
+            return ckpt.completed[name]
+        try:
+            update = fn(state)
+        except Exception as e:
+            CHECKPOINTS.save_node(ckpt.run_id, name, None, ok=False, error=str(e))
+            raise
+        _record(ckpt, name, update, descendants)
+        return update
+    return sync_wrapper
@@ -0,0 +1,187 @@
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from langchain_core.messages import HumanMessage
+
+from app.config import settings
+from app.config.llm import get_llm
+from app.utils.tracing import span
+from app.agents.resilience import resilient_call
+
+# ==========================================
+# 🔑 KEY NORMALISATION
+# ==========================================
+def bucket(value, step: float):
+    """Snaps a reading to its bucket (e.g. 118°C -> 115 with step 5)."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(value // step * step)
+
+def normalize_text(text) -> str:
+    """Lower-case, collapse whitespace and drop raw numbers (they're bucketed separately)."""
+    text = re.sub(r"\d+(\.\d+)?", "#", str(text or "").lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+def fingerprint(node: str, model_name: str, fields: dict, backend: str = "groq") -> str:
+    # The backend is part of the key so fake (offline) answers never serve real runs
+    payload = json.dumps({"node": node, "backend": backend, "model": model_name, "fields": fields},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# ==========================================
+# 💾 TWO-TIER CACHE (LRU + SQLite)
+# ==========================================
+class LLMResponseCache:
+    """
+    Memory LRU in front of an optional SQLite table. Entries expire after
+    `ttl_s`; disk hits are promoted back into memory.
+    """
+
+    def __init__(self, max_entries: int, ttl_s: int, db_path: str = ""):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._memory = OrderedDict()  # key -> (node, value, created_at)
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        if db_path:
+            try:
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache ("
+                    " key TEXT PRIMARY KEY, node TEXT, value TEXT, created_at REAL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_node ON llm_cache(node)")
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ [LLM Cache] Disk tier disabled: {e}")
+                self._db = None
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[2] < self.ttl_s:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return entry[1]
+            if entry:
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT node, value, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[2] < self.ttl_s:
+                    self._remember(key, row[0], row[1], row[2])
+                    self.hits_disk += 1
+                    return row[1]
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, node: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, node, value, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, node, value, created_at) VALUES (?, ?, ?, ?)",
+                    (key, node, value, now)
+                )
+                self._db.commit()
+
+    def _remember(self, key, node, value, created_at):
+        self._memory[key] = (node, value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def invalidate(self, node: str = None, key: str = None) -> int:
+        """Drops one key, every entry for a node, or everything (no arguments)."""
+        with self._lock:
+            if key:
+                targets = [key] if key in self._memory else []
+            elif node:
+                targets = [k for k, v in self._memory.items() if v[0] == node]
+            else:
+                targets = list(self._memory)
+            for k in targets:
+                del self._memory[k]
+
+            removed = len(targets)
+            if self._db is not None:
+                if key:
+                    cur = self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                elif node:
+                    cur = self._db.execute("DELETE FROM llm_cache WHERE node = ?", (node,))
+                else:
+                    cur = self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+                removed = max(removed, cur.rowcount)
+            return removed
+
+    def stats(self) -> dict:
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        hits = self.hits_memory + self.hits_disk
+        disk_entries = None
+        if self._db is not None:
+            with self._lock:
+                disk_entries = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return {
+            "enabled": settings.LLM_CACHE_ENABLED,
+            "lookups": lookups,
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": disk_entries,
+        }
+
+
+LLM_CACHE = LLMResponseCache(
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl_s=settings.LLM_CACHE_TTL_S,
+    db_path=settings.LLM_CACHE_PATH,
+)
+
+# ==========================================
+# 🤖 CACHED LLM CALL
+# ==========================================
+async def cached_ainvoke(prompt: str, node: str, key_fields: dict, llm=None) -> str:
+    """
+    Returns the LLM's text for `prompt`, reusing a previous answer when the
+    node's semantic key (bucketed / normalised inputs) matches.
+    The client is only created on a miss and called under the node's
+    deadline / circuit breaker (app/agents/resilience.py). Errors are never
+    cached; they propagate to the node's own fallback.
+    """
+    if not settings.LLM_CACHE_ENABLED:
+        client = llm or get_llm()
+        with span("llm", node, cache="off"):
+            response = await resilient_call(node, lambda: client.ainvoke([HumanMessage(content=prompt)]))
+        return response.content
+
+    key = fingerprint(node, settings.LLM_MODEL, key_fields, settings.LLM_BACKEND)
+    cached = LLM_CACHE.get(key)
+    if cached is not None:
+        print(f"♻️ [LLM Cache] {node} hit")
+        return cached
+
+    client = llm or get_llm()
+    with span("llm", node, cache="miss"):
+        response = await resilient_call(node, lambda: client.ainvoke([HumanMessage(content=prompt)]))
+    LLM_CACHE.set(key, node, response.content)
+    return response.content
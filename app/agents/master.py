@@ -1,5 +1,9 @@
 from langgraph.graph import StateGraph, END, START
 from app.agents.state import AgentState
+from app.agents.nodes.templated_report import templated_report_node
+from app.config import settings
+from app.utils.tracing import traced_node
+from app.agents.checkpoints import checkpointed_node
 
 # --- IMPORT NODES (With Fallbacks) ---
 try:
@@ -15,57 +19,129 @@ except ImportError:
 try:
     from app.agents.nodes.customer_engagement import customer_node
 except ImportError:
-    def customer_node(state): return state
+    def customer_node(state): return {}
 
 try:
     from app.agents.nodes.scheduling import scheduling_node
 except ImportError:
-    def scheduling_node(state): return state
+    def scheduling_node(state): return {}
 
 try:
-    from app.agents.nodes.voice_interaction import voice_interaction_node
+    from app.agents.nodes.voice_agent import voice_interaction_node
 except ImportError:
-    def voice_interaction_node(state): return state
+    def voice_interaction_node(state): return {}
 
 try:
     from app.agents.nodes.feedback import feedback_node
 except ImportError:
-    def feedback_node(state): return state
+    def feedback_node(state): return {}
 
 try:
-    from app.agents.nodes.manufacturing import manufacturing_node
+    from app.agents.nodes.manufacturing_insights import manufacturing_node
 except ImportError:
-    def manufacturing_node(state): return state
+    def manufacturing_node(state): return {}
+
+# ==========================================
+# ROUTING
+# ==========================================
+def route_by_risk(state: AgentState) -> str:
+    """
+    Sends HIGH/CRITICAL vehicles through the full LLM chain and everything
+    else down the deterministic template path (thresholds in app/config/settings.py).
+    """
+    level = (state.get("risk_level") or "LOW").upper()
+    rank = settings.RISK_LEVELS.index(level) if level in settings.RISK_LEVELS else 0
+    min_rank = settings.RISK_LEVELS.index(settings.LLM_ROUTE_MIN_LEVEL)
+
+    if rank >= min_rank or state.get("risk_score", 0) >= settings.LLM_ROUTE_MIN_SCORE:
+        return "full"
+    return "template"
+
+def descendants_of(compiled) -> dict:
+    """node -> every node reachable from it in the compiled graph."""
+    children = {}
+    for edge in compiled.get_graph().edges:
+        children.setdefault(edge.source, set()).add(edge.target)
+
+    out = {}
+    for node in children:
+        seen, stack = set(), list(children[node])
+        while stack:
+            child = stack.pop()
+            if child not in seen:
+                seen.add(child)
+                stack.extend(children.get(child, ()))
+        out[node] = seen
+    return out
+
+def join_node(state: AgentState) -> dict:
+    """Barrier for the parallel branches. State is already merged by the reducers."""
+    print(f"🧩 [Master] All branches finished for {state.get('vehicle_id')}")
+    return {}
 
 # ==========================================
 # BUILD THE GRAPH
 # ==========================================
-def build_graph():
+def build_graph(parallel: bool = True):
+    """
+    parallel=False wires the old sequential chain (used by the benchmark
+    harness to measure what the fan-out buys).
+    """
     workflow = StateGraph(AgentState)
 
-    # Add Nodes
-    workflow.add_node("data_analysis", data_analysis_node)
-    workflow.add_node("diagnosis", diagnosis_node)
-    workflow.add_node("customer_engagement", customer_node)
-    workflow.add_node("voice_interaction", voice_interaction_node) # 🎙️ Added Voice
-    workflow.add_node("scheduling", scheduling_node)
-    workflow.add_node("feedback", feedback_node)
-    workflow.add_node("manufacturing", manufacturing_node)
+    # Add Nodes (each wrapped in a timing span, see app/utils/tracing.py, and
+    # checkpointed per run so a resume skips finished nodes, see app/agents/checkpoints.py)
+    nodes = {
+        "data_analysis": data_analysis_node,
+        "diagnosis": diagnosis_node,
+        "customer_engagement": customer_node,
+        "voice_interaction": voice_interaction_node, # 🎙️ Added Voice
+        "scheduling": scheduling_node,
+        "feedback": feedback_node,
+        "manufacturing": manufacturing_node,
+        "templated_report": templated_report_node, # ⚡ No-LLM fast path
+        "join": join_node,
+    }
+    descendants = {}  # filled once the edges are wired
+    for name, fn in nodes.items():
+        workflow.add_node(name, traced_node(name, checkpointed_node(name, fn, descendants)))
 
     # Define Edges (Logic Flow)
     workflow.add_edge(START, "data_analysis")
-    workflow.add_edge("data_analysis", "diagnosis")
+
+    # Risk Gate: only HIGH/CRITICAL results pay for LLM calls
+    workflow.add_conditional_edges(
+        "data_analysis",
+        route_by_risk,
+        {"full": "diagnosis", "template": "templated_report"}
+    )
+    workflow.add_edge("templated_report", END)
+
+    if not parallel:
+        for a, b in [("diagnosis", "customer_engagement"), ("customer_engagement", "voice_interaction"),
+                     ("voice_interaction", "scheduling"), ("scheduling", "feedback"),
+                     ("feedback", "manufacturing"), ("manufacturing", "join")]:
+            workflow.add_edge(a, b)
+        workflow.add_edge("join", END)
+        graph = workflow.compile()
+        descendants.update(descendants_of(graph))
+        return graph
+
+    # Fan-out 1: CAPA only needs the diagnosis, so it runs alongside messaging
     workflow.add_edge("diagnosis", "customer_engagement")
-    
-    # Parallel/Fork: Voice or Text? 
-    # For simplicity, we run Voice -> Scheduler
+    workflow.add_edge("diagnosis", "manufacturing")
+
+    # Fan-out 2: Voice call and booking both only need the customer decision
     workflow.add_edge("customer_engagement", "voice_interaction")
-    workflow.add_edge("voice_interaction", "scheduling")
-    
+    workflow.add_edge("customer_engagement", "scheduling")
     workflow.add_edge("scheduling", "feedback")
-    workflow.add_edge("feedback", "manufacturing")
-    workflow.add_edge("manufacturing", END)
 
-    return workflow.compile()
+    # Join: wait for every branch, so latency = longest branch, not the sum
+    workflow.add_edge(["voice_interaction", "feedback", "manufacturing"], "join")
+    workflow.add_edge("join", END)
+
+    graph = workflow.compile()
+    descendants.update(descendants_of(graph))
+    return graph
 
 master_agent = build_graph()
\ No newline at end of file
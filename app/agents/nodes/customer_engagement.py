@@ -1,27 +1,10 @@
-import os
-from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
 from app.agents.state import AgentState
+from app.agents.llm_cache import cached_ainvoke, normalize_text
+from app.agents.prompting import build_prompt
 
-# --- 1. LOAD ENVIRONMENT VARIABLES ---
-load_dotenv() 
-
-# --- 2. FETCH KEY FROM ENV ---
-groq_api_key = os.getenv("GROQ_API_KEY")
-
-if not groq_api_key:
-    print("❌ ERROR: GROQ_API_KEY is missing from .env file!")
-
-# --- 3. SETUP GROQ LLM ---
-llm = ChatOpenAI(
-    model="llama-3.3-70b-versatile",
-    base_url="https://api.groq.com/openai/v1",
-    api_key=groq_api_key
-)
-
-def customer_node(state: AgentState) -> AgentState:
+async def customer_node(state: AgentState) -> dict:
     print(f"🗣️ [Customer] Drafting notification for {state.get('vehicle_id')}...")
+    updates = {}
     
     # Get details from the graph state
     owner = state.get("vehicle_metadata", {}).get("owner", "Customer")
@@ -39,39 +22,45 @@ def customer_node(state: AgentState) -> AgentState:
         # Case 2: Normal - Ask for permission
         instruction = "Advise them to schedule a repair soon. Ask them to reply 'YES' to confirm a booking for tomorrow."
 
-    # Prompt the AI to write a message
-    prompt = f"""
+    # Prompt the AI to write a message (diagnosis trimmed line by line to the token budget)
+    prompt, prompt_stats = build_prompt("customer", lambda summary: f"""
     You are a Service Advisor at a Truck Dealership.
     Write a short, professional text message to {owner}.
     
     Topic: Their {model} needs attention.
-    Diagnosis Summary: {diagnosis}
+    Diagnosis Summary: {summary}
     Priority: {priority}
     
     Action Required: {instruction}
     
     Constraint: Keep it under 50 words. Be direct.
-    """
+    """, [line for line in diagnosis.split("\n") if line.strip()], ordered=True)
+    updates["prompt_stats"] = {"customer": prompt_stats}
 
     try:
-        # Call Groq
-        response = llm.invoke([HumanMessage(content=prompt)])
-        state["customer_script"] = response.content
+        # Call Groq (cached: same owner + model + diagnosis -> same message)
+        updates["customer_script"] = await cached_ainvoke(prompt, "customer", {
+            "owner": owner,
+            "model": model,
+            "priority": priority,
+            "diagnosis": normalize_text(diagnosis),
+        })
     except Exception as e:
         print(f"❌ Customer Agent LLM Error: {e}")
         # Fallback
-        state["customer_script"] = f"Urgent: Your {model} requires service. Please contact us."
+        updates["customer_script"] = f"Urgent: Your {model} requires service. Please contact us."
+        updates["failed_nodes"] = ["customer_engagement"] # retried when the run is resumed
 
     # ---------------------------------------------------------
     # 🎭 DEMO SIMULATION: USER DECISION
     # ---------------------------------------------------------
     if priority == "Critical":
         print(f"🚨 [Customer] Critical Alert Sent. System assuming Authorization.")
-        state["customer_decision"] = "AUTO_AUTHORIZED"
+        updates["customer_decision"] = "AUTO_AUTHORIZED"
     else:
         # For Demo purposes, we simulate the user saying "YES" (BOOKED).
         # In a real app, you would wait for an SMS reply here.
         print(f"📞 [Customer] Message sent. Simulating user reply: 'YES, please book.'")
-        state["customer_decision"] = "BOOKED" 
+        updates["customer_decision"] = "BOOKED" 
     
-    return state
\ No newline at end of file
+    return updates
\ No newline at end of file
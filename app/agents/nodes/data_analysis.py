@@ -1,62 +1,105 @@
+import asyncio
 from app.agents.state import AgentState
 from app.domain.risk_rules import calculate_risk_score
-from database import supabase # ✅ Direct DB Access
+from app.data.feature_store import FEATURE_STORE
+from app.config import settings
+from app.utils.tracing import span
 
-def data_analysis_node(state: AgentState) -> AgentState:
+if settings.DATA_BACKEND == "local":
+    # Offline mode: data_samples/collected_data.json (no Supabase credentials needed)
+    from app.data.repositories import TelematicsRepo, VehicleRepo
+else:
+    from database import supabase # ✅ Direct DB Access
+
+async def _fetch_from_supabase(v_id: str):
+    """Returns (vehicle_row | None, latest_telematics | None)."""
+    # 1. FETCH METADATA (Owners & Vehicle Info)
+    # We join with the 'owners' table to get contact info for the Customer Agent
+    # (supabase-py is synchronous, so queries run in a worker thread)
+    with span("db", "vehicles.select"):
+        vehicle_response = await asyncio.to_thread(
+            supabase.table("vehicles")
+            .select("*, owners(full_name, phone_number)")
+            .eq("id", v_id)
+            .execute
+        )
+    if not vehicle_response.data:
+        return None, None
+
+    vehicle_data = vehicle_response.data[0]
+
+    # Flatten Owner Data for easier access by Customer Agent
+    owner_info = vehicle_data.get("owners", {})
+    vehicle_data["owner"] = owner_info.get("full_name", "Valued Customer")
+    vehicle_data["phone"] = owner_info.get("phone_number", "")
+
+    # 2. FETCH TELEMATICS (Latest Sensor Data)
+    with span("db", "telematics_logs.latest"):
+        telematics_response = await asyncio.to_thread(
+            supabase.table("telematics_logs")
+            .select("*")
+            .eq("vehicle_id", v_id)
+            .order("timestamp_utc", desc=True)
+            .limit(1)
+            .execute
+        )
+    t_data = telematics_response.data[0] if telematics_response.data else None
+    return vehicle_data, t_data
+
+async def _fetch_from_local(v_id: str):
+    """Same contract as _fetch_from_supabase, backed by the local JSON repository."""
+    with span("db", "local.read"):
+        vehicle_data = VehicleRepo.get_vehicle_details(v_id)
+        if not vehicle_data:
+            return None, None
+        return vehicle_data, TelematicsRepo.get_latest_telematics(v_id)
+
+async def data_analysis_node(state: AgentState) -> dict:
     v_id = state["vehicle_id"]
-    print(f"🔍 [Analyzer] Querying Supabase for {v_id}...")
+    updates = {}
+    print(f"🔍 [Analyzer] Querying {settings.DATA_BACKEND} data for {v_id}...")
 
     try:
-        # 1. FETCH METADATA (Owners & Vehicle Info)
-        # We join with the 'owners' table to get contact info for the Customer Agent
-        vehicle_response = supabase.table("vehicles") \
-            .select("*, owners(full_name, phone_number)") \
-            .eq("id", v_id) \
-            .execute()
-
-        if not vehicle_response.data:
-            state["error_message"] = f"Vehicle {v_id} not found in DB."
-            return state
-
-        vehicle_data = vehicle_response.data[0]
-        
-        # Flatten Owner Data for easier access by Customer Agent
-        owner_info = vehicle_data.get("owners", {})
-        vehicle_data["owner"] = owner_info.get("full_name", "Valued Customer")
-        vehicle_data["phone"] = owner_info.get("phone_number", "")
-
-        state["vehicle_metadata"] = vehicle_data
-        state["vin"] = vehicle_data.get("vin") # Critical for logs
-
-        # 2. FETCH TELEMATICS (Latest Sensor Data)
-        telematics_response = supabase.table("telematics_logs") \
-            .select("*") \
-            .eq("vehicle_id", v_id) \
-            .order("timestamp_utc", desc=True) \
-            .limit(1) \
-            .execute()
-
-        if telematics_response.data:
-            t_data = telematics_response.data[0]
-            state["telematics_data"] = t_data
+        if settings.DATA_BACKEND == "local":
+            vehicle_data, t_data = await _fetch_from_local(v_id)
+        else:
+            vehicle_data, t_data = await _fetch_from_supabase(v_id)
+
+        if not vehicle_data:
+            updates["error_message"] = f"Vehicle {v_id} not found in DB."
+            return updates
+
+        updates["vehicle_metadata"] = vehicle_data
+        updates["vin"] = vehicle_data.get("vin") # Critical for logs
+
+        if t_data:
+            updates["telematics_data"] = t_data
+
+            # Rolling-window context (one dict lookup, no history query).
+            # Re-ingesting the latest row is a no-op if we've already seen it.
+            FEATURE_STORE.ingest(v_id, t_data)
+            features = FEATURE_STORE.get(v_id)
+            updates["rolling_features"] = features
             
             # 3. CALCULATE RISK (Using Live DB Data)
             # Pass the Dict directly to your logic rule engine
-            risk_assessment = calculate_risk_score(t_data)
+            risk_assessment = calculate_risk_score(t_data, features)
             
-            state["risk_score"] = risk_assessment["score"]
-            state["risk_level"] = risk_assessment["level"]
-            state["detected_issues"] = risk_assessment["reasons"]
+            updates["risk_score"] = risk_assessment["score"]
+            updates["risk_level"] = risk_assessment["level"]
+            updates["detected_issues"] = risk_assessment["reasons"]
         else:
             # Fallback if vehicle exists but has no logs yet
-            state["risk_score"] = 0
-            state["risk_level"] = "LOW"
-            state["detected_issues"] = ["No Data Available"]
+            updates["risk_score"] = 0
+            updates["risk_level"] = "LOW"
+            updates["detected_issues"] = ["No Data Available"]
+            updates["rolling_features"] = FEATURE_STORE.get(v_id)
 
-        return state
+        return updates
 
     except Exception as e:
         print(f"❌ DB Connection Error: {e}")
-        state["error_message"] = str(e)
-        state["ueba_alert_triggered"] = True
-        return state
\ No newline at end of file
+        updates["error_message"] = str(e)
+        updates["ueba_alert_triggered"] = True
+        updates["failed_nodes"] = ["data_analysis"] # retried when the run is resumed
+        return updates
\ No newline at end of file
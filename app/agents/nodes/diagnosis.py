@@ -1,38 +1,34 @@
 import re
-import os
-from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
-from dotenv import load_dotenv
 
 # Import your AgentState definition
 from app.agents.state import AgentState
 
 # ✅ IMPORT KNOWLEDGE BASE UTILITY
 try:
-    from app.utils.knowledge import find_diagnosis_steps
+    from app.utils.knowledge import find_diagnosis_steps_bulk
 except ImportError:
     print("⚠️ Warning: app.utils.knowledge not found. RAG disabled.")
-    def find_diagnosis_steps(x): return []
+    def find_diagnosis_steps_bulk(terms): return {}
 
-load_dotenv()
-
-# ✅ SETUP: Fetch Key & Initialize LLM
-groq_api_key = os.getenv("GROQ_API_KEY")
+try:
+    from app.utils.retrieval import RETRIEVER, build_query
+except ImportError:
+    print("⚠️ Warning: app.utils.retrieval unavailable (numpy missing?). Ranked retrieval disabled.")
+    RETRIEVER = None
 
-if not groq_api_key:
-    print("❌ ERROR: GROQ_API_KEY not found in .env file")
+from app.domain.mapping import get_issue_description
 
-llm = ChatOpenAI(
-    model="llama-3.3-70b-versatile",
-    base_url="https://api.groq.com/openai/v1",
-    api_key=groq_api_key
-)
+from app.data.feature_store import summarize_features
+from app.agents.llm_cache import cached_ainvoke, bucket, normalize_text
+from app.agents.prompting import build_prompt, rank_manual_entries, format_manual_entry
+from app.config import settings
 
-def diagnosis_node(state: AgentState) -> AgentState:
+async def diagnosis_node(state: AgentState) -> dict:
     """
     Worker 2: Uses LLM to explain the issue, assess risk, and recommend action.
     """
     v_id = state.get("vehicle_id", "Unknown")
+    updates = {}
     print(f"🧠 [Diagnosis] LLM analyzing failure patterns for {v_id}...")
 
     # 1. Safe Data Extraction
@@ -61,7 +57,6 @@ def diagnosis_node(state: AgentState) -> AgentState:
         issues = "Minor sensor drift detected (Simulated)"
 
     # 3. 🔍 RAG LOGIC: Retrieve Manuals
-    expert_advice = ""
     search_terms = []
 
     if "Temp" in issues or eng_temp > 100:
@@ -74,19 +69,35 @@ def diagnosis_node(state: AgentState) -> AgentState:
     if dtc_codes:
         search_terms.extend(dtc_codes)
 
-    for term in search_terms:
-        # Ensure term is a string before searching
-        steps = find_diagnosis_steps(str(term))
-        if steps:
-            expert_advice += f"\n--- MANUAL ENTRY FOR '{str(term).upper()}' ---\n"
-            for s in steps[:3]: 
-                expert_advice += f"Part: {s.get('part', 'Unknown')}\nSteps: {s.get('steps', 'Check manual')}\n"
-
-    if not expert_advice:
-        expert_advice = "Standard maintenance protocols apply. Refer to general service guidelines."
+    # One pass over the in-memory index for every term (terms are stringified there)
+    hits_by_term = {term: steps for term, steps in find_diagnosis_steps_bulk(search_terms).items() if steps}
+
+    # BM25 over the whole manual catches wording the substring match misses
+    # ("Engine runs hot") and scores every hit for ranking
+    part_scores = {}
+    if RETRIEVER is not None:
+        query = build_query(issues, dtc_codes, describe=get_issue_description)
+        related = RETRIEVER.top_k(query, settings.RETRIEVAL_TOP_K)
+        if related:
+            hits_by_term["related"] = related
+        part_scores = RETRIEVER.part_scores(query)
+
+    # Rank + de-duplicate across terms, keep the top-k; build_prompt trims to the token budget
+    ranked = rank_manual_entries(hits_by_term, context=f"{issues} {' '.join(map(str, dtc_codes or []))}",
+                                 scores=part_scores)[:settings.RETRIEVAL_TOP_K]
+    manual_entries = [
+        f"--- MANUAL ENTRY FOR '{', '.join(e['terms']).upper()}' ---\n{format_manual_entry(e)}"
+        for e in ranked
+    ]
+
+    # Rolling-window context from the feature store (filled by data_analysis_node)
+    trend_summary = summarize_features(state.get("rolling_features") or {})
 
     # 4. ✅ PROMPT ENGINEERING
-    prompt = f"""
+    def render(expert_advice):
+        if not expert_advice:
+            expert_advice = "Standard maintenance protocols apply. Refer to general service guidelines."
+        return f"""
     You are a Senior Fleet Mechanic AI. 
     Analyze this truck's status based on the Telematics and the Service Manual provided.
     
@@ -96,6 +107,9 @@ def diagnosis_node(state: AgentState) -> AgentState:
     Telematics Data:
     - Oil Pressure: {oil_psi} psi
     - Engine Temp: {eng_temp} C
+
+    Recent Trends (rolling windows):
+    {trend_summary}
     
     📘 OFFICIAL SERVICE MANUAL GUIDELINES:
     {expert_advice}
@@ -116,19 +130,32 @@ def diagnosis_node(state: AgentState) -> AgentState:
     * **Severity**: [Critical / High / Medium / Low]
     """
 
-    # 5. Call LLM
+    prompt, prompt_stats = build_prompt("diagnosis", render, manual_entries)
+    updates["prompt_stats"] = {"diagnosis": prompt_stats}
+    print(f"📏 [Diagnosis] Prompt {prompt_stats['tokens']}/{prompt_stats['budget']} tokens "
+          f"({prompt_stats['items_kept']} manual entries, {prompt_stats['items_dropped']} trimmed)")
+
+    # 5. Call LLM (cached on model + DTCs + bucketed readings)
+    cache_key = {
+        "model": state.get("vehicle_metadata", {}).get("model"),
+        "dtcs": sorted(str(c) for c in dtc_codes or []),
+        "issues": sorted(normalize_text(i) for i in issues.split("\n")),
+        "temp_bucket": bucket(eng_temp, settings.LLM_CACHE_TEMP_BUCKET_C),
+        "oil_bucket": bucket(oil_psi, settings.LLM_CACHE_PRESSURE_BUCKET_PSI),
+        "manual_terms": sorted(str(t).lower() for t in search_terms),
+    }
     try:
-        response = llm.invoke([HumanMessage(content=prompt)])
-        content = response.content
+        content = await cached_ainvoke(prompt, "diagnosis", cache_key)
     except Exception as e:
         print(f"❌ Diagnosis Agent LLM Error: {e}")
         content = f"Error generating diagnosis: {str(e)}"
-        state["priority_level"] = "High" # Default to High on error to be safe
-        state["diagnosis_report"] = content
-        return state
+        updates["priority_level"] = "High" # Default to High on error to be safe
+        updates["failed_nodes"] = ["diagnosis"] # retried when the run is resumed
+        updates["diagnosis_report"] = content
+        return updates
 
     # 6. Save Report to State
-    state["diagnosis_report"] = content
+    updates["diagnosis_report"] = content
 
     # 7. 🔍 ROBUST PRIORITY PARSING (Regex)
     # Looks for "Severity" followed by colon, optional bolding (**), and the keyword
@@ -136,27 +163,27 @@ def diagnosis_node(state: AgentState) -> AgentState:
     
     if priority_match:
         found_priority = priority_match.group(1).capitalize()
-        state["priority_level"] = found_priority
+        updates["priority_level"] = found_priority
     else:
         # Fallback logic based on keywords if regex fails
         if "Critical" in content:
-            state["priority_level"] = "Critical"
+            updates["priority_level"] = "Critical"
         elif "High" in content:
-            state["priority_level"] = "High"
+            updates["priority_level"] = "High"
         else:
-            state["priority_level"] = "Medium"
+            updates["priority_level"] = "Medium"
 
     # 8. Extract Recommended Action (First line of Action Plan)
     # This helps downstream agents (like sending an SMS) without sending the whole paragraph
     try:
         action_match = re.search(r"### 🛠️ Immediate Action Plan\s*\n\d+\.\s*(.*)", content)
         if action_match:
-            state["recommended_action"] = action_match.group(1).strip()
+            updates["recommended_action"] = action_match.group(1).strip()
         else:
-            state["recommended_action"] = "Inspect vehicle immediately."
+            updates["recommended_action"] = "Inspect vehicle immediately."
     except Exception:
-        state["recommended_action"] = "Check full diagnosis report."
+        updates["recommended_action"] = "Check full diagnosis report."
 
-    print(f"📊 [Diagnosis] Priority: {state['priority_level']} | Action: {state.get('recommended_action')}")
+    print(f"📊 [Diagnosis] Priority: {updates['priority_level']} | Action: {updates.get('recommended_action')}")
 
-    return state
\ No newline at end of file
+    return updates
\ No newline at end of file
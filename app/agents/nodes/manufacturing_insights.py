@@ -1,47 +1,43 @@
-from langchain_core.messages import HumanMessage
 from app.agents.state import AgentState
-import os
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from app.agents.llm_cache import cached_ainvoke, normalize_text
+from app.agents.prompting import build_prompt
+from app.agents.capa_batch import CAPA_GROUPS, format_group_reference
+from app.config import settings
 
-load_dotenv()
-
-# ✅ UPDATED: Fetch Key from Environment & Use Groq
-# This reads 'GROQ_API_KEY' from your .env file
-groq_api_key = os.getenv("GROQ_API_KEY")
-
-if not groq_api_key:
-    print("❌ ERROR: GROQ_API_KEY not found in .env file")
-
-llm = ChatOpenAI(
-    model="llama-3.3-70b-versatile",
-    base_url="https://api.groq.com/openai/v1",
-    api_key=groq_api_key
-)
-
-def manufacturing_node(state: AgentState) -> AgentState:
+async def manufacturing_node(state: AgentState) -> dict:
     """
     Worker 5: The Engineer.
     Analyzes the diagnosis to suggest long-term product improvements (CAPA).
     """
     print("🏭 [Manufacturing] Analyzing failure for fleet-wide patterns...")
+    updates = {}
 
     # 1. Skip if no critical diagnosis exists or risk is low
     if not state.get("diagnosis_report") or state.get("priority_level") == "Low":
-        state["manufacturing_recommendations"] = "No critical design flaws detected."
-        return state
+        updates["manufacturing_recommendations"] = "No critical design flaws detected."
+        return updates
+
+    # 2. Fleet batch mode: join the failure-signature group, no LLM call here
+    if settings.CAPA_MODE == "batch":
+        group = CAPA_GROUPS.register(state)
+        print(f"🏭 [Manufacturing] {state.get('vehicle_id')} -> {group['group_id']} "
+              f"({group['vehicle_count']} vehicles, report {'ready' if group['report'] else 'pending'})")
+        updates["capa_group_id"] = group["group_id"]
+        updates["manufacturing_recommendations"] = format_group_reference(group)
+        return updates
 
-    # 2. Input Data
+    # 3. Per-run mode: Input Data
     diagnosis = state["diagnosis_report"]
     model = state['vehicle_metadata'].get('model', 'Unknown Model')
 
-    # 3. PROMPT: Force the AI to use Markdown Structure
-    prompt = f"""
+    # 4. PROMPT: Force the AI to use Markdown Structure
+    # (diagnosis trimmed line by line to the token budget)
+    prompt, prompt_stats = build_prompt("manufacturing", lambda report: f"""
     You are a Senior Automotive Product Engineer.
     A critical failure occurred in the **{model}**.
     
     Diagnosis Report:
-    {diagnosis}
+    {report}
 
     TASK: Propose a "Corrective and Preventive Action" (CAPA) plan for the engineering team.
     
@@ -59,18 +55,22 @@ def manufacturing_node(state: AgentState) -> AgentState:
     ### 🧪 Validation Plan
     * **Testing:** [e.g., Run HIL simulation for 500 hours]
     * **Expected Result:** [e.g., Reduce field failure rate by 80%]
-    """
+    """, [line for line in diagnosis.split("\n") if line.strip()], ordered=True)
+    updates["prompt_stats"] = {"manufacturing": prompt_stats}
 
-    # 4. Call LLM
+    # 5. Call LLM
     try:
-        response = llm.invoke([HumanMessage(content=prompt)])
-        content = response.content
+        content = await cached_ainvoke(prompt, "manufacturing", {
+            "model": model,
+            "diagnosis": normalize_text(diagnosis),
+        })
         print("✅ [Manufacturing] CAPA Report Generated.")
     except Exception as e:
         print(f"❌ Manufacturing Agent Error: {e}")
         content = "Could not generate engineering report."
+        updates["failed_nodes"] = ["manufacturing"] # retried when the run is resumed
 
-    # 5. Save to State
-    state["manufacturing_recommendations"] = content
+    # 6. Save to State
+    updates["manufacturing_recommendations"] = content
     
-    return state
\ No newline at end of file
+    return updates
\ No newline at end of file
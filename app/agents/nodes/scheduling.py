@@ -1,12 +1,35 @@
 from app.agents.state import AgentState
 from app.ueba.middleware import secure_call
+from app.domain.service_calendar import ServiceCalendar
+from app.domain.batch_scheduler import plan_batch, compare_with_greedy
+from app.data.booking_store import BOOKING_STORE
+from app.config import settings
+from app.utils.tracing import current_run_id
 from datetime import datetime, timedelta
+import asyncio
+import threading
 
 # ==========================================
-# 💾 MOCK DATABASE (Global Memory)
+# 💾 BOOKINGS (app/data/booking_store.py)
 # ==========================================
-# Stores all confirmed bookings to prevent double-booking.
-BOOKINGS_DB = []
+# All confirmed bookings live in BOOKING_STORE (SQLite, shared by workers).
+# Slot occupancy per service center is mirrored as per-day bitmaps, so
+# finding a free slot never queries every booking.
+SERVICE_CALENDARS = {
+    center: ServiceCalendar(
+        open_hour=settings.SERVICE_OPEN_HOUR,
+        close_hour=settings.SERVICE_CLOSE_HOUR,
+        bays=bays,
+    )
+    for center, bays in settings.SERVICE_CENTERS.items()
+}
+DEFAULT_CENTER = next(iter(SERVICE_CALENDARS))
+SERVICE_CALENDAR = SERVICE_CALENDARS[DEFAULT_CENTER]
+BOOKING_STORE.hydrate(SERVICE_CALENDARS)
+
+# Booking requests waiting for the next fleet batch (SCHEDULING_MODE=batch)
+PENDING_BOOKINGS = []
+_PENDING_LOCK = threading.Lock()
 
 # ==========================================
 # 🛠️ SERVICE LOGIC (Unchanged)
@@ -18,83 +41,182 @@ class SchedulerService:
         """
         Helper method for the API to fetch data for the Frontend.
         """
-        return BOOKINGS_DB
+        return BOOKING_STORE.all()
 
     @staticmethod
     def find_next_available_slot(target_date_str):
         """
-        Loops through standard work hours (09:00 - 17:00) 
-        to find a slot that isn't already in BOOKINGS_DB.
+        First free hourly slot (e.g. "09:00") on `target_date_str`, or None
+        if every bay is taken all day.
         """
-        # Define working hours (09:00 to 17:00)
-        possible_slots = [f"{h:02d}:00" for h in range(9, 18)]
-        
-        # Filter DB for bookings strictly on this specific date
-        taken_times = {b['slot_time'] for b in BOOKINGS_DB if b['slot_date'] == target_date_str}
-        
-        # Find first slot NOT in taken_times
-        for slot in possible_slots:
-            if slot not in taken_times:
-                return slot
-        
-        return None # No slots available today
+        day = datetime.strptime(target_date_str, "%Y-%m-%d")
+        free = SERVICE_CALENDAR.next_free(day, horizon_days=1)
+        return f"{free[1]:02d}:00" if free else None
 
     @staticmethod
-    def book_slot(vehicle_id: str, priority: str):
+    def book_slot(vehicle_id: str, priority: str, preferred_date: str = None, notes: str = None,
+                  run_id: str = None):
         """
-        Determines slot based on priority, CHECKS AVAILABILITY, and saves to Mock DB.
+        Determines slot based on priority, CHECKS AVAILABILITY, and saves it to the booking store.
+        `preferred_date` (YYYY-MM-DD) books the first free slot on or after that day.
+        With `run_id` a resumed agent run gets back the booking it already made
+        instead of a second one.
         """
+        if run_id:
+            existing = BOOKING_STORE.for_run(run_id)
+            if existing is not None:
+                print(f"♻️ [System] Run {run_id} already booked {existing['booking_id']}, reusing it.")
+                return _booking_result(existing)
+
         print(f"📅 [System] Calculating slot for {vehicle_id} (Priority: {priority})...")
         
         # 1. Determine Initial Target Date based on Priority
         now = datetime.now()
         
-        # For DEMO purposes, let's try to book everything for TOMORROW
-        target_date = now + timedelta(days=1)
+        if preferred_date:
+            # Never earlier than now: a slot that already started can't be booked
+            target_date = max(datetime.strptime(preferred_date, "%Y-%m-%d"), now)
+        else:
+            # For DEMO purposes, let's try to book everything for TOMORROW
+            target_date = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
         
         service_note = f"Repair ({priority})"
-        formatted_date = target_date.strftime("%Y-%m-%d")
 
-        # 2. SMART LOGIC: Find a Real Available Time (Collision Detection)
-        available_time = SchedulerService.find_next_available_slot(formatted_date)
-        
-        # Fallback if fully booked: Push to next day and reset to 09:00
-        if not available_time:
-            print(f"⚠️ [System] Date {formatted_date} is full! Checking next day...")
-            target_date = target_date + timedelta(days=1)
-            formatted_date = target_date.strftime("%Y-%m-%d")
-            available_time = "09:00" # Reset to morning for the new day
-
-        full_slot_str = f"{formatted_date} {available_time}"
-
-        # 3. Create Booking Record
-        new_booking = {
-            "booking_id": f"BK-{int(now.timestamp())}", 
-            "vin": vehicle_id,
-            "slot_date": formatted_date,
-            "slot_time": available_time,
-            "service_type": service_note,
-            "priority": priority,
-            "status": "CONFIRMED",
-            "timestamp": now.isoformat()
-        }
-        
-        # 4. Save to Mock DB
-        BOOKINGS_DB.append(new_booking)
-        print(f"💾 [DB] Booking saved: {new_booking['booking_id']} | {full_slot_str}")
+        # 2. SMART LOGIC: atomically claim + save the first free slot from the target date on
+        new_booking = BOOKING_STORE.claim_next(
+            {
+                "vin": vehicle_id,
+                "center": DEFAULT_CENTER,
+                "service_type": service_note,
+                "priority": priority,
+                "notes": notes,
+                "timestamp": now.isoformat(),
+                "run_id": run_id,
+            },
+            SERVICE_CALENDAR, target_date, settings.BOOKING_HORIZON_DAYS,
+        )
+        if new_booking is None:
+            raise RuntimeError(f"No service slot free in the next {settings.BOOKING_HORIZON_DAYS} days")
+
+        formatted_date = new_booking["slot_date"]
+        if formatted_date != target_date.strftime("%Y-%m-%d"):
+            print(f"⚠️ [System] {target_date.strftime('%Y-%m-%d')} is full! Booked on {formatted_date} instead.")
+
+        print(f"💾 [DB] Booking saved: {new_booking['booking_id']} | {formatted_date} {new_booking['slot_time']}")
         
-        # 5. Return result
+        # 3. Return result
+        return _booking_result(new_booking)
+
+    @staticmethod
+    def cancel_booking(booking_id: str):
+        """Cancels a booking and frees its slot. Returns the booking, or None if unknown."""
+        booking = BOOKING_STORE.cancel(booking_id)
+        calendar = SERVICE_CALENDARS.get(booking["center"]) if booking else None
+        if calendar is not None:
+            calendar.release(booking["slot_date"], int(booking["slot_time"][:2]), booking["bay"])
+        return booking
+
+    @staticmethod
+    def queue_booking(vehicle_id: str, priority: str, deadline: str = None, centers: list = None,
+                      run_id: str = None):
+        """Adds a request to the next fleet batch instead of booking it now."""
+        request = {"vehicle_id": vehicle_id, "priority": priority, "deadline": deadline,
+                   "centers": centers, "queued_at": datetime.now().isoformat(), "run_id": run_id}
+        if run_id and BOOKING_STORE.for_run(run_id) is not None:
+            # A resumed run whose request an earlier batch already booked
+            return {"status": "CONFIRMED", "position": 0}
+        with _PENDING_LOCK:
+            if run_id and any(pending.get("run_id") == run_id for pending in PENDING_BOOKINGS):
+                # A resumed run: its request is still waiting for the batch
+                position = next(i for i, pending in enumerate(PENDING_BOOKINGS, 1)
+                                if pending.get("run_id") == run_id)
+                return {"status": "QUEUED", "position": position}
+            PENDING_BOOKINGS.append(request)
+            position = len(PENDING_BOOKINGS)
+        print(f"📥 [Scheduler] {vehicle_id} ({priority}) queued for the fleet batch (#{position})")
+        return {"status": "QUEUED", "position": position}
+
+    @staticmethod
+    def run_booking_batch():
+        """
+        Plans every pending request at once (priority, deadline, center
+        capacity), books the plan and returns it with the greedy comparison.
+        """
+        with _PENDING_LOCK:
+            requests = list(PENDING_BOOKINGS)
+            PENDING_BOOKINGS.clear()
+        if not requests:
+            return {"booked": 0, "unassigned": [], "comparison": None}
+
+        now = datetime.now()
+        start = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        try:
+            comparison = compare_with_greedy(requests, SERVICE_CALENDARS, start, settings.BOOKING_HORIZON_DAYS)
+            plan = plan_batch(requests, SERVICE_CALENDARS, start, settings.BOOKING_HORIZON_DAYS)
+        except Exception:
+            # Nothing was booked: put the requests back (ahead of anything queued meanwhile)
+            with _PENDING_LOCK:
+                PENDING_BOOKINGS[:0] = requests
+            raise
+
+        booked, unassigned = [], list(plan["unassigned"])
+        for a in plan["assignments"]:
+            booking = {
+                "vin": a["vehicle_id"],
+                "slot_date": a["slot_date"],
+                "slot_time": a["slot_time"],
+                "center": a["center"],
+                "bay": a["bay"],
+                "service_type": f"Repair ({a['priority']})",
+                "priority": a["priority"],
+                "timestamp": now.isoformat(),
+                "run_id": requests[a["arrival"]].get("run_id"),
+            }
+            if BOOKING_STORE.insert(booking):
+                booked.append({**a, "booking_id": booking["booking_id"]})
+                continue
+            # Another worker took the planned slot: next free one at the same center
+            booking = BOOKING_STORE.claim_next(booking, SERVICE_CALENDARS[a["center"]], start,
+                                               settings.BOOKING_HORIZON_DAYS)
+            if booking is None:
+                unassigned.append({"vehicle_id": a["vehicle_id"], "priority": a["priority"],
+                                   "reason": "planned slot taken meanwhile, no other slot free"})
+                continue
+            booked.append({**a, "booking_id": booking["booking_id"], "slot_date": booking["slot_date"],
+                           "slot_time": booking["slot_time"], "bay": booking["bay"]})
+
+        print(f"🚚 [Scheduler] Batch booked {len(booked)} vehicles in {plan['plan_ms']} ms "
+              f"({plan['metrics']['deadline_misses']} deadline misses vs "
+              f"{comparison['greedy']['deadline_misses']} with greedy booking)")
         return {
-            "booking_id": new_booking["booking_id"],
-            "slot": full_slot_str,
-            "type": service_note
+            "booked": len(booked),
+            "assignments": booked,
+            "unassigned": unassigned,
+            "comparison": comparison,
         }
 
+
+def _booking_result(booking: dict) -> dict:
+    slot = f"{booking['slot_date']} {booking['slot_time']}"
+    return {"booking_id": booking["booking_id"], "slot": slot, "slot_date": booking["slot_date"],
+            "type": booking["service_type"]}
+
+
+async def booking_batch_loop(interval_s: float):
+    """Background task: books the pending requests every `interval_s` seconds."""
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            await asyncio.to_thread(SchedulerService.run_booking_batch)
+        except Exception as e:
+            print(f"❌ [Scheduler] Batch loop error: {e}")
+
 # ==========================================
 # 🤖 AGENT NODE (Updated Logic)
 # ==========================================
-def scheduling_node(state: AgentState) -> AgentState:
+def scheduling_node(state: AgentState) -> dict:
     print("🗓️ [Scheduler] Analyzing priority for booking...")
+    updates = {}
     
     # Get Priority from the upstream Agent (Diagnosis Agent)
     # Default is "Medium" if not found
@@ -118,7 +240,7 @@ def scheduling_node(state: AgentState) -> AgentState:
     else:
         # Case 3: Non-Critical and No User Confirmation -> SKIP
         print(f"⏸️ [Scheduler] Priority is '{priority}' and no customer confirmation. Skipping booking.")
-        return state
+        return updates
 
     # ---------------------------------------------------------
     # ⚡ EXECUTE BOOKING (Only if should_book is True)
@@ -126,25 +248,41 @@ def scheduling_node(state: AgentState) -> AgentState:
     if should_book:
         agent_name = "SchedulingAgent"
         v_id = state.get("vehicle_id", "Unknown-ID")
+        # A resumed run re-executes this node: the run ID lets it find its earlier booking
+        run_id = current_run_id()
 
         try:
+            if settings.SCHEDULING_MODE == "batch":
+                # Fleet batch: slot assigned with everyone else's by priority / deadline
+                queued = secure_call(agent_name, "SchedulerService", SchedulerService.queue_booking, v_id, priority,
+                                     run_id=run_id)
+                updates["booking_status"] = queued["status"]
+                updates["selected_slot"] = "Pending fleet batch scheduling"
+                return updates
+
             # Securely call the booking service
             booking_result = secure_call(
                 agent_name,
                 "SchedulerService",
                 SchedulerService.book_slot,
                 v_id,
-                priority
+                priority,
+                run_id=run_id
             )
             
             # EXTRACT DATA AND UPDATE STATE
-            state["booking_id"] = booking_result["booking_id"]
-            state["selected_slot"] = booking_result["slot"]
+            updates["booking_id"] = booking_result["booking_id"]
+            updates["selected_slot"] = booking_result["slot"]
+            updates["booking_status"] = "CONFIRMED"
             
             print(f"✅ [Scheduler] CONFIRMED! Date: {booking_result['slot']} (ID: {booking_result['booking_id']})")
             
         except PermissionError as e:
-            state["error_message"] = str(e)
+            updates["error_message"] = str(e)
             print(f"⛔ [UEBA] BLOCKED: {e}")
 
-    return state
\ No newline at end of file
+        except RuntimeError as e:
+            updates["error_message"] = str(e)
+            print(f"⚠️ [Scheduler] Could not book {v_id}: {e}")
+
+    return updates
\ No newline at end of file
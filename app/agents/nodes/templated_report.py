@@ -0,0 +1,62 @@
+from app.agents.state import AgentState
+
+# Deterministic wording per risk level (no LLM involved)
+LEVEL_TEMPLATES = {
+    "MEDIUM": {
+        "priority": "Medium",
+        "cause": "Readings are drifting outside the normal band but remain within safe limits.",
+        "steps": ["Schedule an inspection at the next routine service.",
+                  "Keep monitoring telematics for further deviation."],
+        "message": "Hi {owner}, your {model} shows minor warning signs ({issues}). "
+                   "Reply 'YES' to book an inspection at your convenience.",
+    },
+    "LOW": {
+        "priority": "Low",
+        "cause": "All monitored signals are within normal operating limits.",
+        "steps": ["No action required.",
+                  "Continue standard maintenance schedule."],
+        "message": "Hi {owner}, your {model} passed its latest health check. No action needed.",
+    },
+}
+
+
+def templated_report_node(state: AgentState) -> dict:
+    """
+    Fast path for healthy / low-risk vehicles.
+    Fills the same state fields as the LLM chain using fixed templates,
+    so a fleet-wide sweep does not spend LLM calls on vehicles that are fine.
+    """
+    level = (state.get("risk_level") or "LOW").upper()
+    template = LEVEL_TEMPLATES.get(level, LEVEL_TEMPLATES["LOW"])
+    print(f"⚡ [Template] {state.get('vehicle_id')} is {level} risk. Skipping LLM agents.")
+    updates = {}
+
+    metadata = state.get("vehicle_metadata") or {}
+    owner = metadata.get("owner", "Customer")
+    model = metadata.get("model", "Vehicle")
+
+    detected = state.get("detected_issues") or []
+    issues = ", ".join(detected) if detected else "No issues detected"
+    steps = "\n".join(f"{i}. {step}" for i, step in enumerate(template["steps"], start=1))
+
+    # Same markdown layout as diagnosis_node so the frontend renders it identically
+    updates["diagnosis_report"] = f"""### 🚨 Issue Summary
+* **Issue**: {issues}
+
+### 📉 Root Cause Analysis
+* **Primary Cause**: {template['cause']}
+
+### 🛠️ Immediate Action Plan
+{steps}
+
+### ⚠️ Risk Assessment
+* **Severity**: {template['priority']}
+"""
+    updates["priority_level"] = template["priority"]
+    updates["recommended_action"] = template["steps"][0]
+    updates["customer_script"] = template["message"].format(owner=owner, model=model, issues=issues)
+    updates["customer_decision"] = "PENDING"
+    updates["audio_available"] = False
+    updates["manufacturing_recommendations"] = "No critical design flaws detected."
+
+    return updates
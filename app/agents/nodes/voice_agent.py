@@ -1,53 +1,45 @@
 import os
 import json
+import asyncio
 import random
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
 
 from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
-from gtts import gTTS
 
 from app.agents.state import AgentState
+from app.utils.audio_cache import AUDIO_RENDERER, READY
+from app.utils.tracing import span
+from app.config import settings
+from app.agents.prompting import build_prompt
+from app.agents.resilience import resilient_call
 
 # ------------------------------------------------------------------
-# 1️⃣ ENV + LLM SETUP
+# 1️⃣ LLM SETUP
 # ------------------------------------------------------------------
 
-load_dotenv()
-
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-llm = ChatOpenAI(
-    model="llama-3.3-70b-versatile",
-    base_url="https://api.groq.com/openai/v1",
-    api_key=GROQ_API_KEY
-)
+# Shared, lazily created client (see app/config/llm.py)
+from app.config.llm import get_llm
 
 # ------------------------------------------------------------------
 # 2️⃣ PATH RESOLUTION 
 # ------------------------------------------------------------------
 
-BASE_DIR = os.path.dirname(
-    os.path.dirname(
-        os.path.dirname(os.path.abspath(__file__))
-    )
-)
-
-AUDIO_DIR = os.path.join(BASE_DIR, "data_samples")
+# Recordings are content-addressed files owned by the background renderer
+AUDIO_DIR = AUDIO_RENDERER.audio_dir
 os.makedirs(AUDIO_DIR, exist_ok=True)
 
 # ------------------------------------------------------------------
 # 3️⃣ VOICE INTERACTION AGENT
 # ------------------------------------------------------------------
 
-def voice_interaction_node(state: AgentState) -> AgentState:
+async def voice_interaction_node(state: AgentState) -> dict:
     """
     Generates a voice interaction transcript + MP3 audio
     for CRITICAL vehicle alerts only.
     """
 
     print("🎙️ [Voice Agent] Starting voice interaction node")
+    updates = {}
 
     # --------------------------------------------------------------
     # 3.1 PRIORITY GATE
@@ -55,7 +47,7 @@ def voice_interaction_node(state: AgentState) -> AgentState:
 
     if state.get("priority_level") != "Critical":
         print("🟡 Not critical — skipping voice call")
-        return state
+        return updates
 
     # --------------------------------------------------------------
     # 3.2 CONTEXT EXTRACTION (SAFE)
@@ -71,25 +63,28 @@ def voice_interaction_node(state: AgentState) -> AgentState:
 
     if not vin:
         print("❌ VIN missing — cannot generate audio")
-        state["audio_available"] = False
-        state["vin"] = None 
-        return state
+        updates["audio_available"] = False
+        updates["vin"] = None 
+        return updates
 
     # --------------------------------------------------------------
     # 3.3 LLM PROMPT
     # --------------------------------------------------------------
 
-    prompt = f"""
+    prompt, prompt_stats = build_prompt("voice", lambda _: f"""
 You are an AI voice agent calling a vehicle owner.
 ... (rest of the prompt)
-"""
+""")
+    updates["prompt_stats"] = {"voice": prompt_stats}
 
     try:
         # ----------------------------------------------------------
         # 3.4 CALL LLM
         # ----------------------------------------------------------
 
-        response = llm.invoke([HumanMessage(content=prompt)])
+        with span("llm", "voice"):
+            client = get_llm()
+            response = await resilient_call("voice", lambda: client.ainvoke([HumanMessage(content=prompt)]))
         content = response.content.strip()
 
         # Remove accidental markdown
@@ -124,30 +119,31 @@ You are an AI voice agent calling a vehicle owner.
         # 3.6 AUDIO GENERATION
         # ----------------------------------------------------------
 
-        audio_filename = f"voice_recording_{vin}.mp3"
-        audio_path = os.path.join(AUDIO_DIR, audio_filename)
-
         full_script = " ".join(ai_lines)
 
-        tts = gTTS(text=full_script, lang="en", slow=False)
-        tts.save(audio_path)
+        # TTS (gTTS = seconds of network I/O) renders on the renderer's thread
+        # pool; the run returns the URL straight away. Same script = same file.
+        audio = AUDIO_RENDERER.submit(full_script)
+        if not settings.TTS_BACKGROUND and audio["status"] != READY:
+            audio["status"] = await asyncio.to_thread(AUDIO_RENDERER.wait, audio["filename"])
 
-        print(f"🔊 Audio saved at local path: {audio_path}")
+        print(f"🔊 Audio {audio['status']}: {audio['path']}")
 
         # ----------------------------------------------------------
         # 3.7 SAVE TO AGENT STATE (Success Path)
         # ----------------------------------------------------------
         
-        web_audio_path = f"/audio/{audio_filename}" 
+        web_audio_path = audio["url"]
         
-        state["vin"] = vin 
+        updates["vin"] = vin 
 
-        state["voice_transcript"] = transcript
-        state["audio_file"] = audio_path 
-        state["audio_url"] = web_audio_path 
-        state["audio_available"] = True
-        state["customer_decision"] = "BOOKED"
-        state["scheduled_date"] = "Tomorrow 10:00 AM"
+        updates["voice_transcript"] = transcript
+        updates["audio_file"] = audio["path"]
+        updates["audio_url"] = web_audio_path 
+        updates["audio_status"] = audio["status"]
+        updates["audio_available"] = True
+        updates["customer_decision"] = "BOOKED"
+        updates["scheduled_date"] = "Tomorrow 10:00 AM"
 
         print(f"✅ Voice interaction completed. Frontend URL: {web_audio_path}")
 
@@ -158,7 +154,7 @@ You are an AI voice agent calling a vehicle owner.
         print(f"❌ Voice Agent Failed: {e}")
 
         # Prepare safe fallback transcript
-        state["voice_transcript"] = [
+        updates["voice_transcript"] = [
             {
                 "id": 1,
                 "speaker": "AI Agent",
@@ -169,12 +165,13 @@ You are an AI voice agent calling a vehicle owner.
         ]
         
         # Nullify audio fields
-        state["audio_available"] = False
-        state["audio_url"] = None
+        updates["audio_available"] = False
+        updates["audio_url"] = None
         
         # 🚨 FINAL FIX: Ensure the VIN is saved back to the state 
         # using the 'vin' variable retrieved in section 3.2.
         # This prevents the subsequent KeyError in the FastAPI route.
-        state["vin"] = vin 
+        updates["vin"] = vin 
+        updates["failed_nodes"] = ["voice_interaction"] # retried when the run is resumed
 
-    return state
\ No newline at end of file
+    return updates
\ No newline at end of file
@@ -0,0 +1,166 @@
+import re
+import time
+import threading
+
+from app.config import settings
+from app.utils.tracing import span
+
+# ==========================================
+# 🔢 TOKEN COUNTING
+# ==========================================
+# tiktoken ships with langchain-openai, but its BPE file is downloaded on first
+# use. Offline (or without tiktoken) we fall back to ~4 characters per token.
+_ENCODER = None
+_ENCODER_READY = False
+_ENCODER_LOCK = threading.Lock()
+
+
+def _get_encoder():
+    global _ENCODER, _ENCODER_READY
+    if not _ENCODER_READY:
+        with _ENCODER_LOCK:
+            if not _ENCODER_READY:
+                try:
+                    import tiktoken
+                    _ENCODER = tiktoken.get_encoding(settings.PROMPT_TOKEN_ENCODING)
+                except Exception as e:
+                    print(f"⚠️ [Prompting] tiktoken unavailable ({e.__class__.__name__}), estimating tokens as chars/4")
+                    _ENCODER = None
+                _ENCODER_READY = True
+    return _ENCODER
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return (len(text) + 3) // 4
+
+# ==========================================
+# 📘 MANUAL STEP RANKING
+# ==========================================
+def _words(text: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", str(text).lower()))
+
+
+def format_manual_entry(entry: dict) -> str:
+    """One knowledge-base hit as a compact 'Part / Steps' block."""
+    steps = entry.get("steps", "Check manual")
+    if isinstance(steps, list):
+        parts = []
+        for s in steps:
+            if isinstance(s, dict):
+                outcomes = "/".join(s.get("result", []))
+                parts.append(f"{s.get('step', '')} ({outcomes})" if outcomes else s.get("step", ""))
+            else:
+                parts.append(str(s))
+        steps = "; ".join(p for p in parts if p)
+    return f"Part: {entry.get('part', 'Unknown')}\nSteps: {steps}"
+
+
+def rank_manual_entries(hits_by_term: dict, context: str = "", scores: dict = None) -> list:
+    """
+    Flattens {search_term: [kb hits]} into one ranked, de-duplicated list.
+    Entries found by several terms rank first, then (when `scores` maps
+    lowercased part names to relevance scores) the best-scoring entries, then
+    entries whose part name / steps share the most words with `context`
+    (issues, DTCs); ties keep retrieval order. Returns [{"part", "steps", "terms"}].
+    """
+    merged = {}  # part -> entry (first occurrence wins, insertion order kept)
+    for term, hits in hits_by_term.items():
+        for hit in hits:
+            key = str(hit.get("part", "")).strip().lower()
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = {**hit, "terms": [term]}
+            elif term not in entry["terms"]:
+                entry["terms"].append(term)
+
+    context_words = _words(context)
+    scores = scores or {}
+
+    def score(item):
+        order, entry = item
+        relevance = scores.get(str(entry.get("part", "")).strip().lower(), 0.0)
+        overlap = len(context_words & _words(f"{entry.get('part')} {entry.get('steps')}"))
+        return (-len(entry["terms"]), -relevance, -overlap, order)
+
+    return [entry for _, entry in sorted(enumerate(merged.values()), key=score)]
+
+# ==========================================
+# 🧱 BUDGETED PROMPT ASSEMBLY
+# ==========================================
+def node_budget(node: str) -> int:
+    return settings.PROMPT_TOKEN_BUDGETS.get(node, settings.PROMPT_TOKEN_BUDGET_DEFAULT)
+
+
+def build_prompt(node: str, render, items=(), budget: int = None, ordered: bool = False):
+    """
+    Builds `render(context)` where `context` is as many of `items` (already in
+    priority order) as fit the node's token budget.
+
+    ordered=False: items that don't fit are skipped and smaller later ones may
+                   still go in (ranked retrieval results).
+    ordered=True:  stops at the first item that doesn't fit, so the kept text
+                   is a prefix (e.g. the first lines of a report).
+
+    Returns (prompt, stats). stats is also attached to the 'prompt:<node>' span.
+    """
+    budget = budget or node_budget(node)
+    with span("prompt", node) as attrs:
+        start = time.perf_counter()
+        remaining = budget - count_tokens(render(""))
+        items = list(items)
+        kept, dropped = [], 0
+        for i, item in enumerate(items):
+            cost = count_tokens(item) + 1  # + separator
+            if cost <= remaining:
+                kept.append(item)
+                remaining -= cost
+            elif ordered:
+                dropped = len(items) - i
+                break
+            else:
+                dropped += 1
+
+        prompt = render("\n".join(kept))
+        stats = {
+            "tokens": count_tokens(prompt),
+            "budget": budget,
+            "items_kept": len(kept),
+            "items_dropped": dropped,
+            "build_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+        attrs.update(tokens=stats["tokens"], dropped=dropped)
+
+    _record(node, stats)
+    return prompt, stats
+
+# ==========================================
+# 📊 PROCESS-WIDE TOTALS
+# ==========================================
+_TOTALS = {}
+_TOTALS_LOCK = threading.Lock()
+
+
+def _record(node: str, stats: dict):
+    with _TOTALS_LOCK:
+        t = _TOTALS.setdefault(node, {"prompts": 0, "tokens_total": 0, "tokens_max": 0,
+                                      "items_dropped": 0, "over_budget": 0})
+        t["prompts"] += 1
+        t["tokens_total"] += stats["tokens"]
+        t["tokens_max"] = max(t["tokens_max"], stats["tokens"])
+        t["items_dropped"] += stats["items_dropped"]
+        if stats["tokens"] > stats["budget"]:
+            t["over_budget"] += 1
+
+
+def get_prompt_totals() -> dict:
+    with _TOTALS_LOCK:
+        return {
+            node: {**t, "tokens_mean": round(t["tokens_total"] / t["prompts"], 1),
+                   "budget": node_budget(node)}
+            for node, t in sorted(_TOTALS.items())
+        }
@@ -0,0 +1,218 @@
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Optional
+
+from app.config import settings
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the LLM while the breaker is open (nodes use their fallback)."""
+
+
+class LLMDeadlineExceeded(Exception):
+    """Raised when a node's LLM call doesn't finish within its deadline."""
+
+# ==========================================
+# 🔌 CIRCUIT BREAKER (shared by every LLM call)
+# ==========================================
+class CircuitBreaker:
+    """
+    closed    -> calls go through; outcomes are kept for `window_s` seconds.
+    open      -> once at least `min_calls` recent calls failed at `error_rate`
+                 or more, every call fails fast for `cooldown_s` seconds.
+    half_open -> after the cooldown one probe call is let through; success
+                 closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, error_rate: float, min_calls: int, window_s: float, cooldown_s: float):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window_s = window_s
+        self.cooldown_s = cooldown_s
+        self.state = "closed"
+        self.opened_at = None
+        self.trips = 0
+        self.rejected = 0
+        self._outcomes = deque()  # (timestamp, ok)
+        self._probe_in_flight = 0  # number of the half-open probe in flight (0: none)
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window_s:
+            self._outcomes.popleft()
+
+    def allow(self) -> Optional[int]:
+        """
+        None when the call must fail fast. Otherwise a ticket to hand back to
+        record() / release_probe(): 0 for an ordinary call, the probe number
+        for the single half-open probe. Only that probe's outcome decides
+        whether the breaker closes again.
+        """
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown_s:
+                self.state = "half_open"
+                self._probe_in_flight = 0
+            if self.state == "closed":
+                return 0
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probes += 1
+                self._probe_in_flight = self._probes
+                return self._probes
+            self.rejected += 1
+            return None
+
+    def record(self, ok: bool, ticket: int = 0):
+        now = time.monotonic()
+        with self._lock:
+            if ticket and ticket == self._probe_in_flight:
+                self._probe_in_flight = 0
+                if ok:
+                    print("✅ [Breaker] Probe succeeded, closing circuit")
+                    self.state = "closed"
+                    self._outcomes.clear()
+                else:
+                    self._open(now)
+                return
+            if self.state != "closed":
+                # A call admitted before the breaker opened (or a stale probe):
+                # its outcome says nothing about the backend now
+                return
+
+            self._outcomes.append((now, ok))
+            self._trim(now)
+            failures = sum(1 for _, success in self._outcomes if not success)
+            if (len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.error_rate):
+                self._open(now)
+
+    def release_probe(self, ticket: int):
+        """The probe was cancelled before it had an outcome: let the next call probe instead."""
+        with self._lock:
+            if ticket and ticket == self._probe_in_flight:
+                self._probe_in_flight = 0
+
+    def _open(self, now: float):
+        self.state = "open"
+        self.opened_at = now
+        self.trips += 1
+        print(f"🔴 [Breaker] LLM circuit OPEN for {self.cooldown_s}s (trip #{self.trips})")
+
+    def reset(self):
+        with self._lock:
+            self.state = "closed"
+            self._outcomes.clear()
+            self._probe_in_flight = 0
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            calls = len(self._outcomes)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            return {
+                "state": self.state,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "window_calls": calls,
+                "window_error_rate": round(failures / calls, 3) if calls else 0.0,
+                "open_for_s": round(max(0.0, self.cooldown_s - (now - self.opened_at)), 1)
+                              if self.state == "open" else 0.0,
+                "error_rate_threshold": self.error_rate,
+                "min_calls": self.min_calls,
+            }
+
+
+LLM_BREAKER = CircuitBreaker(
+    error_rate=settings.BREAKER_ERROR_RATE,
+    min_calls=settings.BREAKER_MIN_CALLS,
+    window_s=settings.BREAKER_WINDOW_S,
+    cooldown_s=settings.BREAKER_COOLDOWN_S,
+)
+
+# ==========================================
+# ⏱️ DEADLINES + HEDGING
+# ==========================================
+_NODE_STATS = {}  # node -> counters
+
+
+def _count(node: str, key: str):
+    stats = _NODE_STATS.setdefault(node, {"calls": 0, "ok": 0, "errors": 0, "timeouts": 0,
+                                          "short_circuited": 0, "hedges": 0, "hedge_wins": 0})
+    stats[key] += 1
+
+
+async def _hedged(node: str, factory, hedge_after_s: float):
+    """
+    Starts factory(); if it hasn't finished after `hedge_after_s`, starts a
+    duplicate and returns whichever succeeds first. The loser is cancelled.
+    """
+    primary = asyncio.ensure_future(factory())
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after_s)
+        if not done:
+            _count(node, "hedges")
+            tasks.add(asyncio.ensure_future(factory()))
+
+        error = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        _count(node, "hedge_wins")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def resilient_call(node: str, factory):
+    """
+    Runs `factory()` (an LLM coroutine factory) under the node's deadline,
+    the shared circuit breaker and, for nodes in LLM_HEDGE_AFTER_S, a hedged
+    duplicate request. Raises CircuitOpenError / LLMDeadlineExceeded or the
+    client's own error; callers keep their existing fallback path.
+    """
+    _count(node, "calls")
+    ticket = LLM_BREAKER.allow()
+    if ticket is None:
+        _count(node, "short_circuited")
+        raise CircuitOpenError(f"LLM circuit open, skipping {node} call")
+
+    deadline = settings.LLM_DEADLINES_S.get(node, settings.LLM_DEADLINE_DEFAULT_S)
+    hedge_after = settings.LLM_HEDGE_AFTER_S.get(node, 0)
+    call = _hedged(node, factory, hedge_after) if hedge_after > 0 else factory()
+
+    try:
+        result = await asyncio.wait_for(call, timeout=deadline)
+    except asyncio.TimeoutError:
+        _count(node, "timeouts")
+        LLM_BREAKER.record(False, ticket)
+        raise LLMDeadlineExceeded(f"{node} LLM call exceeded its {deadline}s deadline")
+    except asyncio.CancelledError:
+        # No outcome to record, but a cancelled probe must not keep the breaker half-open
+        LLM_BREAKER.release_probe(ticket)
+        raise
+    except Exception:
+        _count(node, "errors")
+        LLM_BREAKER.record(False, ticket)
+        raise
+
+    _count(node, "ok")
+    LLM_BREAKER.record(True, ticket)
+    return result
+
+
+def resilience_stats() -> dict:
+    return {
+        "breaker": LLM_BREAKER.stats(),
+        "deadlines_s": settings.LLM_DEADLINES_S,
+        "hedge_after_s": settings.LLM_HEDGE_AFTER_S,
+        "nodes": {node: dict(stats) for node, stats in sorted(_NODE_STATS.items())},
+    }
@@ -0,0 +1,343 @@
+import time
+import asyncio
+from contextlib import nullcontext
+from datetime import datetime
+
+from app.config import settings
+from app.data.feature_store import FEATURE_STORE
+from app.data.run_log_store import RUN_LOG, RUN
+from app.utils.tracing import start_trace, span
+from app.utils.singleflight import SingleFlight, input_fingerprint
+from app.agents.checkpoints import CHECKPOINTS, bind_checkpoint, COMPLETED, PARTIAL, FAILED
+
+if settings.DATA_BACKEND != "local":
+    from database import supabase  # ✅ IMPORTED SUPABASE CLIENT
+
+# ✅ IMPORT YOUR AGENT
+try:
+    from app.agents.master import master_agent
+except ImportError:
+    print("⚠️ Warning: Could not import 'master_agent'")
+    master_agent = None
+
+# Identical concurrent requests share one run (see run_analysis_once)
+RUN_FLIGHTS = SingleFlight(fresh_s=settings.SINGLEFLIGHT_FRESH_S)
+
+# Run IDs executing in this process (a resume must not race the original run)
+_ACTIVE_RUNS = set()
+
+
+class RunNotResumable(Exception):
+    """Raised by resume_analysis() for unknown, finished or still-running runs."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def build_initial_state(request: dict) -> dict:
+    """Graph input for one analysis request (PredictiveRequest fields as a dict)."""
+    # 1. SETUP TELEMATICS
+    telematics_payload = {
+        "engine_temp_c": request.get("engine_temp_c"),
+        "oil_pressure_psi": request.get("oil_pressure_psi"),
+        "rpm": request.get("rpm"),
+        "battery_voltage": request.get("battery_voltage"),
+        "dtc_readable": request.get("dtc_readable")
+    }
+
+    # Ingestion point: keep the rolling-window feature store current
+    FEATURE_STORE.ingest(request["vehicle_id"], telematics_payload)
+
+    # 2. PREPARE STATE
+    return {
+        "vehicle_id": request["vehicle_id"],
+        "vehicle_metadata": request.get("metadata") or {},
+        "telematics_data": telematics_payload,
+        "detected_issues": [],
+        "rolling_features": FEATURE_STORE.get(request["vehicle_id"]),
+        "risk_score": 0,
+        "diagnosis_report": "",
+        "recommended_action": "Wait",
+        "priority_level": "Low",
+        "voice_transcript": [],
+        "manufacturing_recommendations": "",
+        "ueba_alert_triggered": False,
+        "customer_script": "",
+        "customer_decision": "PENDING",
+        "selected_slot": None,
+        "booking_id": None,
+        "error_message": None,
+        "feedback_request": None,
+        "failed_nodes": [],
+        "prompt_stats": {}
+    }
+
+
+async def persist_result(vehicle_id: str, telematics_payload: dict, result: dict):
+    """Writes the run to Supabase. Failures are logged, never raised."""
+    if settings.DATA_BACKEND == "local":
+        return
+
+    # Prepare the row for 'telematics_logs'
+    db_log = {
+        "vehicle_id": vehicle_id,
+        "timestamp_utc": datetime.utcnow().isoformat(),
+
+        # Map standard columns
+        "engine_temp_c": telematics_payload.get("engine_temp_c"),
+        "oil_pressure_psi": telematics_payload.get("oil_pressure_psi"),
+        "rpm": telematics_payload.get("rpm"),
+        "battery_voltage": telematics_payload.get("battery_voltage"),
+
+        # Map AI Insights
+        "vibration_level": result.get("priority_level", "NORMAL").upper(),
+        "active_dtc_codes": result.get("detected_issues", []), # Stored as Array
+
+        # Map Full JSON Payload (The 'Brain' Dump)
+        "raw_payload": result
+    }
+
+    try:
+        # A. Insert Log (supabase-py is sync -> worker thread)
+        with span("db", "telematics_logs.insert"):
+            await asyncio.to_thread(supabase.table("telematics_logs").insert(db_log).execute)
+
+        # B. Update Vehicle Risk Score (So the Fleet Dashboard sees it instantly)
+        with span("db", "vehicles.update"):
+            await asyncio.to_thread(supabase.table("vehicles").update({
+                "risk_score": result.get("risk_score", 0),
+            }).eq("id", vehicle_id).execute)
+
+        print(f"☁️ [Supabase] Synced AI Analysis for {vehicle_id}")
+
+    except Exception as db_err:
+        # IMPORTANT: Don't crash the run if DB fails, but log it.
+        print(f"⚠️ Warning: Cloud sync failed: {db_err}")
+
+
+def _start_run(request: dict, run_id: str = None):
+    if not master_agent:
+        raise RuntimeError("AI Agent Graph not loaded.")
+
+    # Shared run ID for every span in this run (sampled, or forced by request["trace"])
+    trace = start_trace(run_id=run_id, sample=True if request.get("trace") else None)
+    initial_state = build_initial_state(request)
+
+    # Checkpoint every node's update under the run ID (see resume_analysis)
+    if settings.CHECKPOINTS_ENABLED:
+        CHECKPOINTS.begin(trace.run_id, request, initial_state)
+        bind_checkpoint(trace.run_id)
+    return trace, initial_state
+
+
+def _checkpoint_outcome(run_id: str, result: dict = None, error: Exception = None):
+    if not settings.CHECKPOINTS_ENABLED:
+        return
+    if error is not None:
+        CHECKPOINTS.finish(run_id, FAILED, str(error) or error.__class__.__name__)
+    elif result.get("failed_nodes"):
+        CHECKPOINTS.finish(run_id, PARTIAL, f"Fallback used in: {', '.join(result['failed_nodes'])}")
+    else:
+        CHECKPOINTS.finish(run_id, COMPLETED)
+
+
+def _slot(limiter, vehicle_id: str):
+    """
+    The run's limiter slot. Callers take it before _start_run(), so a run
+    rejected with OverloadedError never leaves a (resumable) checkpoint.
+    """
+    return limiter.slot(vehicle_id) if limiter is not None else nullcontext()
+
+
+async def _invoke(initial_state: dict, run_id: str) -> dict:
+    """ainvoke, recording the run's outcome in the checkpoint store."""
+    _ACTIVE_RUNS.add(run_id)
+    try:
+        # 3. RUN AGENT (async, so one slow LLM chain doesn't block the event loop)
+        result = await master_agent.ainvoke(initial_state)
+    except Exception as e:
+        _checkpoint_outcome(run_id, error=e)
+        raise
+    finally:
+        _ACTIVE_RUNS.discard(run_id)
+    _checkpoint_outcome(run_id, result)
+    return result
+
+
+async def _finish_run(request: dict, initial_state: dict, result: dict, trace) -> dict:
+    # 4. UEBA LOGGING
+    ueba_list = []
+    if result.get("ueba_alert_triggered"):
+        ueba_list.append({"message": "Anomalous telemetry pattern detected"})
+
+    # --- ✅ ENTERPRISE UPDATE: PERSIST TO SUPABASE ---
+    await persist_result(request["vehicle_id"], initial_state["telematics_data"], result)
+
+    # Latest run per vehicle (the fleet table / booking route read it from the run log)
+    try:
+        await asyncio.to_thread(RUN_LOG.append, request["vehicle_id"], RUN, {
+            "run_id": trace.run_id,
+            "risk_score": result.get("risk_score", 0),
+            "detected_issues": result.get("detected_issues", []),
+            "diagnosis": result.get("diagnosis_report"),
+            "telematics_data": initial_state["telematics_data"],
+            "customer_decision": result.get("customer_decision"),
+            "booking_id": result.get("booking_id"),
+            "scheduled_date": result.get("selected_slot"),
+            "voice_transcript": result.get("voice_transcript"),
+            "manufacturing_recommendations": result.get("manufacturing_recommendations"),
+            "ueba_alerts": ueba_list,
+            "timestamp": datetime.now().isoformat(),
+        })
+    except OSError as e:
+        print(f"⚠️ [Run Log] Could not record run for {request['vehicle_id']}: {e}")
+
+    # 5. RESPONSE FIELDS
+    return {
+        "vehicle_id": result["vehicle_id"],
+        "risk_score": result.get("risk_score", 0),
+        "risk_level": result.get("priority_level", "UNKNOWN").upper(),
+        "diagnosis": result.get("diagnosis_report", "No diagnosis generated."),
+        "customer_script": result.get("customer_script"),
+        "booking_id": result.get("booking_id"),
+        "manufacturing_insights": result.get("manufacturing_recommendations"),
+        "audio_url": result.get("audio_url"),
+        "audio_status": result.get("audio_status"),
+        "ueba_alerts": ueba_list,
+        "prompt_stats": result.get("prompt_stats") or None,
+        "failed_nodes": result.get("failed_nodes") or [],
+        "resumable": settings.CHECKPOINTS_ENABLED and bool(result.get("failed_nodes")),
+        "run_id": trace.run_id,
+        "trace": trace.to_dict() if trace.sampled else None
+    }
+
+
+async def run_analysis(request: dict, limiter=None, run_id: str = None) -> dict:
+    """
+    Runs the agent graph for one request and returns the AnalyzeResponse
+    fields. Shared by the blocking /run endpoint and the job queue workers.
+    """
+    async with _slot(limiter, request["vehicle_id"]):
+        trace, initial_state = _start_run(request, run_id)
+        result = await _invoke(initial_state, trace.run_id)
+    return await _finish_run(request, initial_state, result, trace)
+
+
+async def resume_analysis(run_id: str, limiter=None) -> dict:
+    """
+    Re-runs a failed or partial run. Nodes that already succeeded replay their
+    checkpointed update; only the failed nodes (and whatever consumed their
+    output) execute again, so a retry costs just the failed step.
+    """
+    if not master_agent:
+        raise RuntimeError("AI Agent Graph not loaded.")
+    if not settings.CHECKPOINTS_ENABLED:
+        raise RunNotResumable("Checkpoints are disabled (CHECKPOINTS_ENABLED=false).", 409)
+
+    run = CHECKPOINTS.get_run(run_id)
+    if run is None:
+        raise RunNotResumable(f"Unknown run {run_id}", 404)
+    if run["status"] == COMPLETED:
+        raise RunNotResumable(f"Run {run_id} already completed.", 409)
+    if run_id in _ACTIVE_RUNS:
+        raise RunNotResumable(f"Run {run_id} is still executing.", 409)
+
+    request, initial_state = run["request"], run["initial_state"]
+    completed = CHECKPOINTS.completed_updates(run_id)
+    print(f"🔁 [Runner] Resuming run {run_id} ({len(completed)} nodes already done)")
+
+    async with _slot(limiter, request["vehicle_id"]):
+        if run_id in _ACTIVE_RUNS:  # another resume got the slot first
+            raise RunNotResumable(f"Run {run_id} is still executing.", 409)
+        trace = start_trace(run_id=run_id, sample=True if request.get("trace") else None)
+        CHECKPOINTS.retry(run_id)
+        bind_checkpoint(run_id, completed)
+        result = await _invoke(initial_state, run_id)
+    return await _finish_run(request, initial_state, result, trace)
+
+
+# Nodes whose LLM tokens are forwarded by stream_analysis()
+STREAM_TOKEN_NODES = {"diagnosis"}
+
+# State keys worth showing in a stage event (the rest stays in the final result)
+STAGE_FIELDS = ("risk_score", "risk_level", "priority_level", "recommended_action",
+                "customer_decision", "booking_id", "audio_url")
+
+
+async def stream_analysis(request: dict, limiter=None, run_id: str = None):
+    """
+    Same run as run_analysis(), as an async generator of (event, data):
+      "start"  once the run has a slot  {run_id, vehicle_id}
+      "token"  diagnosis LLM chunks     {node, text[, replace]}
+      "stage"  after each graph node    {node, elapsed_ms, ...STAGE_FIELDS it set}
+      "result" the AnalyzeResponse fields (last event)
+    The limiter slot is taken before the first event (and before the run is
+    checkpointed), so OverloadedError is raised before anything has been sent
+    or stored.
+
+    Unlike run_analysis_once(), a stream is never coalesced with an
+    identical run already in flight: each stream needs its own token / stage
+    events, so it always executes the graph itself.
+    """
+    vehicle_id = request["vehicle_id"]
+
+    async with _slot(limiter, vehicle_id):
+        trace, initial_state = _start_run(request, run_id)
+        _ACTIVE_RUNS.add(trace.run_id)
+        try:
+            yield "start", {"run_id": trace.run_id, "vehicle_id": vehicle_id}
+
+            start = time.perf_counter()
+            result = initial_state
+            streamed = {}  # node -> {"id": first LLM message id, "text": streamed so far}
+            async for mode, chunk in master_agent.astream(initial_state,
+                                                          stream_mode=["updates", "messages", "values"]):
+                if mode == "messages":
+                    message, metadata = chunk
+                    node = metadata.get("langgraph_node")
+                    if node in STREAM_TOKEN_NODES and message.content:
+                        # Hedged calls stream twice; follow the first attempt only
+                        entry = streamed.setdefault(node, {"id": message.id, "text": ""})
+                        if message.id == entry["id"]:
+                            entry["text"] += message.content
+                            yield "token", {"node": node, "text": message.content}
+
+                elif mode == "updates":
+                    for node, update in (chunk or {}).items():
+                        update = update or {}
+                        # Cache hits never reach the model, and a hedge may have won with
+                        # different text: send the final text in one piece (replace=True)
+                        final = update.get("diagnosis_report")
+                        if node in STREAM_TOKEN_NODES and final and streamed.get(node, {}).get("text") != final:
+                            yield "token", {"node": node, "text": final, "replace": node in streamed}
+                        yield "stage", {
+                            "node": node,
+                            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+                            **{k: update[k] for k in STAGE_FIELDS if k in update},
+                        }
+
+                else:  # "values": full state after each step; the last one is the result
+                    result = chunk
+        except Exception as e:
+            _checkpoint_outcome(trace.run_id, error=e)
+            raise
+        finally:
+            _ACTIVE_RUNS.discard(trace.run_id)
+        _checkpoint_outcome(trace.run_id, result)
+
+    yield "result", await _finish_run(request, initial_state, result, trace)
+
+
+async def run_analysis_once(request: dict, limiter=None, run_id: str = None) -> dict:
+    """
+    run_analysis() with single-flight: callers sending the same vehicle and
+    readings while a run is in flight (or within SINGLEFLIGHT_FRESH_S of it
+    finishing) get that run's result instead of starting another graph run,
+    so LLM calls, bookings and telematics_logs rows aren't duplicated.
+    """
+    key = f"{request['vehicle_id']}:{input_fingerprint(request)}"
+    result, shared = await RUN_FLIGHTS.do(key, lambda: run_analysis(request, limiter=limiter, run_id=run_id))
+    if shared:
+        print(f"🔁 [Runner] {request['vehicle_id']} joined run {result.get('run_id')}")
+    return {**result, "coalesced": shared}
@@ -1,4 +1,23 @@
-from typing import TypedDict, List, Optional, Dict, Any
+from typing import TypedDict, List, Optional, Dict, Any, Annotated
+
+# --- REDUCERS ---
+# Nodes return partial updates. Keys that parallel branches may write in the
+# same step need a reducer, otherwise LangGraph rejects the concurrent update.
+def merge_errors(left: Optional[str], right: Optional[str]) -> Optional[str]:
+    if not right:
+        return left
+    if not left or right == left:
+        return right
+    return f"{left} | {right}"
+
+def any_flag(left: Optional[bool], right: Optional[bool]) -> bool:
+    return bool(left) or bool(right)
+
+def add_unique(left: Optional[List[str]], right: Optional[List[str]]) -> List[str]:
+    return list(dict.fromkeys((left or []) + (right or [])))
+
+def merge_dicts(left: Optional[Dict], right: Optional[Dict]) -> Dict:
+    return {**(left or {}), **(right or {})}
 
 class AgentState(TypedDict):
     # --- 1. CORE INPUTS ---
@@ -11,6 +30,7 @@ class AgentState(TypedDict):
     risk_score: int
     risk_level: str             # LOW, MEDIUM, HIGH, CRITICAL
     detected_issues: List[str]
+    rolling_features: Optional[Dict[str, Any]]  # 5m/1h window stats from the feature store
     
     # --- 3. DIAGNOSIS LAYER ---
     diagnosis_report: str
@@ -25,14 +45,20 @@ class AgentState(TypedDict):
     # --- 5. SCHEDULING LAYER ---
     selected_slot: Optional[str]
     booking_id: Optional[str]
+    booking_status: Optional[str]  # "CONFIRMED", or "QUEUED" until the fleet batch books it
     scheduled_date: Optional[str] # ✅ Added: For DB updates
     
     # --- 6. OUTPUTS ---
     audio_url: Optional[str]
+    audio_file: Optional[str]
     audio_available: bool
+    audio_status: Optional[str]  # "pending" while the background renderer works, then "ready"
     manufacturing_recommendations: Optional[str]
+    capa_group_id: Optional[str]  # fleet CAPA group this failure belongs to (CAPA_MODE=batch)
     feedback_request: Optional[str]
 
     # --- 7. SYSTEM FLAGS ---
-    error_message: Optional[str]
-    ueba_alert_triggered: bool
\ No newline at end of file
+    error_message: Annotated[Optional[str], merge_errors]
+    ueba_alert_triggered: Annotated[bool, any_flag]
+    failed_nodes: Annotated[List[str], add_unique]  # nodes that fell back after an error (retried on resume)
+    prompt_stats: Annotated[Dict[str, Any], merge_dicts]  # node -> {tokens, budget, items_kept, items_dropped, build_ms}
\ No newline at end of file
@@ -0,0 +1,173 @@
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+
+from app.utils.audio_cache import AUDIO_RENDERER, PENDING, FAILED
+
+router = APIRouter()
+
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9_.-]+\.mp3$")
+_CONTENT_ADDRESSED = re.compile(r"^voice_([0-9a-f]{16})\.mp3$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+CHUNK_SIZE = 256 * 1024
+# Content-addressed files never change under the same name
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# Legacy per-vehicle names are overwritten in place, so always revalidate
+REVALIDATE_CACHE = "public, max-age=0, must-revalidate"
+
+# ==========================================
+# 📦 FILE BODY (zero-copy when the server supports it)
+# ==========================================
+class AudioFileResponse(Response):
+    """
+    Sends bytes [start, end) of `path`. If the ASGI server offers the
+    zero-copy extension the kernel copies the file straight to the socket
+    (sendfile); otherwise the file is read in chunks with os.pread on a
+    worker thread, so the event loop is never blocked on disk I/O.
+    """
+
+    def __init__(self, path: str, start: int, end: int, status_code: int, headers: dict):
+        super().__init__(status_code=status_code, headers=headers, media_type="audio/mpeg")
+        self.path = path
+        self.start = start
+        self.end = end
+        self.headers["content-length"] = str(end - start)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD" or self.end <= self.start:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        # The zero-copy extension expects a file object; the fallback reads its descriptor
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopy", "file": f, "offset": self.start,
+                            "count": self.end - self.start, "more_body": False})
+                return
+            position = self.start
+            while position < self.end:
+                chunk = await anyio.to_thread.run_sync(os.pread, f.fileno(), min(CHUNK_SIZE, self.end - position),
+                                                       position)
+                if not chunk:
+                    break
+                position += len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": position < self.end})
+            if position < self.end:  # file shrank underneath us
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+# ==========================================
+# 🔎 HEADER HELPERS
+# ==========================================
+def _etag(filename: str, st: os.stat_result) -> str:
+    match = _CONTENT_ADDRESSED.match(filename)
+    if match:
+        return f'"{match.group(1)}"'  # the name is the content hash
+    return f'W/"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison."""
+    if header.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == bare for tag in header.split(","))
+
+
+def _not_modified_since(header: str, st: os.stat_result) -> bool:
+    try:
+        return int(st.st_mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def _parse_range(header: str, size: int):
+    """
+    (start, end) for a single 'bytes=' range, None to ignore the header
+    (multiple ranges / other units; a full 200 is always allowed), or
+    ValueError when the range can't be satisfied.
+    """
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if size == 0:  # no byte of an empty file can be addressed
+        raise ValueError("empty file")
+    if not first:  # suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size
+    start = int(first)
+    end = min(int(last) + 1, size) if last else size
+    if start >= size or start >= end:
+        raise ValueError("range outside the file")
+    return start, end
+
+# ==========================================
+# 🔊 ENDPOINT
+# ==========================================
+@router.api_route("/{filename}", methods=["GET", "HEAD"])
+async def get_audio(filename: str, request: Request):
+    """
+    Serves a call recording. Supports Range (206) for seeking, ETag /
+    Last-Modified revalidation (304) and long-lived caching for
+    content-addressed names. Returns 202 while the recording is still being
+    rendered in the background.
+    """
+    if not _SAFE_NAME.match(filename):
+        raise HTTPException(status_code=404, detail="Recording not found")
+
+    status = AUDIO_RENDERER.status(filename)
+    if status == PENDING:
+        return JSONResponse({"status": PENDING, "filename": filename}, status_code=202,
+                            headers={"Retry-After": "2", "Cache-Control": "no-store"})
+    if status == FAILED:
+        raise HTTPException(status_code=500, detail="Rendering this recording failed")
+
+    path = AUDIO_RENDERER.path_for(filename)
+    try:
+        st = await anyio.to_thread.run_sync(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Recording not found")
+
+    etag = _etag(filename, st)
+    last_modified = formatdate(st.st_mtime, usegmt=True)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Cache-Control": IMMUTABLE_CACHE if _CONTENT_ADDRESSED.match(filename) else REVALIDATE_CACHE,
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if (if_none_match and _etag_matches(if_none_match, etag)) or \
+            (not if_none_match and if_modified_since and _not_modified_since(if_modified_since, st)):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range: only honour the range if the client's copy is still current (strong match)
+    range_current = (if_range is None or if_range == last_modified
+                     or (if_range == etag and not etag.startswith("W/")))
+    if range_header and range_current:
+        try:
+            byte_range = _parse_range(range_header, st.st_size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{st.st_size}"})
+
+    if byte_range is None:
+        return AudioFileResponse(path, 0, st.st_size, 200, headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end - 1}/{st.st_size}"
+    return AudioFileResponse(path, start, end, 206, headers)
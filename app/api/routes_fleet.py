@@ -1,8 +1,9 @@
-import uuid
+import asyncio
 from fastapi import APIRouter, HTTPException
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 from database import supabase  # ✅ Supabase Client
+from app.agents.nodes.scheduling import SchedulerService
 
 router = APIRouter()
 
@@ -65,14 +66,21 @@ def resolve_location(lat, lon):
 @router.post("/create")
 async def create_booking(request: BookingRequest):
     """
-    Updates the 'vehicles' table directly.
+    Books the first free slot on/after the requested date in the booking
+    store, then updates the 'vehicles' table.
     """
     try:
-        booking_id = f"BK-{uuid.uuid4().hex[:6].upper()}"
-        
+        booking = await asyncio.to_thread(SchedulerService.book_slot, request.vehicle_id, "Medium",
+                                          request.service_date, request.notes)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="service_date must be YYYY-MM-DD")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    try:
         response = supabase.table("vehicles").update({
             "status": "scheduled",
-            "next_service_due": request.service_date,
+            "next_service_due": booking["slot_date"],
         }).eq("id", request.vehicle_id).execute()
 
         if not response.data:
@@ -80,10 +88,15 @@ async def create_booking(request: BookingRequest):
 
         return {
             "status": "success", 
-            "booking_id": booking_id, 
-            "message": f"Confirmed for {request.service_date}"
+            "booking_id": booking["booking_id"], 
+            "slot": booking["slot"],
+            "message": f"Confirmed for {booking['slot']}"
         }
     except Exception as e:
+        # The vehicle wasn't updated, so don't keep its slot
+        SchedulerService.cancel_booking(booking["booking_id"])
+        if isinstance(e, HTTPException):
+            raise
         print(f"❌ DB Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,19 +1,47 @@
+import json
+import asyncio
 import traceback
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
+from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List, Dict, Any
-from datetime import datetime
-from database import supabase  # ✅ IMPORTED SUPABASE CLIENT
-
-# ✅ IMPORT YOUR AGENT
-try:
-    from app.agents.master import master_agent
-except ImportError:
-    print("⚠️ Warning: Could not import 'master_agent'")
-    master_agent = None
+from app.config import settings
+from app.utils.concurrency import RunLimiter, OverloadedError
+from app.utils.job_queue import JobQueue
+from app.agents.llm_cache import LLM_CACHE
+from app.agents.runner import (run_analysis_once, stream_analysis, resume_analysis,
+                               RunNotResumable, master_agent, RUN_FLIGHTS)
+from app.agents.checkpoints import CHECKPOINTS
+from app.agents.capa_batch import CAPA_GROUPS
+from app.agents.resilience import resilience_stats, LLM_BREAKER
+from app.agents.prompting import get_prompt_totals
+from app.utils.tracing import get_histograms
+from app.utils.audio_cache import AUDIO_RENDERER
+from app.agents.nodes.scheduling import SchedulerService, PENDING_BOOKINGS, SERVICE_CALENDARS
+from app.domain.batch_scheduler import compare_with_greedy
+from app.data.booking_store import BOOKING_STORE
+from app.data.run_log_store import RUN_LOG
 
 router = APIRouter()
 
+# Caps concurrent graph runs (global + per vehicle), see app/config/settings.py
+run_limiter = RunLimiter(
+    max_concurrent=settings.MAX_CONCURRENT_RUNS,
+    max_per_vehicle=settings.MAX_RUNS_PER_VEHICLE,
+    queue_timeout=settings.RUN_QUEUE_TIMEOUT_S,
+)
+
+# Background workers for /jobs (queued runs don't hold an HTTP worker).
+# They share run_limiter's caps and wait for a slot instead of failing.
+job_queue = JobQueue(
+    handler=lambda payload, job_id: run_analysis_once(payload, limiter=run_limiter.waiting(), run_id=job_id),
+    workers=settings.JOB_WORKERS,
+    max_depth=settings.JOB_QUEUE_MAX_DEPTH,
+    result_ttl_s=settings.JOB_RESULT_TTL_S,
+    db_path=settings.JOB_QUEUE_PATH,
+)
+
 # --- MODELS (UNCHANGED) ---
 class PredictiveRequest(BaseModel):
     vehicle_id: str
@@ -23,6 +51,7 @@ class PredictiveRequest(BaseModel):
     rpm: Optional[int] = 1500
     battery_voltage: Optional[float] = 24.0
     dtc_readable: Optional[str] = "None"
+    trace: Optional[bool] = False  # attach per-node timing spans to the response
 
 class AnalyzeResponse(BaseModel):
     vehicle_id: str
@@ -32,7 +61,15 @@ class AnalyzeResponse(BaseModel):
     customer_script: Optional[str] = None
     booking_id: Optional[str] = None
     manufacturing_insights: Optional[str] = None
+    audio_url: Optional[str] = None     # call recording; may still be rendering
+    audio_status: Optional[str] = None  # "pending" | "ready"
     ueba_alerts: Optional[List[Dict[str, Any]]] = []
+    prompt_stats: Optional[Dict[str, Any]] = None  # per-node prompt tokens / budget / build time
+    failed_nodes: Optional[List[str]] = []  # nodes that fell back after an error
+    resumable: Optional[bool] = False       # POST /runs/{run_id}/resume retries just those nodes
+    run_id: Optional[str] = None
+    trace: Optional[Dict[str, Any]] = None
+    coalesced: Optional[bool] = False  # True when the result came from an identical concurrent/recent run
 
 # --- ENDPOINT ---
 @router.post("/run", response_model=AnalyzeResponse)
@@ -43,95 +80,266 @@ async def predict_failure(request: PredictiveRequest):
         if not master_agent:
             raise HTTPException(status_code=500, detail="AI Agent Graph not loaded.")
 
-        # 1. SETUP TELEMATICS
-        telematics_payload = {
-            "engine_temp_c": request.engine_temp_c,
-            "oil_pressure_psi": request.oil_pressure_psi,
-            "rpm": request.rpm,
-            "battery_voltage": request.battery_voltage,
-            "dtc_readable": request.dtc_readable
-        }
-
-        # 2. PREPARE STATE (Same as your mock logic)
-        initial_state = {
-            "vehicle_id": request.vehicle_id,
-            "vehicle_metadata": request.metadata,
-            "telematics_data": telematics_payload,
-            "detected_issues": [],
-            "risk_score": 0,
-            "diagnosis_report": "",
-            "recommended_action": "Wait",
-            "priority_level": "Low",
-            "voice_transcript": [],
-            "manufacturing_recommendations": "",
-            "ueba_alert_triggered": False,
-            "customer_script": "",
-            "customer_decision": "PENDING",
-            "selected_slot": None,
-            "booking_id": None,
-            "error_message": None,
-            "feedback_request": None
-        }
-
-        # 3. RUN AGENT
-        result = master_agent.invoke(initial_state)
-
-        # 4. UEBA LOGGING
-        ueba_list = []
-        if result.get("ueba_alert_triggered"):
-            ueba_list.append({"message": "Anomalous telemetry pattern detected"})
-
-        # --- ✅ ENTERPRISE UPDATE: PERSIST TO SUPABASE ---
-        
-        # Prepare the row for 'telematics_logs'
-        db_log = {
-            "vehicle_id": request.vehicle_id,
-            "timestamp_utc": datetime.utcnow().isoformat(),
-            
-            # Map standard columns
-            "engine_temp_c": telematics_payload.get("engine_temp_c"),
-            "oil_pressure_psi": telematics_payload.get("oil_pressure_psi"),
-            "rpm": telematics_payload.get("rpm"),
-            "battery_voltage": telematics_payload.get("battery_voltage"),
-            
-            # Map AI Insights
-            "vibration_level": result.get("priority_level", "NORMAL").upper(),
-            "active_dtc_codes": result.get("detected_issues", []), # Stored as Array
-            
-            # Map Full JSON Payload (The 'Brain' Dump)
-            "raw_payload": result 
-        }
+        result = await run_analysis_once(request.model_dump(), limiter=run_limiter)
+        return AnalyzeResponse(**result)
 
-        try:
-            # A. Insert Log
-            supabase.table("telematics_logs").insert(db_log).execute()
-            
-            # B. Update Vehicle Risk Score (So the Fleet Dashboard sees it instantly)
-            supabase.table("vehicles").update({
-                "risk_score": result.get("risk_score", 0),
-                # If risk is critical, maybe auto-update status?
-                # "status": "alert" if result.get("risk_score", 0) > 80 else "active"
-            }).eq("id", request.vehicle_id).execute()
-            
-            print(f"☁️ [Supabase] Synced AI Analysis for {request.vehicle_id}")
-            
-        except Exception as db_err:
-            # IMPORTANT: Don't crash the API if DB fails, but log it.
-            print(f"⚠️ Warning: Cloud sync failed: {db_err}")
-
-        # 5. RETURN RESPONSE
-        return AnalyzeResponse(
-            vehicle_id=result["vehicle_id"],
-            risk_score=result.get("risk_score", 0),
-            risk_level=result.get("priority_level", "UNKNOWN").upper(), 
-            diagnosis=result.get("diagnosis_report", "No diagnosis generated."),
-            customer_script=result.get("customer_script"),
-            booking_id=result.get("booking_id"),
-            manufacturing_insights=result.get("manufacturing_recommendations"),
-            ueba_alerts=ueba_list
-        )
+    except OverloadedError as e:
+        print(f"🚦 [API] Rejected {request.vehicle_id}: {e}")
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
+
+    except HTTPException:
+        raise
 
     except Exception as e:
         print(f"❌ Error in prediction endpoint: {e}")
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- STREAMING (Server-Sent Events) ---
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/run/stream")
+async def predict_failure_stream(request: PredictiveRequest):
+    """
+    Same analysis as /run, streamed as SSE: 'start', then 'token' events with
+    the diagnosis as it is generated, a 'stage' event per finished node and
+    finally 'result' (the AnalyzeResponse). Errors after the stream has
+    started arrive as an 'error' event.
+    """
+    print(f"📡 [API] Received Streaming Analysis Request for: {request.vehicle_id}")
+
+    if not master_agent:
+        raise HTTPException(status_code=500, detail="AI Agent Graph not loaded.")
+
+    events = stream_analysis(request.model_dump(), limiter=run_limiter)
+    try:
+        # Pull the first event here so an overload is still a plain 503
+        first = await events.__anext__()
+    except OverloadedError as e:
+        print(f"🚦 [API] Rejected {request.vehicle_id}: {e}")
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
+
+    async def body():
+        try:
+            yield _sse(*first)
+            async for event, data in events:
+                if event == "result":
+                    data = AnalyzeResponse(**data).model_dump()
+                yield _sse(event, data)
+        except Exception as e:
+            print(f"❌ Error in streaming endpoint: {e}")
+            traceback.print_exc()
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# --- CHECKPOINTED RUNS (resume from the last successful node) ---
+@router.get("/runs")
+async def list_checkpointed_runs(status: Optional[str] = None, limit: int = Query(50, ge=1, le=500)):
+    """Recent runs from the checkpoint store (status: running / completed / partial / failed)."""
+    return CHECKPOINTS.list_runs(status=status, limit=limit)
+
+@router.get("/runs/{run_id}")
+async def get_checkpointed_run(run_id: str):
+    """Checkpoint detail for one run: status, attempts and which nodes succeeded."""
+    run = CHECKPOINTS.get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Unknown run {run_id}")
+    run.pop("initial_state", None)
+    return run
+
+@router.post("/runs/{run_id}/resume", response_model=AnalyzeResponse)
+async def resume_run(run_id: str):
+    """Retries a failed/partial run; nodes that already succeeded are replayed, not re-executed."""
+    try:
+        result = await resume_analysis(run_id, limiter=run_limiter)
+        return AnalyzeResponse(**result)
+
+    except RunNotResumable as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    except OverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
+
+    except Exception as e:
+        print(f"❌ Error resuming run {run_id}: {e}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- FLEET CAPA (one engineering report per failure signature) ---
+@router.get("/capa/groups")
+async def list_capa_groups():
+    """Active failure-signature groups (model + DTCs + symptoms), largest first."""
+    return {"stats": CAPA_GROUPS.stats(), "groups": CAPA_GROUPS.list()}
+
+@router.get("/capa/groups/{group_id}")
+async def get_capa_group(group_id: str):
+    group = CAPA_GROUPS.get(group_id)
+    if group is None:
+        raise HTTPException(status_code=404, detail=f"Unknown CAPA group {group_id}")
+    return group
+
+@router.post("/capa/batch")
+async def run_capa_batch(group_id: Optional[List[str]] = Query(None)):
+    """Generates CAPA reports now for every group that needs one (or only the given group_id(s))."""
+    return await CAPA_GROUPS.run_batch(group_ids=set(group_id) if group_id else None)
+
+# --- FLEET BATCH SCHEDULING (many bookings at once, by priority) ---
+class ScheduleRequest(BaseModel):
+    vehicle_id: str
+    priority: str = "High"               # Critical / High / Medium / Low
+    deadline: Optional[str] = None       # ISO datetime; default depends on priority
+    centers: Optional[List[str]] = None  # allowed service centers (default: any)
+
+    @field_validator("deadline")
+    @classmethod
+    def _iso_deadline(cls, value):
+        if value is not None:
+            datetime.fromisoformat(value)  # ValueError -> 422
+        return value
+
+@router.get("/schedule/pending")
+async def list_pending_bookings():
+    """Booking requests waiting for the next fleet batch."""
+    return {"mode": settings.SCHEDULING_MODE, "pending": list(PENDING_BOOKINGS),
+            "centers": {name: cal.stats() for name, cal in SERVICE_CALENDARS.items()}}
+
+@router.post("/schedule/batch")
+async def run_schedule_batch():
+    """Books every pending request now and reports the plan against greedy booking."""
+    return await asyncio.to_thread(SchedulerService.run_booking_batch)
+
+@router.post("/schedule/plan")
+async def plan_schedule(requests: List[ScheduleRequest]):
+    """Dry run: priority plan vs greedy for the given requests. Nothing is booked."""
+    start = (datetime.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    payload = [r.model_dump() for r in requests]
+    return await asyncio.to_thread(compare_with_greedy, payload, SERVICE_CALENDARS, start,
+                                   settings.BOOKING_HORIZON_DAYS)
+
+@router.get("/bookings")
+async def list_bookings(vehicle_id: Optional[str] = None, date: Optional[str] = None,
+                        center: Optional[str] = None):
+    """Confirmed bookings, optionally for one vehicle or one day (YYYY-MM-DD)."""
+    def query():
+        if vehicle_id:
+            bookings = BOOKING_STORE.for_vehicle(vehicle_id)
+        elif date:
+            bookings = BOOKING_STORE.on_date(date, center)
+        else:
+            bookings = BOOKING_STORE.all(limit=500)
+        return {"bookings": bookings, "totals": BOOKING_STORE.stats()}
+
+    # SQLite (and its lock, shared with booking writers) stays off the event loop
+    return await asyncio.to_thread(query)
+
+@router.get("/run-log")
+async def get_run_log_stats():
+    """Segments, compactions and indexed vehicles of the run / booking event log."""
+    return await asyncio.to_thread(RUN_LOG.stats)
+
+@router.get("/run-log/{vehicle_id}")
+async def get_latest_run(vehicle_id: str):
+    """Latest run + booking state of a vehicle, straight from the in-memory index."""
+    state = await asyncio.to_thread(RUN_LOG.latest, vehicle_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"No runs recorded for {vehicle_id}")
+    return state
+
+# --- JOB QUEUE (submit now, poll for the result) ---
+@router.post("/jobs", status_code=202)
+async def submit_job(request: PredictiveRequest):
+    """Queues an analysis run and returns its job ID immediately."""
+    if not master_agent:
+        raise HTTPException(status_code=500, detail="AI Agent Graph not loaded.")
+    try:
+        job = await job_queue.submit(request.model_dump())
+    except OverloadedError as e:
+        print(f"🚦 [API] Job queue full, rejected {request.vehicle_id}")
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
+
+    print(f"📥 [API] Queued job {job['job_id']} for {request.vehicle_id}")
+    return {
+        **job,
+        "status_url": f"/api/predictive/jobs/{job['job_id']}",
+        "result_url": f"/api/predictive/jobs/{job['job_id']}/result",
+    }
+
+@router.get("/jobs")
+async def get_job_queue_stats():
+    """Queue depth, running jobs and worker count."""
+    return job_queue.stats()
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str, wait: float = Query(0, ge=0, le=60)):
+    """Job status. With ?wait=N, holds the request up to N seconds until the job finishes."""
+    job = await job_queue.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job_queue.public(job)
+
+@router.get("/jobs/{job_id}/result", response_model=AnalyzeResponse)
+async def get_job_result(job_id: str, wait: float = Query(0, ge=0, le=60)):
+    """The AnalyzeResponse of a finished job (202 while it is still queued/running)."""
+    job = await job_queue.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != "done":
+        return JSONResponse(status_code=202, content=job_queue.public(job))
+    return AnalyzeResponse(**job["result"])
+
+@router.get("/limits")
+async def get_run_limits():
+    """Current concurrency limiter state (active runs, rejections) and single-flight counters."""
+    return {**run_limiter.stats(), "single_flight": RUN_FLIGHTS.stats()}
+
+
+@router.get("/audio-cache")
+async def get_audio_cache_stats():
+    """Voice recordings on disk, pending renders, cache hits and evictions."""
+    return AUDIO_RENDERER.stats()
+
+
+@router.get("/llm-cache")
+async def get_llm_cache_stats():
+    """Hit rate and size of the LLM response cache."""
+    return LLM_CACHE.stats()
+
+@router.delete("/llm-cache")
+async def invalidate_llm_cache(node: Optional[str] = None, key: Optional[str] = None):
+    """Drops cached responses for one key, one node (e.g. 'diagnosis') or everything."""
+    removed = LLM_CACHE.invalidate(node=node, key=key)
+    return {"removed": removed, "stats": LLM_CACHE.stats()}
+
+
+@router.get("/llm-health")
+async def get_llm_health():
+    """Circuit breaker state / trip count, deadlines, hedging and per-node call outcomes."""
+    return resilience_stats()
+
+@router.post("/llm-health/reset")
+async def reset_llm_breaker():
+    """Closes the circuit breaker by hand (e.g. after Groq recovers)."""
+    LLM_BREAKER.reset()
+    return resilience_stats()
+
+@router.get("/metrics")
+async def get_latency_metrics():
+    """Latency histograms per graph node and external call (node:*, llm:*, db:*, tts:*)."""
+    return get_histograms()
+
+
+@router.get("/prompt-stats")
+async def get_prompt_stats():
+    """Prompt size per node since startup (tokens mean / max, trimmed items, budget)."""
+    return get_prompt_totals()
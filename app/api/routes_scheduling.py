@@ -1,9 +1,8 @@
-import os
-import json
-import uuid
+import asyncio
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from datetime import datetime
+from app.agents.nodes.scheduling import SchedulerService
+from app.data.run_log_store import RUN_LOG, BOOKING
 
 router = APIRouter()
 
@@ -13,45 +12,42 @@ class BookingRequest(BaseModel):
     service_date: str  # YYYY-MM-DD
     notes: str
 
-# 2. File Paths
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-LOG_DIR = os.path.join(BASE_DIR, "data_samples")
-
 @router.post("/create")
 async def create_booking(request: BookingRequest):
     """
-    1. Generates a Booking ID.
-    2. Updates the vehicle's AI Log to say 'Service Booked'.
+    1. Books the first free slot on/after the requested date (booking store).
+    2. Appends a booking event to the vehicle's run log (app/data/run_log_store.py).
     """
-    log_path = os.path.join(LOG_DIR, f"run_log_{request.vehicle_id}.json")
-    
-    # Check if AI has run for this vehicle
-    if not os.path.exists(log_path):
+    # Check if AI has run for this vehicle (index lookup; old run_log_<id>.json files are imported)
+    if await asyncio.to_thread(RUN_LOG.latest, request.vehicle_id) is None:
         raise HTTPException(status_code=404, detail="No AI diagnosis found. Run diagnostics first.")
 
     try:
-        # Load existing log
-        with open(log_path, "r") as f:
-            log_data = json.load(f)
+        booking = await asyncio.to_thread(SchedulerService.book_slot, request.vehicle_id, "Medium",
+                                          request.service_date, request.notes)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="service_date must be YYYY-MM-DD")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
-        # Generate Booking Details
-        booking_id = f"BK-{uuid.uuid4().hex[:6].upper()}"
-        
-        # Update the Log (This changes the status in your Fleet Table!)
-        log_data["customer_decision"] = "accept"
-        log_data["booking_id"] = booking_id
-        log_data["scheduled_date"] = request.service_date
-        log_data["service_notes"] = request.notes
+    try:
+        booking_id = booking["booking_id"]
         
-        # Save back to file
-        with open(log_path, "w") as f:
-            json.dump(log_data, f, indent=4)
+        # Record the booking (This changes the status in your Fleet Table!)
+        await asyncio.to_thread(RUN_LOG.append, request.vehicle_id, BOOKING, {
+            "customer_decision": "accept",
+            "booking_id": booking_id,
+            "scheduled_date": booking["slot_date"],
+            "service_notes": request.notes,
+        })
 
         return {
             "status": "success",
             "booking_id": booking_id,
-            "message": f"Service confirmed for {request.service_date}"
+            "slot": booking["slot"],
+            "message": f"Service confirmed for {booking['slot']}"
         }
 
     except Exception as e:
+        SchedulerService.cancel_booking(booking["booking_id"])
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,141 @@
+import re
+import json
+import random
+import asyncio
+import hashlib
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# ==========================================
+# ⏱️ LATENCY DISTRIBUTIONS
+# ==========================================
+def sample_latency(spec: str, rng: random.Random) -> float:
+    """Seconds drawn from 'fixed:ms', 'uniform:lo:hi' or 'lognormal:median_ms:sigma'."""
+    kind, *args = spec.split(":")
+    args = [float(a) for a in args]
+    if kind == "fixed":
+        return args[0] / 1000
+    if kind == "uniform":
+        return rng.uniform(args[0], args[1]) / 1000
+    if kind == "lognormal":
+        median_ms, sigma = args
+        return rng.lognormvariate(0, sigma) * median_ms / 1000
+    raise ValueError(f"Unknown latency spec '{spec}'")
+
+def seeded_rng(seed: int, text: str) -> random.Random:
+    """Same prompt + same seed -> same latency and same answer."""
+    digest = hashlib.sha256(f"{seed}:{text}".encode("utf-8")).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+# ==========================================
+# 📝 SCHEMA-VALID CANNED RESPONSES
+# ==========================================
+def _severity(prompt: str) -> str:
+    issues = re.search(r"Issues Detected:(.*)", prompt)
+    text = issues.group(1) if issues else prompt
+    if "Critical" in text:
+        return "Critical"
+    if "High" in text or "Low Oil" in text:
+        return "High"
+    return "Medium"
+
+def fake_response(prompt: str) -> str:
+    """Picks a response in the format each agent node parses."""
+    if "Senior Fleet Mechanic" in prompt:
+        severity = _severity(prompt)
+        issue = re.search(r"\* \*\*Issue\*\*: (.*)", prompt)
+        return (
+            "### 🚨 Issue Summary\n"
+            f"* **Issue**: {issue.group(1).strip() if issue else 'Sensor anomaly'}\n\n"
+            "### 📉 Root Cause Analysis\n"
+            "* **Primary Cause**: Coolant circulation loss combined with degraded oil pressure.\n\n"
+            "### 🛠️ Immediate Action Plan\n"
+            "1. Stop the vehicle and inspect coolant level and water pump.\n"
+            "2. Check oil level and oil pump pickup.\n\n"
+            "### ⚠️ Risk Assessment\n"
+            f"* **Severity**: {severity}\n"
+        )
+
+    if "Service Advisor" in prompt:
+        return ("Your vehicle needs urgent attention. We have reserved a service slot "
+                "for you tomorrow. Reply STOP to cancel.")
+
+    if "voice agent" in prompt.lower():
+        return json.dumps([
+            {"speaker": "AI Agent", "text": "Hello, this is your service assistant calling about a critical alert on your vehicle."},
+            {"speaker": "Customer", "text": "Oh no, what happened?"},
+            {"speaker": "AI Agent", "text": "Your engine is overheating. I have booked a service slot for tomorrow morning."},
+            {"speaker": "Customer", "text": "Okay, thank you."},
+        ])
+
+    if "Product Engineer" in prompt:
+        return (
+            "### 🏭 Design Flaw Analysis\n"
+            "* **Vulnerability:** Water pump impeller wear under sustained load.\n"
+            "* **Root Cause:** Polymer impeller material fatigue.\n\n"
+            "### 🔧 Engineering Fix (CAPA)\n"
+            "* **Hardware Upgrade:** Replace polymer impeller with brass.\n"
+            "* **Sensor Logic:** Cross-validate oil pressure against coolant temperature.\n"
+            "* **Fail-Safe Mechanism:** Derate engine above 115°C.\n\n"
+            "### 🧪 Validation Plan\n"
+            "* **Testing:** 500 h HIL endurance run.\n"
+            "* **Expected Result:** 80% fewer field failures.\n"
+        )
+
+    if "Customer Experience" in prompt:
+        return ("Hi! We hope your vehicle is running smoothly after the service. "
+                "Could you rate your experience from 1 to 5?")
+
+    return "Acknowledged."
+
+# ==========================================
+# 🤖 FAKE CHAT MODEL
+# ==========================================
+class FakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for the Groq client. Behaves like a LangChain chat model
+    (callbacks, streaming, ainvoke) so the graph runs unchanged.
+    """
+
+    latency: str = "fixed:0"
+    seed: int = 42
+    model_name: str = "fake-llm"
+    calls: int = 0
+    simulated_seconds: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-llm"
+
+    def _prepare(self, messages: List[BaseMessage]):
+        prompt = "\n".join(str(m.content) for m in messages)
+        rng = seeded_rng(self.seed, prompt)
+        delay = sample_latency(self.latency, rng)
+        self.calls += 1
+        self.simulated_seconds += delay
+        return fake_response(prompt), delay
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        text, delay = self._prepare(messages)
+        time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        text, delay = self._prepare(messages)
+        await asyncio.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _astream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        # Spread the latency over word-sized chunks, like a real token stream
+        text, delay = self._prepare(messages)
+        words = re.findall(r"\S+\s*", text) or [text]
+        for word in words:
+            await asyncio.sleep(delay / len(words))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                await run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
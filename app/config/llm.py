@@ -0,0 +1,57 @@
+import httpx
+from functools import lru_cache
+from langchain_openai import ChatOpenAI
+
+from app.config import settings
+
+# ==========================================
+# 🔌 SHARED HTTP TRANSPORT
+# ==========================================
+# One keep-alive pool for every agent, created on first use (not at import),
+# so TLS handshakes are paid once per connection instead of once per node.
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_KEEPALIVE,
+        keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_S,
+    )
+
+@lru_cache(maxsize=1)
+def get_http_client() -> httpx.Client:
+    return httpx.Client(limits=_limits(), timeout=settings.LLM_TIMEOUT_S)
+
+@lru_cache(maxsize=1)
+def get_async_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(limits=_limits(), timeout=settings.LLM_TIMEOUT_S)
+
+# ==========================================
+# 🤖 LLM FACTORY
+# ==========================================
+@lru_cache(maxsize=1)
+def get_fake_llm():
+    """Offline, deterministic stand-in (LLM_BACKEND=fake). One shared instance so call counters add up."""
+    from app.config.fake_llm import FakeChatModel
+    return FakeChatModel(latency=settings.FAKE_LLM_LATENCY, seed=settings.FAKE_LLM_SEED)
+
+@lru_cache(maxsize=None)
+def get_llm(timeout: float = None, max_retries: int = None) -> ChatOpenAI:
+    """
+    Returns the shared Groq chat client (one instance per timeout/retry combo,
+    all on the same connection pool). Raises ValueError if GROQ_API_KEY is
+    missing, so callers can fall back instead of crashing at import time.
+    """
+    if settings.LLM_BACKEND == "fake":
+        return get_fake_llm()
+
+    if not settings.GROQ_API_KEY:
+        raise ValueError("GROQ_API_KEY is missing from .env file")
+
+    return ChatOpenAI(
+        model=settings.LLM_MODEL,
+        base_url=settings.LLM_BASE_URL,
+        api_key=settings.GROQ_API_KEY,
+        timeout=timeout if timeout is not None else settings.LLM_TIMEOUT_S,
+        max_retries=max_retries if max_retries is not None else settings.LLM_MAX_RETRIES,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+    )
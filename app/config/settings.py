@@ -0,0 +1,251 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ==========================================
+# 🔀 AGENT GRAPH ROUTING
+# ==========================================
+# Risk levels in ascending order (matches app/domain/risk_rules.py)
+RISK_LEVELS = ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+
+# Minimum risk level that goes through the full LLM agent chain.
+# Anything below takes the deterministic template path (no LLM calls).
+# Set to LOW to send every vehicle through the LLM chain.
+LLM_ROUTE_MIN_LEVEL = os.getenv("LLM_ROUTE_MIN_LEVEL", "HIGH").upper()
+if LLM_ROUTE_MIN_LEVEL not in RISK_LEVELS:
+    print(f"⚠️ Unknown LLM_ROUTE_MIN_LEVEL '{LLM_ROUTE_MIN_LEVEL}', using HIGH")
+    LLM_ROUTE_MIN_LEVEL = "HIGH"
+
+# Optional score override: a risk score at or above this always takes the
+# full chain, even if the level is below LLM_ROUTE_MIN_LEVEL.
+LLM_ROUTE_MIN_SCORE = int(os.getenv("LLM_ROUTE_MIN_SCORE", "101"))
+
+# ==========================================
+# 🚦 CONCURRENCY LIMITS (/api/predictive/run)
+# ==========================================
+# Global cap on graph runs executing at once
+MAX_CONCURRENT_RUNS = int(os.getenv("MAX_CONCURRENT_RUNS", "8"))
+# Cap per vehicle (1 = a vehicle is never analysed twice at the same time)
+MAX_RUNS_PER_VEHICLE = int(os.getenv("MAX_RUNS_PER_VEHICLE", "1"))
+# How long a request may wait for a slot before getting a 503
+RUN_QUEUE_TIMEOUT_S = float(os.getenv("RUN_QUEUE_TIMEOUT_S", "0.25"))
+
+# ==========================================
+# 🧠 LLM RESPONSE CACHE
+# ==========================================
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+# In-memory LRU size (entries)
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+# Entries older than this are ignored (memory and disk)
+LLM_CACHE_TTL_S = int(os.getenv("LLM_CACHE_TTL_S", str(6 * 3600)))
+# Persistent tier (SQLite). Empty string = memory only.
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                 "data_samples", "llm_cache.sqlite")
+)
+# Numeric inputs are bucketed so near-identical readings share a cache entry
+LLM_CACHE_TEMP_BUCKET_C = float(os.getenv("LLM_CACHE_TEMP_BUCKET_C", "5"))
+LLM_CACHE_PRESSURE_BUCKET_PSI = float(os.getenv("LLM_CACHE_PRESSURE_BUCKET_PSI", "5"))
+
+# ==========================================
+# 🤖 LLM CLIENT (Groq, OpenAI-compatible API)
+# ==========================================
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+# Per-call defaults (can be overridden per node via get_llm(timeout=..., max_retries=...))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# Shared HTTP connection pool
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+LLM_KEEPALIVE_EXPIRY_S = float(os.getenv("LLM_KEEPALIVE_EXPIRY_S", "60"))
+
+# ==========================================
+# 🧪 OFFLINE BACKENDS (benchmarks / local dev)
+# ==========================================
+# "groq" = real API, "fake" = deterministic offline responses (app/config/fake_llm.py)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq").lower()
+# Latency distribution for the fake LLM: "fixed:<ms>", "uniform:<lo_ms>:<hi_ms>"
+# or "lognormal:<median_ms>:<sigma>"
+FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "lognormal:800:0.35")
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "42"))
+# "gtts" = Google TTS (network), "fake" = offline silent MP3 stub
+TTS_BACKEND = os.getenv("TTS_BACKEND", "gtts").lower()
+FAKE_TTS_LATENCY = os.getenv("FAKE_TTS_LATENCY", "uniform:300:900")
+# "supabase" = live DB, "local" = data_samples/collected_data.json via app/data/repositories.py
+DATA_BACKEND = os.getenv("DATA_BACKEND", "supabase").lower()
+
+# ==========================================
+# 🔭 TRACING
+# ==========================================
+# Master switch for timing spans / histograms
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+# Fraction of runs whose full span list is attached to the result (0 = only on request)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+
+# ==========================================
+# 🧵 JOB QUEUE (/api/predictive/jobs)
+# ==========================================
+# Worker tasks executing queued graph runs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Submissions beyond this many waiting jobs get a 503
+JOB_QUEUE_MAX_DEPTH = int(os.getenv("JOB_QUEUE_MAX_DEPTH", "200"))
+# Finished jobs (status + result) are kept this long
+JOB_RESULT_TTL_S = int(os.getenv("JOB_RESULT_TTL_S", "3600"))
+# Persistent queue (SQLite). Empty string = memory only.
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "")
+
+# ==========================================
+# 🔁 SINGLE-FLIGHT (duplicate run suppression)
+# ==========================================
+# Identical concurrent requests (same vehicle + same readings) share one graph run.
+# A finished result is reused for this many seconds (0 = only coalesce in-flight runs).
+SINGLEFLIGHT_FRESH_S = float(os.getenv("SINGLEFLIGHT_FRESH_S", "10"))
+
+# ==========================================
+# 🔢 PROMPT TOKEN BUDGETS (app/agents/prompting.py)
+# ==========================================
+# tiktoken encoding used for counting (falls back to chars/4 when unavailable)
+PROMPT_TOKEN_ENCODING = os.getenv("PROMPT_TOKEN_ENCODING", "cl100k_base")
+# Max prompt tokens per node; retrieved context is trimmed to fit.
+# Override per node with PROMPT_BUDGET_<NODE>, e.g. PROMPT_BUDGET_DIAGNOSIS=1500
+PROMPT_TOKEN_BUDGET_DEFAULT = int(os.getenv("PROMPT_TOKEN_BUDGET_DEFAULT", "800"))
+PROMPT_TOKEN_BUDGETS = {
+    node: int(os.getenv(f"PROMPT_BUDGET_{node.upper()}", default))
+    for node, default in {
+        "diagnosis": "600",
+        "customer": "450",
+        "manufacturing": "700",
+        "feedback": "250",
+        "voice": "600",
+    }.items()
+}
+
+# ==========================================
+# 📈 MANUAL RETRIEVAL (app/utils/retrieval.py)
+# ==========================================
+# Manual entries the diagnosis prompt may carry, best BM25 score first
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+
+# ==========================================
+# 💾 RUN CHECKPOINTS (app/agents/checkpoints.py)
+# ==========================================
+# Saves every node's state update so a failed run can resume from where it stopped
+CHECKPOINTS_ENABLED = os.getenv("CHECKPOINTS_ENABLED", "true").lower() == "true"
+# SQLite file. Empty string = memory only (resume works until restart).
+CHECKPOINT_PATH = os.getenv(
+    "CHECKPOINT_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                 "data_samples", "checkpoints.sqlite")
+)
+# Runs untouched for this long are deleted
+CHECKPOINT_TTL_S = int(os.getenv("CHECKPOINT_TTL_S", str(24 * 3600)))
+
+# ==========================================
+# 🏭 FLEET CAPA BATCHING (app/agents/capa_batch.py)
+# ==========================================
+# "batch" = runs join a failure-signature group and reference its shared CAPA report
+# "per_run" = every critical run asks the LLM for its own CAPA (old behaviour)
+CAPA_MODE = os.getenv("CAPA_MODE", "batch").lower()
+# How far back diagnoses count towards a group
+CAPA_WINDOW_S = int(os.getenv("CAPA_WINDOW_S", str(24 * 3600)))
+# Background batch interval (0 = only via POST /api/predictive/capa/batch)
+CAPA_BATCH_INTERVAL_S = float(os.getenv("CAPA_BATCH_INTERVAL_S", "300"))
+
+# ==========================================
+# 🔊 VOICE RECORDINGS (app/utils/audio_cache.py)
+# ==========================================
+# true = runs return a pending /audio URL and TTS renders in the background
+# false = the voice node waits for the MP3 (old behaviour)
+TTS_BACKGROUND = os.getenv("TTS_BACKGROUND", "true").lower() == "true"
+# Render threads (gTTS is network-bound)
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "2"))
+# Oldest recordings in app/data_samples are deleted beyond this size
+AUDIO_CACHE_MAX_MB = float(os.getenv("AUDIO_CACHE_MAX_MB", "200"))
+
+# ==========================================
+# 🗓️ SERVICE CALENDAR (app/domain/service_calendar.py)
+# ==========================================
+# Hourly slots from SERVICE_OPEN_HOUR up to (not including) SERVICE_CLOSE_HOUR
+SERVICE_OPEN_HOUR = int(os.getenv("SERVICE_OPEN_HOUR", "9"))
+SERVICE_CLOSE_HOUR = int(os.getenv("SERVICE_CLOSE_HOUR", "18"))
+# Vehicles that can be serviced in parallel (1 = one booking per hour)
+SERVICE_BAYS = int(os.getenv("SERVICE_BAYS", "1"))
+# Service centers and their bay counts, "Name:bays,Name:bays". The first one
+# takes the one-by-one bookings; batch scheduling spreads over all of them.
+SERVICE_CENTERS = {
+    name.strip(): int(bays or SERVICE_BAYS)
+    for name, _, bays in (entry.partition(":") for entry in
+                          os.getenv("SERVICE_CENTERS", f"Main:{SERVICE_BAYS}").split(",") if entry.strip())
+}
+# How many days ahead book_slot looks for a free slot
+BOOKING_HORIZON_DAYS = int(os.getenv("BOOKING_HORIZON_DAYS", "60"))
+
+# ==========================================
+# 📒 BOOKING STORE (app/data/booking_store.py)
+# ==========================================
+# SQLite file shared by every API worker; a (center, date, time, bay) slot can
+# only be booked once. Empty string = memory only (lost on restart).
+BOOKING_DB_PATH = os.getenv(
+    "BOOKING_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                 "data_samples", "bookings.sqlite")
+)
+
+# ==========================================
+# 📜 RUN LOG (app/data/run_log_store.py)
+# ==========================================
+# Append-only run / booking events per vehicle (replaces run_log_<vehicle>.json).
+# Empty string = memory only (lost on restart).
+RUN_LOG_DIR = os.getenv(
+    "RUN_LOG_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                 "data_samples", "run_log")
+)
+# A segment file is sealed at this size; once RUN_LOG_COMPACT_SEGMENTS are
+# sealed they are rewritten as one snapshot per vehicle
+RUN_LOG_SEGMENT_BYTES = int(os.getenv("RUN_LOG_SEGMENT_BYTES", str(4 * 1024 * 1024)))
+RUN_LOG_COMPACT_SEGMENTS = int(os.getenv("RUN_LOG_COMPACT_SEGMENTS", "4"))
+# fsync every event (a power loss can't drop an acknowledged booking)
+RUN_LOG_FSYNC = os.getenv("RUN_LOG_FSYNC", "true").lower() == "true"
+
+# ==========================================
+# 🚚 FLEET BATCH SCHEDULING (app/domain/batch_scheduler.py)
+# ==========================================
+# "immediate" = scheduling_node books each vehicle as it arrives
+# "batch" = requests wait for the next batch, which assigns slots by priority / deadline
+SCHEDULING_MODE = os.getenv("SCHEDULING_MODE", "immediate").lower()
+# Background batch interval (0 = only via POST /api/predictive/schedule/batch)
+SCHEDULING_BATCH_INTERVAL_S = float(os.getenv("SCHEDULING_BATCH_INTERVAL_S", "30"))
+
+# ==========================================
+# 🛡️ LLM RESILIENCE (app/agents/resilience.py)
+# ==========================================
+# Hard deadline per node's LLM call (seconds). Override with LLM_DEADLINE_<NODE>.
+LLM_DEADLINE_DEFAULT_S = float(os.getenv("LLM_DEADLINE_DEFAULT_S", "20"))
+LLM_DEADLINES_S = {
+    node: float(os.getenv(f"LLM_DEADLINE_{node.upper()}", default))
+    for node, default in {
+        "diagnosis": "20",
+        "customer": "10",
+        "manufacturing": "30",
+        "feedback": "10",
+        "voice": "15",
+    }.items()
+}
+# Hedged requests: if a call hasn't answered after this many seconds, send a
+# duplicate and keep whichever returns first (0 = off). LLM_HEDGE_<NODE>_S.
+LLM_HEDGE_AFTER_S = {
+    node: float(os.getenv(f"LLM_HEDGE_{node.upper()}_S", default))
+    for node, default in {"diagnosis": "4"}.items()
+}
+# Shared circuit breaker: opens when at least BREAKER_MIN_CALLS calls in the
+# last BREAKER_WINDOW_S seconds failed at BREAKER_ERROR_RATE or more, then
+# fails fast to the nodes' fallbacks for BREAKER_COOLDOWN_S seconds.
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+BREAKER_WINDOW_S = float(os.getenv("BREAKER_WINDOW_S", "60"))
+BREAKER_COOLDOWN_S = float(os.getenv("BREAKER_COOLDOWN_S", "30"))
@@ -0,0 +1,174 @@
+import sqlite3
+import threading
+import uuid
+from datetime import date, datetime
+from typing import Optional
+
+from app.config import settings
+
+CONFIRMED, CANCELLED = "CONFIRMED", "CANCELLED"
+
+COLUMNS = ("booking_id", "vin", "center", "slot_date", "slot_time", "bay",
+           "service_type", "priority", "status", "notes", "timestamp", "run_id")
+
+
+def new_booking_id() -> str:
+    return f"BK-{uuid.uuid4().hex[:8].upper()}"
+
+# ==========================================
+# 📒 BOOKING STORE (SQLite)
+# ==========================================
+class BookingStore:
+    """
+    Every confirmed service booking, in one SQLite table.
+
+    A partial unique index on (center, slot_date, slot_time, bay) over the
+    non-cancelled rows makes the database the referee: whichever worker
+    inserts a slot first gets it, the other insert fails. The in-memory
+    ServiceCalendar of each worker is only a fast guess of the next free
+    slot; claim_next() retries with the following slot when the guess was
+    already taken by another process. db_path="" keeps everything in memory.
+    """
+
+    def __init__(self, db_path: str = ""):
+        self._lock = threading.Lock()
+        try:
+            self._db = sqlite3.connect(db_path or ":memory:", timeout=30, check_same_thread=False)
+            if db_path:
+                # Readers don't block the writer (several API workers share the file)
+                self._db.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error as e:
+            print(f"⚠️ [Bookings] {db_path} unavailable ({e}), using memory")
+            self._db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS bookings ("
+            " booking_id TEXT PRIMARY KEY, vin TEXT NOT NULL, center TEXT NOT NULL,"
+            " slot_date TEXT NOT NULL, slot_time TEXT NOT NULL, bay INTEGER NOT NULL,"
+            " service_type TEXT, priority TEXT, status TEXT NOT NULL, notes TEXT, timestamp TEXT,"
+            " run_id TEXT)"
+        )
+        # Files written before bookings remembered their agent run
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(bookings)")}
+        if "run_id" not in columns:
+            self._db.execute("ALTER TABLE bookings ADD COLUMN run_id TEXT")
+        self._db.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_bookings_slot"
+            " ON bookings(center, slot_date, slot_time, bay) WHERE status != 'CANCELLED'"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_bookings_vin ON bookings(vin, slot_date)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_bookings_date ON bookings(slot_date, slot_time)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_bookings_run ON bookings(run_id) WHERE run_id IS NOT NULL")
+        self._db.commit()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def insert(self, booking: dict) -> bool:
+        """Saves a booking. False when its slot (or ID) is already taken."""
+        row = {column: booking.get(column) for column in COLUMNS}
+        row["booking_id"] = row["booking_id"] or new_booking_id()
+        row["status"] = row["status"] or CONFIRMED
+        row["timestamp"] = row["timestamp"] or datetime.now().isoformat()
+        with self._lock:
+            try:
+                self._db.execute(
+                    f"INSERT INTO bookings ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    tuple(row[column] for column in COLUMNS)
+                )
+                self._db.commit()
+            except sqlite3.IntegrityError:
+                self._db.rollback()
+                return False
+        booking.update(row)
+        return True
+
+    def claim_next(self, booking: dict, calendar, after: datetime, horizon_days: int) -> Optional[dict]:
+        """
+        Books the first free slot of `calendar` (the ServiceCalendar of
+        booking["center"]) starting at or after `after`. Claim and insert
+        form one step: a slot another worker booked meanwhile stays marked
+        in the calendar and the next one is tried. None when nothing is
+        free within `horizon_days`.
+        """
+        while True:
+            slot = calendar.claim_next(after, horizon_days)
+            if slot is None:
+                return None
+            day, hour, bay = slot
+            row = {**booking, "booking_id": booking.get("booking_id") or new_booking_id(),
+                   "slot_date": day.strftime("%Y-%m-%d"), "slot_time": f"{hour:02d}:00", "bay": bay}
+            try:
+                if self.insert(row):
+                    return row
+            except sqlite3.Error:
+                calendar.release(day, hour, bay)
+                raise
+
+    def cancel(self, booking_id: str) -> Optional[dict]:
+        """Marks a booking cancelled (its slot can be booked again). Returns it, or None."""
+        with self._lock:
+            cur = self._db.execute("UPDATE bookings SET status = ? WHERE booking_id = ? AND status != ?",
+                                   (CANCELLED, booking_id, CANCELLED))
+            self._db.commit()
+        return self.get(booking_id) if cur.rowcount else None
+
+    def hydrate(self, calendars: dict, today: date = None) -> int:
+        """Marks every upcoming booking as taken in `calendars` ({center: ServiceCalendar})."""
+        today = (today or date.today()).isoformat()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT center, slot_date, slot_time, bay FROM bookings"
+                " WHERE status != ? AND slot_date >= ?", (CANCELLED, today)
+            ).fetchall()
+        marked = 0
+        for center, slot_date, slot_time, bay in rows:
+            calendar = calendars.get(center)
+            if calendar is None:
+                continue
+            try:
+                marked += calendar.claim(slot_date, int(slot_time[:2]), bay) is not None
+            except ValueError:
+                pass  # outside the configured opening hours / bays
+        return marked
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def _select(self, where: str = "", args: tuple = (), limit: int = None) -> list:
+        sql = f"SELECT {', '.join(COLUMNS)} FROM bookings {where} ORDER BY slot_date, slot_time, center, bay"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, args).fetchall()]
+
+    def get(self, booking_id: str) -> Optional[dict]:
+        rows = self._select("WHERE booking_id = ?", (booking_id,))
+        return rows[0] if rows else None
+
+    def for_vehicle(self, vin: str, include_cancelled: bool = False) -> list:
+        if include_cancelled:
+            return self._select("WHERE vin = ?", (vin,))
+        return self._select("WHERE vin = ? AND status != ?", (vin, CANCELLED))
+
+    def for_run(self, run_id: str) -> Optional[dict]:
+        """The live booking made by agent run `run_id`, or None."""
+        rows = self._select("WHERE run_id = ? AND status != ?", (run_id, CANCELLED), limit=1)
+        return rows[0] if rows else None
+
+    def on_date(self, slot_date: str, center: str = None) -> list:
+        if center:
+            return self._select("WHERE slot_date = ? AND center = ? AND status != ?",
+                                (slot_date, center, CANCELLED))
+        return self._select("WHERE slot_date = ? AND status != ?", (slot_date, CANCELLED))
+
+    def all(self, limit: int = None) -> list:
+        return self._select("WHERE status != ?", (CANCELLED,), limit)
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM bookings GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+BOOKING_STORE = BookingStore(settings.BOOKING_DB_PATH)
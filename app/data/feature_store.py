@@ -0,0 +1,201 @@
+import time
+import threading
+from datetime import datetime
+
+# ==========================================
+# ⚙️ CONFIGURATION
+# ==========================================
+# Rolling windows (label -> seconds)
+WINDOWS = {"5m": 300, "1h": 3600}
+
+# Per-signal alarm limits. "above" signals breach when value > limit,
+# "below" signals breach when value < limit (matches app/domain/risk_rules.py).
+SIGNALS = {
+    "engine_temp_c": {"limit": 100, "direction": "above"},
+    "oil_pressure_psi": {"limit": 30, "direction": "below"},
+    "rpm": {"limit": 4000, "direction": "above"},
+    "battery_voltage": {"limit": 12.0, "direction": "below"},
+}
+
+# Enough room for the longest window at one reading every 5 seconds
+BUFFER_CAPACITY = 720
+
+
+def _to_epoch(ts):
+    """Accepts epoch seconds, datetime or ISO strings (Supabase 'timestamp_utc')."""
+    if ts is None:
+        return time.time()
+    if isinstance(ts, (int, float)):
+        return float(ts)
+    if isinstance(ts, datetime):
+        return ts.timestamp()
+    try:
+        return datetime.fromisoformat(str(ts).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return time.time()
+
+
+class RingBuffer:
+    """Fixed-size (timestamp, value) buffer. Oldest samples are overwritten."""
+
+    __slots__ = ("times", "values", "capacity", "start", "size")
+
+    def __init__(self, capacity: int = BUFFER_CAPACITY):
+        self.times = [0.0] * capacity
+        self.values = [0.0] * capacity
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+
+    def append(self, ts: float, value: float):
+        idx = (self.start + self.size) % self.capacity
+        self.times[idx] = ts
+        self.values[idx] = value
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def latest_time(self):
+        if not self.size:
+            return None
+        return self.times[(self.start + self.size - 1) % self.capacity]
+
+    def since(self, cutoff: float):
+        """Samples with ts >= cutoff, oldest first (walks back from the newest)."""
+        out = []
+        for i in range(self.size - 1, -1, -1):
+            idx = (self.start + i) % self.capacity
+            if self.times[idx] < cutoff:
+                break
+            out.append((self.times[idx], self.values[idx]))
+        out.reverse()
+        return out
+
+
+def window_features(samples, now: float, limit: float, direction: str) -> dict:
+    """mean / max / slope (units per minute) / seconds spent beyond the limit."""
+    if not samples:
+        return {"mean": None, "max": None, "slope_per_min": 0.0, "breach_s": 0.0}
+
+    values = [v for _, v in samples]
+    n = len(samples)
+    mean = sum(values) / n
+
+    # Least-squares slope over the window
+    slope = 0.0
+    if n > 1:
+        t0 = samples[0][0]
+        xs = [t - t0 for t, _ in samples]
+        x_mean = sum(xs) / n
+        denom = sum((x - x_mean) ** 2 for x in xs)
+        if denom:
+            slope = sum((x - x_mean) * (v - mean) for x, v in zip(xs, values)) / denom * 60
+
+    # Sample-and-hold: each reading counts until the next one arrives
+    breach = 0.0
+    for i, (t, v) in enumerate(samples):
+        t_next = samples[i + 1][0] if i + 1 < n else now
+        beyond = v > limit if direction == "above" else v < limit
+        if beyond:
+            breach += t_next - t
+
+    return {
+        "mean": round(mean, 2),
+        "max": round(max(values), 2),
+        "slope_per_min": round(slope, 3),
+        "breach_s": round(breach, 1),
+    }
+
+
+class FeatureStore:
+    """
+    Per-vehicle rolling-window features, recomputed at ingestion time so that
+    readers (data_analysis_node, diagnosis_node) get the full vector from a
+    single dictionary lookup instead of querying telematics history.
+    """
+
+    def __init__(self, signals=None, windows=None, capacity: int = BUFFER_CAPACITY):
+        self.signals = signals or SIGNALS
+        self.windows = windows or WINDOWS
+        self.capacity = capacity
+        self._buffers = {}   # vehicle_id -> {signal: RingBuffer}
+        self._features = {}  # vehicle_id -> flat feature dict
+        self._lock = threading.Lock()
+
+    def ingest(self, vehicle_id: str, reading: dict, ts=None):
+        """Adds one telematics reading and refreshes the vehicle's feature vector."""
+        now = _to_epoch(ts if ts is not None else reading.get("timestamp_utc"))
+
+        with self._lock:
+            buffers = self._buffers.setdefault(vehicle_id, {})
+            for signal in self.signals:
+                value = reading.get(signal)
+                if value is None:
+                    continue
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    continue
+                buf = buffers.setdefault(signal, RingBuffer(self.capacity))
+                latest = buf.latest_time()
+                # Skip replays of a reading we already have (e.g. same DB row)
+                if latest is not None and now <= latest:
+                    continue
+                buf.append(now, value)
+
+            self._features[vehicle_id] = self._compute(buffers)
+
+    def _compute(self, buffers: dict) -> dict:
+        features = {}
+        for signal, cfg in self.signals.items():
+            buf = buffers.get(signal)
+            if not buf or not buf.size:
+                continue
+            now = buf.latest_time()
+            for label, seconds in self.windows.items():
+                stats = window_features(buf.since(now - seconds), now, cfg["limit"], cfg["direction"])
+                prefix = f"{signal}_{label}"
+                features[f"{prefix}_mean"] = stats["mean"]
+                features[f"{prefix}_max"] = stats["max"]
+                features[f"{prefix}_slope_per_min"] = stats["slope_per_min"]
+                features[f"{prefix}_time_{cfg['direction']}_s"] = stats["breach_s"]
+        return features
+
+    def get(self, vehicle_id: str) -> dict:
+        """Full feature vector for a vehicle ({} if nothing ingested yet)."""
+        return self._features.get(vehicle_id, {})
+
+    def clear(self, vehicle_id: str = None):
+        with self._lock:
+            if vehicle_id is None:
+                self._buffers.clear()
+                self._features.clear()
+            else:
+                self._buffers.pop(vehicle_id, None)
+                self._features.pop(vehicle_id, None)
+
+
+def summarize_features(features: dict) -> str:
+    """Compact text version of a feature vector for LLM prompts."""
+    if not features:
+        return "No rolling history available."
+
+    lines = []
+    for signal, cfg in SIGNALS.items():
+        for label in WINDOWS:
+            prefix = f"{signal}_{label}"
+            if features.get(f"{prefix}_mean") is None:
+                continue
+            breach_key = f"{prefix}_time_{cfg['direction']}_s"
+            lines.append(
+                f"- {signal} [{label}]: mean {features[f'{prefix}_mean']}, "
+                f"max {features[f'{prefix}_max']}, "
+                f"slope {features[f'{prefix}_slope_per_min']}/min, "
+                f"{cfg['direction']} {cfg['limit']} for {features[breach_key]}s"
+            )
+    return "\n".join(lines) if lines else "No rolling history available."
+
+
+# Shared process-wide instance
+FEATURE_STORE = FeatureStore()
@@ -1,6 +1,6 @@
 import json
 import os
-from app.domain.mapping import get_issue_description
+from app.domain.mapping import describe_codes
 
 # Helper to find the project root and the collected data file
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -27,13 +27,11 @@ class TelematicsRepo:
         
         telematics = vehicle_node.get("telematics", {})
         
-        # Enrich the raw codes with human-readable descriptions
+        # Enrich the raw codes with human-readable descriptions in one catalog pass
         # (e.g., P0217 -> "Engine Coolant Over Temp")
-        readable_codes = [
-            f"{code}: {get_issue_description(code)}" 
-            for code in telematics.get("active_dtc_codes", [])
-        ]
-        telematics["dtc_readable"] = readable_codes
+        details = describe_codes(telematics.get("active_dtc_codes", []))
+        telematics["dtc_readable"] = [f"{d['code']}: {d['description']}" for d in details]
+        telematics["dtc_details"] = details
         
         return telematics
 
@@ -0,0 +1,370 @@
+import os
+import re
+import json
+import time
+import zlib
+import struct
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+from app.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Where the old per-vehicle run_log_{vehicle_id}.json files live
+LEGACY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                          "data_samples")
+
+# Frame = payload length + CRC32 of the payload (big endian), then the JSON payload
+_HEADER = struct.Struct(">II")
+_SEGMENT = re.compile(r"^segment_(\d{8})\.log$")
+
+RUN, BOOKING, SNAPSHOT = "run", "booking", "snapshot"
+
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def encode_frame(event: dict) -> bytes:
+    payload = json.dumps(event, default=str, separators=(",", ":")).encode("utf-8")
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_frames(data: bytes):
+    """
+    Yields (event, end_offset) for every intact frame. Stops at the first
+    short or corrupt frame (a write the process didn't finish).
+    """
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        length, crc = _HEADER.unpack_from(data, offset)
+        start = offset + _HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        offset = start + length
+        yield event, offset
+
+# ==========================================
+# 📜 RUN / BOOKING EVENT LOG
+# ==========================================
+class RunLogStore:
+    """
+    Append-only log of run and booking events per vehicle, replacing the
+    rewrite-the-whole-file run_log_{vehicle_id}.json.
+
+    Every event is one length-prefixed, checksummed frame appended to the
+    newest segment file, so a crash can at worst leave a torn last frame
+    (cut off by the next writer) and concurrent updates can't overwrite each
+    other. An in-memory index holds the merged latest state of each vehicle.
+
+    Several processes (API workers) share one directory: appends and
+    compaction hold an exclusive flock on LOCK, and every process remembers
+    how far into the log it has read. A read first checks (two stats) whether
+    the log grew and only then applies the new frames; reads of an unchanged
+    log are answered from the index alone. Segments are sealed at
+    `segment_bytes` and, once `compact_segments` are sealed, rewritten as one
+    snapshot segment (temp file, then os.replace); a process whose position
+    was compacted away rebuilds its index from the snapshot.
+    log_dir="" keeps only the in-memory index.
+    """
+
+    def __init__(self, log_dir: str = "", segment_bytes: int = 4 * 1024 * 1024,
+                 compact_segments: int = 4, fsync: bool = True, legacy_dir: str = LEGACY_DIR):
+        self.log_dir = log_dir
+        self.segment_bytes = segment_bytes
+        self.compact_segments = compact_segments
+        self.fsync = fsync
+        self.legacy_dir = legacy_dir
+        self._lock = threading.Lock()
+        self._index = {}  # vehicle_id -> latest merged state
+        self._seq = 0
+        self._pos = None  # (segment number, inode, offset) read up to
+        self._fd = None
+        self._fd_id = None  # (segment number, inode) the append fd points at
+        self._lock_file = None
+        self.events_appended = 0
+        self.events_replayed = 0
+        self.torn_frames = 0
+        self.compactions = 0
+        self.last_compaction_ms = None
+
+        if log_dir:
+            try:
+                os.makedirs(log_dir, exist_ok=True)
+                self._lock_file = open(os.path.join(log_dir, "LOCK"), "a")
+                with self._file_lock(exclusive=True):
+                    for name in os.listdir(log_dir):
+                        if name.endswith(".tmp"):  # compaction that never finished
+                            os.remove(os.path.join(log_dir, name))
+                    self._catch_up(repair=True)
+            except OSError as e:
+                print(f"⚠️ [Run Log] {log_dir} unavailable ({e}), using memory")
+                self.log_dir = ""
+            if self.events_replayed:
+                print(f"📜 [Run Log] Replayed {self.events_replayed} events for {len(self._index)} vehicles")
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Cross-process lock on the directory (no-op without fcntl, i.e. one process on Windows)."""
+        if fcntl is None or self._lock_file is None:
+            yield
+            return
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    # ------------------------------------------------------------------
+    # Segment files
+    # ------------------------------------------------------------------
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.log_dir, f"segment_{number:08d}.log")
+
+    def _segments(self) -> list:
+        return sorted(int(m.group(1)) for m in map(_SEGMENT.match, os.listdir(self.log_dir)) if m)
+
+    def _is_current(self) -> bool:
+        """True when nothing was written since this process last read the log."""
+        if self._pos is None:
+            return False
+        number, inode, offset = self._pos
+        try:
+            st = os.stat(self._segment_path(number))
+        except FileNotFoundError:
+            return False
+        return (st.st_ino == inode and st.st_size == offset
+                and not os.path.exists(self._segment_path(number + 1)))
+
+    def _catch_up(self, repair: bool = False):
+        """
+        Applies every frame written after this process's position. If that
+        position was compacted away, the index is rebuilt from scratch.
+        `repair` (exclusive lock only) cuts a torn frame off the newest segment.
+        """
+        segments = self._segments()
+        offset = 0
+        if self._pos is not None:
+            number, inode, offset = self._pos
+            try:
+                st = os.stat(self._segment_path(number))
+                valid = st.st_ino == inode and st.st_size >= offset
+            except FileNotFoundError:
+                valid = False
+            if valid:
+                segments = [n for n in segments if n >= number]
+            else:
+                self._index = {}
+                offset = 0
+
+        for number in segments:
+            path = self._segment_path(number)
+            with open(path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                f.seek(offset)
+                data = f.read()
+            good = 0
+            for event, good in decode_frames(data):
+                self._apply(event)
+                self.events_replayed += 1
+            if good < len(data) and (repair or number != segments[-1]):
+                self.torn_frames += 1
+                if number == segments[-1]:
+                    with open(path, "r+b") as f:
+                        f.truncate(offset + good)
+                print(f"⚠️ [Run Log] Dropped {len(data) - good} unreadable bytes at the end of {os.path.basename(path)}")
+            # Without `repair` a torn tail is left for the next writer; don't move past it
+            self._pos = (number, inode, offset + good)
+            offset = 0
+
+    def _refresh(self):
+        if self.log_dir and not self._is_current():
+            with self._file_lock(exclusive=False):
+                self._catch_up()
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+    def _apply(self, event: dict):
+        self._seq = max(self._seq, event.get("seq", 0))
+        vehicle_id = event["vehicle_id"]
+        if event["type"] == SNAPSHOT:
+            self._index[vehicle_id] = dict(event["data"])
+        else:
+            self._index.setdefault(vehicle_id, {"vehicle_id": vehicle_id}).update(event["data"])
+
+    # ------------------------------------------------------------------
+    # Writes (exclusive lock, after catching up)
+    # ------------------------------------------------------------------
+    def _append_fd(self, number: int, inode: int):
+        if self._fd_id != (number, inode):
+            if self._fd is not None:
+                os.close(self._fd)
+            self._fd = os.open(self._segment_path(number), os.O_WRONLY | os.O_APPEND)
+            self._fd_id = (number, inode)
+        return self._fd
+
+    def _write(self, frames: bytes):
+        if self._pos is None:  # empty directory
+            open(self._segment_path(1), "ab").close()
+            self._pos = (1, os.stat(self._segment_path(1)).st_ino, 0)
+        number, inode, offset = self._pos
+        fd = self._append_fd(number, inode)
+        try:
+            if os.write(fd, frames) != len(frames):
+                raise OSError("short write to the run log")
+            if self.fsync:
+                os.fsync(fd)
+        except OSError:
+            # Don't leave a torn frame in front of the next good one
+            os.ftruncate(fd, offset)
+            raise
+        self._pos = (number, inode, offset + len(frames))
+
+    def _append_locked(self, vehicle_id: str, event_type: str, data: dict) -> dict:
+        self._seq += 1
+        event = {"seq": self._seq, "type": event_type, "vehicle_id": vehicle_id,
+                 "ts": datetime.now().isoformat(), "data": data}
+        if self.log_dir:
+            self._write(encode_frame(event))
+        self._apply(event)
+        self.events_appended += 1
+        if self.log_dir and self._pos[2] >= self.segment_bytes:
+            self._rotate()
+        return dict(self._index[vehicle_id])
+
+    def append(self, vehicle_id: str, event_type: str, data: dict) -> dict:
+        """
+        Records a run / booking event (its fields are merged into the
+        vehicle's latest state) and returns the new latest state.
+        """
+        with self._lock, self._file_lock(exclusive=True):
+            if self.log_dir:
+                self._catch_up(repair=True)
+            return self._append_locked(vehicle_id, event_type, data)
+
+    def _rotate(self, force_compact: bool = False):
+        """Starts the next segment; compacts once enough segments are sealed."""
+        sealed = self._segments()
+        number = sealed[-1] + 1
+        open(self._segment_path(number), "ab").close()
+        if force_compact or len(sealed) >= self.compact_segments:
+            self._compact(sealed)
+        # The index already holds everything sealed, so this process reads on from the new segment
+        self._pos = (number, os.stat(self._segment_path(number)).st_ino, 0)
+
+    def _compact(self, sealed: list):
+        """Rewrites the sealed segments as one snapshot per vehicle (crash safe)."""
+        t0 = time.perf_counter()
+        target = self._segment_path(sealed[-1])
+        tmp = target + ".tmp"
+        frames = b"".join(
+            encode_frame({"seq": self._seq, "type": SNAPSHOT, "vehicle_id": vehicle_id,
+                          "ts": datetime.now().isoformat(), "data": state})
+            for vehicle_id, state in self._index.items()
+        )
+        with open(tmp, "wb") as f:
+            f.write(frames)
+            f.flush()
+            os.fsync(f.fileno())
+        # Until the older segments are gone, a replay reads them and then the
+        # snapshot, which resets every vehicle: the index comes out the same
+        os.replace(tmp, target)
+        _fsync_dir(self.log_dir)
+        for number in sealed[:-1]:
+            os.remove(self._segment_path(number))
+        _fsync_dir(self.log_dir)
+        self.compactions += 1
+        self.last_compaction_ms = round((time.perf_counter() - t0) * 1000, 2)
+        print(f"🗜️ [Run Log] Compacted {len(sealed)} segments into {len(self._index)} snapshots "
+              f"in {self.last_compaction_ms} ms")
+
+    def compact(self):
+        """Seals the newest segment and compacts everything written so far."""
+        if not self.log_dir:
+            return
+        with self._lock, self._file_lock(exclusive=True):
+            self._catch_up(repair=True)
+            if self._pos is not None:
+                self._rotate(force_compact=True)
+
+    # ------------------------------------------------------------------
+    # Reads (index; new frames from other workers are applied first)
+    # ------------------------------------------------------------------
+    def _import_legacy(self, vehicle_id: str) -> Optional[dict]:
+        """Loads an old run_log_{vehicle_id}.json once and records it as a snapshot."""
+        if not self.legacy_dir or not re.match(r"^[A-Za-z0-9_.-]+$", vehicle_id):
+            return None
+        path = os.path.join(self.legacy_dir, f"run_log_{vehicle_id}.json")
+        try:
+            with open(path, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock, self._file_lock(exclusive=True):
+            if self.log_dir:
+                self._catch_up(repair=True)
+            if vehicle_id in self._index:  # imported meanwhile (maybe by another worker)
+                return dict(self._index[vehicle_id])
+            self._append_locked(vehicle_id, SNAPSHOT, state)
+        print(f"📥 [Run Log] Imported legacy run_log_{vehicle_id}.json")
+        return dict(state)
+
+    def latest(self, vehicle_id: str) -> Optional[dict]:
+        """Latest merged run/booking state of a vehicle, or None if it never ran."""
+        with self._lock:
+            self._refresh()
+            state = self._index.get(vehicle_id)
+            if state is not None:
+                return dict(state)
+        return self._import_legacy(vehicle_id)
+
+    def vehicles(self) -> list:
+        with self._lock:
+            self._refresh()
+            return sorted(self._index)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refresh()
+            segments = self._segments() if self.log_dir else []
+            return {
+                "persistent": bool(self.log_dir),
+                "vehicles": len(self._index),
+                "segments": len(segments),
+                "segment": self._pos[0] if self._pos else None,
+                "offset": self._pos[2] if self._pos else 0,
+                "events_appended": self.events_appended,
+                "events_replayed": self.events_replayed,
+                "torn_frames": self.torn_frames,
+                "compactions": self.compactions,
+                "last_compaction_ms": self.last_compaction_ms,
+            }
+
+
+RUN_LOG = RunLogStore(
+    log_dir=settings.RUN_LOG_DIR,
+    segment_bytes=settings.RUN_LOG_SEGMENT_BYTES,
+    compact_segments=settings.RUN_LOG_COMPACT_SEGMENTS,
+    fsync=settings.RUN_LOG_FSYNC,
+)
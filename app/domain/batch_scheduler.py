@@ -0,0 +1,284 @@
+# app/domain/batch_scheduler.py
+import bisect
+import heapq
+import statistics
+import time
+from datetime import datetime, timedelta
+
+# Lower rank is served first
+PRIORITY_RANK = {"Critical": 0, "High": 1, "Medium": 2, "Low": 3}
+# Default "serve within" targets (hours from the batch start) when a request has no deadline
+PRIORITY_DEADLINE_H = {"Critical": 24, "High": 72, "Medium": 168, "Low": 336}
+SLOT_HOURS = 1
+
+
+def _deadline(request: dict, start: datetime) -> datetime:
+    deadline = request.get("deadline")
+    if isinstance(deadline, str):
+        deadline = datetime.fromisoformat(deadline)
+    if deadline is None:
+        deadline = start + timedelta(hours=PRIORITY_DEADLINE_H.get(request.get("priority"), 336))
+    elif deadline.tzinfo is not None:
+        # Slots are naive local times; an offset-aware deadline would break comparisons
+        deadline = deadline.astimezone().replace(tzinfo=None)
+    return deadline
+
+
+def _slot_datetime(day, hour: int) -> datetime:
+    return datetime(day.year, day.month, day.day, hour)
+
+# ==========================================
+# 🗓️ ASSIGNMENT
+# ==========================================
+class _Cursors:
+    """
+    Earliest free slot per service center, plus a min-heap over them for
+    requests that can go anywhere. Claimed slots only move a center's cursor
+    forward, so each lookup resumes from the last slot instead of rescanning.
+    Heap entries are invalidated lazily (compared against the live cursor).
+    """
+
+    def __init__(self, calendars: dict, start: datetime, horizon_days: int):
+        self.calendars = calendars
+        self.last_day = start.date().toordinal() + horizon_days
+        self.cursor = {}
+        self.heap = []
+        for name, calendar in calendars.items():
+            self._advance(name, start)
+
+    def _advance(self, name: str, after: datetime):
+        remaining = self.last_day - after.date().toordinal()
+        slot = self.calendars[name].next_free(after, remaining) if remaining > 0 else None
+        self.cursor[name] = slot
+        if slot is not None:
+            heapq.heappush(self.heap, (slot[0], slot[1], slot[2], name))
+
+    def earliest(self, allowed=None):
+        """(slot, center) with the earliest free slot among `allowed` centers (all if None)."""
+        if allowed is None:
+            while self.heap:
+                day, hour, bay, name = self.heap[0]
+                if self.cursor.get(name) == (day, hour, bay):
+                    return (day, hour, bay), name
+                heapq.heappop(self.heap)  # stale
+            return None, None
+        best = None
+        for name in allowed:
+            slot = self.cursor.get(name)
+            if slot is not None and (best is None or slot < best[0]):
+                best = (slot, name)
+        return best if best else (None, None)
+
+    def take(self, name: str, slot: tuple) -> bool:
+        day, hour, bay = slot
+        claimed = self.calendars[name].claim(day, hour, bay) is not None
+        # Whether we got it or someone else did, the cursor moves past it
+        self._advance(name, _slot_datetime(day, hour))
+        return claimed
+
+
+def _rank(request: dict) -> int:
+    return PRIORITY_RANK.get(request.get("priority"), len(PRIORITY_RANK))
+
+
+def _take_earliest(cursors: _Cursors, allowed, not_after: datetime = None):
+    """
+    Claims the earliest free slot among `allowed` centers. With `not_after`,
+    only a slot starting by then is taken. Returns (slot, center) or (None, None).
+    """
+    while True:
+        slot, center = cursors.earliest(allowed)
+        if slot is None or (not_after is not None and _slot_datetime(slot[0], slot[1]) > not_after):
+            return None, None
+        if cursors.take(center, slot):
+            return slot, center
+
+
+def _promote_late(placed: dict, late: list, calendars: dict):
+    """
+    A late request swaps slots with an earlier, less important on-time
+    request whenever that one still meets its deadline in the later slot,
+    so a late Critical isn't queued behind on-time Low requests. Swaps never
+    make anyone miss a deadline.
+    """
+    def slot_time(arrival):
+        day, hour, _ = placed[arrival][3]
+        return _slot_datetime(day, hour)
+
+    def allowed_at(request, center):
+        centers = request.get("centers")
+        return not centers or center in centers
+
+    # On-time requests in slot order
+    on_time = sorted((slot_time(a), a) for a, (req, deadline, _, _) in placed.items()
+                     if slot_time(a) <= deadline)
+    # Nobody on time can take a slot later than this
+    latest_deadline = max((placed[a][1] for _, a in on_time), default=None)
+    for arrival, request, deadline in late:
+        if arrival not in placed:  # unassigned
+            continue
+        late_at = slot_time(arrival)
+        if latest_deadline is None or latest_deadline < late_at:
+            continue
+        rank = _rank(request)
+        for i, (begins, other) in enumerate(on_time):
+            if begins >= late_at:
+                break
+            o_request, o_deadline, o_center, o_slot = placed[other]
+            _, _, center, slot = placed[arrival]
+            if (_rank(o_request) > rank and o_deadline >= late_at
+                    and allowed_at(request, o_center) and allowed_at(o_request, center)):
+                placed[arrival] = (request, deadline, o_center, o_slot)
+                placed[other] = (o_request, o_deadline, center, slot)
+                del on_time[i]
+                bisect.insort(on_time, (late_at, other))
+                if begins <= deadline:
+                    bisect.insort(on_time, (begins, arrival))
+                    latest_deadline = max(latest_deadline, deadline)
+                break
+
+
+def plan_batch(requests: list, calendars: dict, start: datetime, horizon_days: int = 60,
+               strategy: str = "priority") -> dict:
+    """
+    Assigns a slot to every request and claims it in `calendars`
+    ({center name: ServiceCalendar}; pass copies for a dry run).
+
+    Request: {"vehicle_id", "priority", optional "deadline" (datetime/ISO),
+              optional "centers" (allowed center names)}.
+
+    strategy="priority": earliest deadline first (priority, then arrival
+        order break ties); a request takes the earliest free slot across its
+        allowed centers if that slot meets its deadline. If none does, it
+        takes over the slot of the lowest-priority on-time request that is
+        less urgent than itself (that one becomes late); otherwise it is late.
+        Late requests get the remaining slots afterwards, by priority, so
+        they never push an on-time request past its deadline.
+    strategy="greedy": arrival order, each request takes the earliest free
+        slot across its allowed centers (one-by-one booking as it arrives).
+    Both fill the same earliest slots, so the makespan is the same; the
+    priority plan changes who waits and how many deadlines are met.
+    """
+    t0 = time.perf_counter()
+    if strategy not in ("priority", "greedy"):
+        raise ValueError(f"Unknown strategy {strategy!r}")
+
+    cursors = _Cursors(calendars, start, horizon_days)
+    placed = {}  # arrival -> (request, deadline, center, slot)
+    late, unassigned = [], []
+
+    def allowed_centers(request):
+        allowed = request.get("centers") or None
+        return [c for c in allowed if c in calendars] if allowed is not None else None
+
+    indexed = [(arrival, request, _deadline(request, start)) for arrival, request in enumerate(requests)]
+    if strategy == "greedy":
+        late = indexed  # nothing is checked against deadlines
+    else:
+        indexed.sort(key=lambda item: (item[2], _rank(item[1]), item[0]))
+        # On-time requests, least important first: (-rank, -deadline, arrival)
+        on_time = []
+        for arrival, request, deadline in indexed:
+            allowed = allowed_centers(request)
+            slot, center = _take_earliest(cursors, allowed, not_after=deadline)
+            if slot is not None:
+                placed[arrival] = (request, deadline, center, slot)
+                heapq.heappush(on_time, (-_rank(request), -deadline.timestamp(), arrival))
+                continue
+            # Every on-time slot so far starts by this deadline (EDF order), so
+            # a less important request's slot can be handed over
+            skipped, victim = [], None
+            while on_time and -on_time[0][0] > _rank(request):
+                entry = heapq.heappop(on_time)
+                if allowed is None or placed[entry[2]][2] in allowed:
+                    victim = entry
+                    break
+                skipped.append(entry)
+            for entry in skipped:
+                heapq.heappush(on_time, entry)
+            if victim is None:
+                late.append((arrival, request, deadline))
+                continue
+            v_request, v_deadline, center, slot = placed.pop(victim[2])
+            late.append((victim[2], v_request, v_deadline))
+            placed[arrival] = (request, deadline, center, slot)
+            heapq.heappush(on_time, (-_rank(request), -deadline.timestamp(), arrival))
+        late.sort(key=lambda item: (_rank(item[1]), item[2], item[0]))
+
+    for arrival, request, deadline in late:
+        slot, center = _take_earliest(cursors, allowed_centers(request))
+        if slot is None:
+            unassigned.append({"vehicle_id": request.get("vehicle_id"), "priority": request.get("priority"),
+                               "reason": f"no free slot within {horizon_days} days"})
+            continue
+        placed[arrival] = (request, deadline, center, slot)
+
+    if strategy == "priority" and late:
+        _promote_late(placed, late, calendars)
+
+    assignments = []
+    for arrival in sorted(placed):
+        request, deadline, center, (day, hour, bay) = placed[arrival]
+        begins = _slot_datetime(day, hour)
+        assignments.append({
+            "vehicle_id": request.get("vehicle_id"),
+            "priority": request.get("priority"),
+            "arrival": arrival,
+            "center": center,
+            "slot_date": day.strftime("%Y-%m-%d"),
+            "slot_time": f"{hour:02d}:00",
+            "bay": bay,
+            "wait_h": round((begins - start).total_seconds() / 3600, 2),
+            "deadline": deadline.isoformat(),
+            "deadline_met": begins <= deadline,
+        })
+
+    return {
+        "strategy": strategy,
+        "assignments": assignments,
+        "unassigned": unassigned,
+        "metrics": plan_metrics(assignments, unassigned),
+        "plan_ms": round((time.perf_counter() - t0) * 1000, 2),
+    }
+
+# ==========================================
+# 📊 PLAN QUALITY
+# ==========================================
+def plan_metrics(assignments: list, unassigned: list = ()) -> dict:
+    waits = [a["wait_h"] for a in assignments]
+    by_priority = {}
+    for a in assignments:
+        by_priority.setdefault(a["priority"], []).append(a["wait_h"])
+    ordered = sorted(waits)
+    return {
+        "assigned": len(assignments),
+        "unassigned": len(unassigned),
+        # Hours from the batch start until the last vehicle's slot ends
+        "makespan_h": round(max(waits) + SLOT_HOURS, 2) if waits else 0.0,
+        "mean_wait_h": round(statistics.mean(waits), 2) if waits else 0.0,
+        "p95_wait_h": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] if ordered else 0.0,
+        "mean_wait_h_by_priority": {p: round(statistics.mean(w), 2)
+                                    for p, w in sorted(by_priority.items(),
+                                                       key=lambda kv: PRIORITY_RANK.get(kv[0], 99))},
+        "deadline_misses": sum(1 for a in assignments if not a["deadline_met"]),
+    }
+
+
+def compare_with_greedy(requests: list, calendars: dict, start: datetime, horizon_days: int = 60) -> dict:
+    """Plans the batch both ways on copies of `calendars`; nothing is claimed."""
+    plans = {strategy: plan_batch(requests, {n: c.copy() for n, c in calendars.items()},
+                                  start, horizon_days, strategy)
+             for strategy in ("priority", "greedy")}
+    best, greedy = plans["priority"]["metrics"], plans["greedy"]["metrics"]
+    critical = "Critical"
+    return {
+        "priority": {**best, "plan_ms": plans["priority"]["plan_ms"]},
+        "greedy": {**greedy, "plan_ms": plans["greedy"]["plan_ms"]},
+        "improvement": {
+            "makespan_h": round(greedy["makespan_h"] - best["makespan_h"], 2),
+            "mean_wait_h": round(greedy["mean_wait_h"] - best["mean_wait_h"], 2),
+            "critical_mean_wait_h": round(greedy["mean_wait_h_by_priority"].get(critical, 0.0)
+                                          - best["mean_wait_h_by_priority"].get(critical, 0.0), 2),
+            "deadline_misses": greedy["deadline_misses"] - best["deadline_misses"],
+        },
+    }
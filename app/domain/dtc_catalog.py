@@ -0,0 +1,151 @@
+# app/domain/dtc_catalog.py
+import csv
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), "dtc_catalog.csv")
+
+UNKNOWN_DESCRIPTION = "Unknown Diagnostic Trouble Code"
+SEVERITIES = ("low", "medium", "high", "critical")
+
+# SAE J2012 encoding: the letter is the top two bits of the 16-bit code
+_LETTER_BITS = {"P": 0, "C": 1, "B": 2, "U": 3}
+_LETTERS = "PCBU"
+_CODE = re.compile(r"^[PCBU][0-9A-F]{4}$")
+
+# Subsystem by the third character of generic powertrain codes (P0xxx / P2xxx)
+_POWERTRAIN_SYSTEMS = {
+    "1": "Fuel & Air Metering", "2": "Fuel & Air Metering", "3": "Ignition / Misfire",
+    "4": "Emissions Control", "5": "Speed & Idle Control", "6": "Computer & Outputs",
+    "7": "Transmission", "8": "Transmission", "9": "Transmission", "A": "Hybrid / EV",
+}
+_LETTER_SYSTEMS = {"B": "Body", "C": "Chassis", "U": "Network"}
+
+
+def encode(code: str) -> int:
+    """'P0217' -> 0x0217, 'U0100' -> 0x30100. Raises ValueError on malformed codes."""
+    code = str(code).strip().upper()
+    if not _CODE.match(code):
+        raise ValueError(f"Not a DTC: {code!r}")
+    return (_LETTER_BITS[code[0]] << 16) | int(code[1:], 16)
+
+
+def decode(value: int) -> str:
+    return f"{_LETTERS[value >> 16]}{value & 0xFFFF:04X}"
+
+
+def infer_system(code: str) -> str:
+    """Best-effort subsystem for codes that aren't in the catalog."""
+    code = str(code).strip().upper()
+    if not _CODE.match(code):
+        return "Unknown"
+    if code[0] == "P":
+        return _POWERTRAIN_SYSTEMS.get(code[2], "Powertrain") if code[1] in "02" else "Powertrain (Manufacturer)"
+    return _LETTER_SYSTEMS[code[0]]
+
+# ==========================================
+# 🔎 SORTED-ARRAY INDEX
+# ==========================================
+class DTCCatalog:
+    """
+    The bundled catalog as parallel arrays sorted by encoded code: a uint32
+    array of codes (searched with bisect), uint8 system / severity ids and a
+    list of descriptions. Exact lookups are one bisect; prefix and range
+    queries are two bisects and a slice.
+    """
+
+    def __init__(self, rows):
+        rows = sorted((encode(r["code"]), r) for r in rows)
+        self.system_names = sorted({r["system"] for _, r in rows})
+        system_ids = {name: i for i, name in enumerate(self.system_names)}
+        self.codes = array("I", (code for code, _ in rows))
+        self.systems = array("B", (system_ids[r["system"]] for _, r in rows))
+        self.severities = array("B", (SEVERITIES.index(r["severity"]) for _, r in rows))
+        self.descriptions = [r["description"] for _, r in rows]
+
+    @classmethod
+    def load(cls, path: str = CATALOG_PATH) -> "DTCCatalog":
+        with open(path, "r", newline="") as f:
+            return cls(csv.DictReader(f))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _entry(self, i: int) -> dict:
+        return {
+            "code": decode(self.codes[i]),
+            "description": self.descriptions[i],
+            "system": self.system_names[self.systems[i]],
+            "severity": SEVERITIES[self.severities[i]],
+            "known": True,
+        }
+
+    def _index_of(self, code: str) -> int:
+        try:
+            value = encode(code)
+        except ValueError:
+            return -1
+        i = bisect_left(self.codes, value)
+        return i if i < len(self.codes) and self.codes[i] == value else -1
+
+    def lookup(self, code: str):
+        """Catalog entry for one code, or None."""
+        i = self._index_of(code)
+        return self._entry(i) if i >= 0 else None
+
+    def range(self, start: str, end: str) -> list:
+        """Every catalog code between `start` and `end`, inclusive."""
+        lo = bisect_left(self.codes, encode(start))
+        hi = bisect_right(self.codes, encode(end))
+        return [self._entry(i) for i in range(lo, hi)]
+
+    def prefix(self, prefix: str) -> list:
+        """
+        Codes starting with `prefix`; trailing 'x's are wildcards, so
+        'P03', 'P03xx' and 'p03XX' all return the misfire/ignition block.
+        """
+        prefix = str(prefix).strip().upper().rstrip("X")
+        if not prefix:
+            return [self._entry(i) for i in range(len(self.codes))]
+        pad = 5 - len(prefix)
+        if pad < 0:
+            return []
+        if len(prefix) == 1:
+            if prefix not in _LETTER_BITS:
+                return []
+            return self.range(prefix + "0000", prefix + "FFFF")
+        try:
+            return self.range(prefix + "0" * pad, prefix + "F" * pad)
+        except ValueError:
+            return []
+
+    def translate(self, codes) -> list:
+        """Catalog entries for a list of codes, in order; unknown codes get an inferred system."""
+        results = []
+        for code in codes or []:
+            i = self._index_of(code)
+            if i >= 0:
+                results.append(self._entry(i))
+            else:
+                results.append({
+                    "code": str(code).strip().upper(),
+                    "description": UNKNOWN_DESCRIPTION,
+                    "system": infer_system(code),
+                    "severity": None,
+                    "known": False,
+                })
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "codes": len(self.codes),
+            "systems": {name: self.systems.count(i) for i, name in enumerate(self.system_names)},
+            "index_bytes": self.codes.itemsize * len(self.codes)
+                           + self.systems.itemsize * len(self.systems)
+                           + self.severities.itemsize * len(self.severities),
+        }
+
+
+DTC_CATALOG = DTCCatalog.load()
@@ -1,5 +1,8 @@
 # app/domain/mapping.py
+from app.domain.dtc_catalog import DTC_CATALOG, UNKNOWN_DESCRIPTION
 
+# Project-specific wording; takes precedence over the bundled catalog
+# (app/domain/dtc_catalog.csv), which covers every other code.
 DTC_MAPPING = {
     "P0217": "Engine Coolant Over Temperature Condition",
     "P0524": "Engine Oil Pressure Too Low",
@@ -7,5 +10,24 @@ DTC_MAPPING = {
     "P0171": "System Too Lean (Bank 1)"
 }
 
+# Severity for a DTC_MAPPING code the catalog doesn't list (its system is inferred)
+MAPPING_DEFAULT_SEVERITY = "medium"
+
 def get_issue_description(code: str) -> str:
-    return DTC_MAPPING.get(code, "Unknown Diagnostic Trouble Code")
\ No newline at end of file
+    code = str(code).strip().upper()
+    if code in DTC_MAPPING:
+        return DTC_MAPPING[code]
+    entry = DTC_CATALOG.lookup(code)
+    return entry["description"] if entry else UNKNOWN_DESCRIPTION
+
+def describe_codes(codes) -> list:
+    """Bulk translation: [{code, description, system, severity, known}] in input order."""
+    entries = DTC_CATALOG.translate(codes)
+    for entry in entries:
+        if entry["code"] in DTC_MAPPING:
+            entry["description"] = DTC_MAPPING[entry["code"]]
+            if not entry["known"]:
+                # Known to the project even though the bundled catalog lacks it
+                entry["severity"] = MAPPING_DEFAULT_SEVERITY
+                entry["known"] = True
+    return entries
@@ -1,8 +1,9 @@
 # app/domain/risk_rules.py
 
-def calculate_risk_score(telematics_data: dict) -> dict:
+def calculate_risk_score(telematics_data: dict, features: dict = None) -> dict:
     """
     Analyzes telematics data and returns a risk score (0-100) and level.
+    Optional `features` (from app/data/feature_store.py) add trend-based rules.
     """
     score = 0
     reasons = []
@@ -37,6 +38,24 @@ def calculate_risk_score(telematics_data: dict) -> dict:
         score += 30
         reasons.append(f"Active Fault Codes Detected: {len(dtc_codes)}")
 
+    # 4. Check Trends (Key: rolling window features)
+    # A single reading can be noise; sustained or rising values are not.
+    if features:
+        hot_seconds = features.get("engine_temp_c_5m_time_above_s", 0)
+        if hot_seconds >= 120:
+            score += 10
+            reasons.append(f"Sustained High Temperature ({int(hot_seconds)}s in last 5 min)")
+
+        temp_slope = features.get("engine_temp_c_5m_slope_per_min", 0)
+        if temp_slope >= 2:
+            score += 10
+            reasons.append(f"Rising Engine Temperature (+{temp_slope}°C/min)")
+
+        oil_slope = features.get("oil_pressure_psi_5m_slope_per_min", 0)
+        if oil_slope <= -2:
+            score += 10
+            reasons.append(f"Falling Oil Pressure ({oil_slope} psi/min)")
+
     # Cap score at 100
     score = min(score, 100)
 
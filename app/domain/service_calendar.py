@@ -0,0 +1,167 @@
+# app/domain/service_calendar.py
+import threading
+from datetime import date, datetime
+from typing import Optional, Tuple
+
+
+class ServiceCalendar:
+    """
+    Hourly service slots of one service center as one bitmap per day.
+
+    Bit `hour_index * bays + bay` is set when that bay is taken at that hour,
+    so the lowest clear bit of a day is its earliest free slot (lowest bay
+    first). Claim / release / lookup are single bit operations; days nobody
+    booked aren't stored at all. next_free() walks forward one day at a time
+    and finds the first free slot of each day with one mask + lowest-bit step.
+    """
+
+    def __init__(self, open_hour: int = 9, close_hour: int = 18, bays: int = 1):
+        if not 0 <= open_hour < close_hour <= 24:
+            raise ValueError(f"Invalid opening hours {open_hour}-{close_hour}")
+        if bays < 1:
+            raise ValueError("A service center needs at least one bay")
+        self.open_hour = open_hour
+        self.close_hour = close_hour
+        self.bays = bays
+        self.hours = close_hour - open_hour
+        self.full_mask = (1 << (self.hours * bays)) - 1
+        self._hour_mask = (1 << bays) - 1  # all bays of one hour
+        self._days = {}  # date ordinal -> taken bitmap
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Bit helpers
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _ordinal(day) -> int:
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        if isinstance(day, datetime):
+            day = day.date()
+        return day.toordinal()
+
+    def _bit(self, hour: int, bay: int) -> int:
+        if not self.open_hour <= hour < self.close_hour:
+            raise ValueError(f"{hour:02d}:00 is outside opening hours")
+        if not 0 <= bay < self.bays:
+            raise ValueError(f"Bay {bay} does not exist (bays: {self.bays})")
+        return (hour - self.open_hour) * self.bays + bay
+
+    def _slot(self, ordinal: int, bit: int) -> Tuple[date, int, int]:
+        hour_index, bay = divmod(bit, self.bays)
+        return date.fromordinal(ordinal), self.open_hour + hour_index, bay
+
+    def _first_free(self, ordinal: int, from_hour: int) -> Optional[int]:
+        """Lowest free bit of a day at or after `from_hour`, or None."""
+        if from_hour >= self.close_hour:
+            return None
+        start = max(0, from_hour - self.open_hour) * self.bays
+        free = ~self._days.get(ordinal, 0) & self.full_mask & ~((1 << start) - 1)
+        if not free:
+            return None
+        return (free & -free).bit_length() - 1
+
+    # ------------------------------------------------------------------
+    # Single slots
+    # ------------------------------------------------------------------
+    def is_free(self, day, hour: int, bay: int = None) -> bool:
+        taken = self._days.get(self._ordinal(day), 0)
+        if bay is not None:
+            return not taken >> self._bit(hour, bay) & 1
+        return (taken >> self._bit(hour, 0)) & self._hour_mask != self._hour_mask
+
+    def free_bays(self, day, hour: int) -> list:
+        taken = self._days.get(self._ordinal(day), 0) >> self._bit(hour, 0)
+        return [bay for bay in range(self.bays) if not taken >> bay & 1]
+
+    def claim(self, day, hour: int, bay: int = None) -> Optional[int]:
+        """
+        Takes `bay` (or the first free bay) at `hour` on `day`.
+        Returns the bay, or None when it (or every bay) is already taken.
+        """
+        ordinal = self._ordinal(day)
+        with self._lock:
+            taken = self._days.get(ordinal, 0)
+            if bay is None:
+                free = ~(taken >> self._bit(hour, 0)) & self._hour_mask
+                if not free:
+                    return None
+                bay = (free & -free).bit_length() - 1
+            bit = 1 << self._bit(hour, bay)
+            if taken & bit:
+                return None
+            self._days[ordinal] = taken | bit
+            return bay
+
+    def release(self, day, hour: int, bay: int = 0) -> bool:
+        """Frees a slot. Returns False if it wasn't taken."""
+        ordinal = self._ordinal(day)
+        bit = 1 << self._bit(hour, bay)
+        with self._lock:
+            taken = self._days.get(ordinal, 0)
+            if not taken & bit:
+                return False
+            taken &= ~bit
+            if taken:
+                self._days[ordinal] = taken
+            else:
+                del self._days[ordinal]
+            return True
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def _search(self, after: datetime, horizon_days: int):
+        """(ordinal, bit) of the first free slot starting at or after `after`."""
+        ordinal = after.date().toordinal()
+        # A slot that already started doesn't count
+        from_hour = after.hour + (1 if (after.minute, after.second, after.microsecond) != (0, 0, 0) else 0)
+        for offset in range(horizon_days):
+            bit = self._first_free(ordinal + offset, from_hour if offset == 0 else self.open_hour)
+            if bit is not None:
+                return ordinal + offset, bit
+        return None
+
+    def next_free(self, after: datetime, horizon_days: int = 365) -> Optional[Tuple[date, int, int]]:
+        """First free (day, hour, bay) starting at or after `after`, within `horizon_days` days."""
+        found = self._search(after, horizon_days)
+        return self._slot(*found) if found else None
+
+    def claim_next(self, after: datetime, horizon_days: int = 365) -> Optional[Tuple[date, int, int]]:
+        """next_free() + claim() as one atomic step."""
+        with self._lock:
+            found = self._search(after, horizon_days)
+            if found is None:
+                return None
+            ordinal, bit = found
+            self._days[ordinal] = self._days.get(ordinal, 0) | (1 << bit)
+        return self._slot(ordinal, bit)
+
+    def copy(self) -> "ServiceCalendar":
+        """Independent copy (for what-if planning)."""
+        clone = ServiceCalendar(self.open_hour, self.close_hour, self.bays)
+        with self._lock:
+            clone._days = dict(self._days)
+        return clone
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def day_load(self, day) -> int:
+        """Number of taken slots on `day`."""
+        return bin(self._days.get(self._ordinal(day), 0)).count("1")
+
+    def stats(self) -> dict:
+        with self._lock:
+            taken = sum(bin(m).count("1") for m in self._days.values())
+            full = sum(1 for m in self._days.values() if m == self.full_mask)
+            days = len(self._days)
+        return {
+            "hours": f"{self.open_hour:02d}:00-{self.close_hour:02d}:00",
+            "bays": self.bays,
+            "slots_per_day": self.hours * self.bays,
+            "days_with_bookings": days,
+            "full_days": full,
+            "slots_taken": taken,
+        }
+
@@ -1,12 +1,40 @@
+import asyncio
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # ✅ FIX 1: Correct Imports matching your file structure (app/api/routes_*.py)
 # You do not have a 'routers' folder, so we import directly from app.api
-from app.api import routes_predictive, routes_telematics, routes_fleet
+from app.api import routes_predictive, routes_telematics, routes_fleet, routes_audio
+from app.agents.capa_batch import capa_batch_loop
+from app.agents.nodes.scheduling import booking_batch_loop
+from app.config import settings
 
-app = FastAPI(title="Predictive Maintenance AI API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Job queue workers live as long as the server (recovers persisted jobs on start)
+    await routes_predictive.job_queue.start()
+
+    # Fleet CAPA reports are generated in periodic batches, not per run
+    capa_task = None
+    if settings.CAPA_MODE == "batch" and settings.CAPA_BATCH_INTERVAL_S > 0:
+        capa_task = asyncio.create_task(capa_batch_loop(settings.CAPA_BATCH_INTERVAL_S))
+
+    # Fleet batch scheduling books queued requests together, by priority
+    booking_task = None
+    if settings.SCHEDULING_MODE == "batch" and settings.SCHEDULING_BATCH_INTERVAL_S > 0:
+        booking_task = asyncio.create_task(booking_batch_loop(settings.SCHEDULING_BATCH_INTERVAL_S))
+
+    yield
+
+    if capa_task:
+        capa_task.cancel()
+    if booking_task:
+        booking_task.cancel()
+    await routes_predictive.job_queue.stop()
+
+app = FastAPI(title="Predictive Maintenance AI API", lifespan=lifespan)
 
 # --- CORS SETUP ---
 app.add_middleware(
@@ -21,6 +49,8 @@ app.add_middleware(
 app.include_router(routes_predictive.router, prefix="/api/predictive", tags=["AI"])
 app.include_router(routes_telematics.router, prefix="/api/telematics", tags=["Data"])
 app.include_router(routes_fleet.router, prefix="/api/fleet", tags=["Fleet"])
+# Call recordings (audio_url from the voice agent)
+app.include_router(routes_audio.router, prefix="/audio", tags=["Audio"])
 
 @app.get("/")
 def health_check():
@@ -0,0 +1,164 @@
+import os
+import re
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import settings
+from app.utils.tts import synthesize_speech
+
+# app/data_samples (where voice_interaction_node has always written recordings)
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data_samples")
+
+# Content-addressed recordings plus the old per-vehicle ones; both are evictable
+_MANAGED_FILE = re.compile(r"^(voice_[0-9a-f]{16}|voice_recording_.+)\.mp3$")
+
+READY, PENDING, FAILED, MISSING = "ready", "pending", "failed", "missing"
+
+# ==========================================
+# 🔊 BACKGROUND TTS RENDERER
+# ==========================================
+class AudioRenderer:
+    """
+    Renders call scripts to MP3 on a small thread pool, off the graph run.
+    Files are named by a hash of (TTS backend, script), so a script that was
+    already rendered is served from disk and never synthesized again, and
+    concurrent submissions of the same script share one render. After each
+    render the oldest recordings are deleted until the directory holds at
+    most `max_bytes` of audio.
+    """
+
+    def __init__(self, audio_dir: str, max_bytes: int, workers: int):
+        self.audio_dir = audio_dir
+        self.max_bytes = max_bytes
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts")
+        self._pending = {}  # filename -> Future
+        self._failed = {}   # filename -> error
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.renders = 0
+        self.evicted = 0
+
+    @staticmethod
+    def filename_for(text: str) -> str:
+        digest = hashlib.sha256(f"{settings.TTS_BACKEND}|en|{text}".encode("utf-8")).hexdigest()
+        return f"voice_{digest[:16]}.mp3"
+
+    def path_for(self, filename: str) -> str:
+        return os.path.join(self.audio_dir, filename)
+
+    def submit(self, text: str) -> dict:
+        """
+        Queues `text` for rendering unless it is cached or already queued.
+        Returns {"filename", "path", "url", "status"} immediately.
+        """
+        filename = self.filename_for(text)
+        path = self.path_for(filename)
+        with self._lock:
+            try:
+                os.utime(path)  # keeps frequently reused recordings out of eviction
+                cached = True
+            except FileNotFoundError:
+                cached = False
+            if cached:
+                self.hits += 1
+                status = READY
+            else:
+                if filename not in self._pending:
+                    self._failed.pop(filename, None)
+                    self._pending[filename] = self._pool.submit(self._render, text, filename)
+                status = PENDING
+        return {"filename": filename, "path": path, "url": f"/audio/{filename}", "status": status}
+
+    def _render(self, text: str, filename: str):
+        path = self.path_for(filename)
+        tmp_path = f"{path}.{threading.get_ident()}.part"
+        try:
+            os.makedirs(self.audio_dir, exist_ok=True)
+            synthesize_speech(text, tmp_path)
+            os.replace(tmp_path, path)  # readers never see a half-written file
+            self.renders += 1
+            print(f"🔊 [Audio] Rendered {filename}")
+        except Exception as e:
+            print(f"❌ [Audio] Rendering {filename} failed: {e}")
+            with self._lock:
+                self._failed[filename] = str(e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(filename, None)
+        self._evict(keep=filename)
+
+    def _evict(self, keep: str = None):
+        try:
+            names = [n for n in os.listdir(self.audio_dir) if _MANAGED_FILE.match(n)]
+        except FileNotFoundError:
+            return
+        files = []
+        for name in names:
+            try:
+                st = os.stat(self.path_for(name))
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, name))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):  # least recently rendered/used first
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            try:
+                os.remove(self.path_for(name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evicted += 1
+            print(f"🧹 [Audio] Evicted {name} ({size} bytes)")
+
+    def status(self, filename: str) -> str:
+        with self._lock:
+            if filename in self._pending:
+                return PENDING
+            if filename in self._failed:
+                return FAILED
+        return READY if os.path.exists(self.path_for(filename)) else MISSING
+
+    def wait(self, filename: str, timeout: float = None) -> str:
+        """Blocks until a pending render finishes (benchmarks / scripts)."""
+        with self._lock:
+            future = self._pending.get(filename)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+        return self.status(filename)
+
+    def stats(self) -> dict:
+        try:
+            sizes = [os.path.getsize(self.path_for(n)) for n in os.listdir(self.audio_dir)
+                     if _MANAGED_FILE.match(n)]
+        except FileNotFoundError:
+            sizes = []
+        with self._lock:
+            pending, failed = len(self._pending), len(self._failed)
+        return {
+            "files": len(sizes),
+            "bytes": sum(sizes),
+            "max_bytes": self.max_bytes,
+            "pending": pending,
+            "failed": failed,
+            "cache_hits": self.hits,
+            "renders": self.renders,
+            "evicted": self.evicted,
+        }
+
+
+AUDIO_RENDERER = AudioRenderer(
+    audio_dir=AUDIO_DIR,
+    max_bytes=int(settings.AUDIO_CACHE_MAX_MB * 1024 * 1024),
+    workers=settings.TTS_WORKERS,
+)
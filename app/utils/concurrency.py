@@ -0,0 +1,83 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class OverloadedError(Exception):
+    """Raised when a run can't get a slot within the queue timeout."""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RunLimiter:
+    """
+    Caps concurrent agent runs globally and per vehicle.
+    Callers wait at most `queue_timeout` seconds for a slot; after that they
+    get OverloadedError so the API can answer 503 immediately instead of
+    letting requests pile up behind slow LLM chains.
+    """
+
+    def __init__(self, max_concurrent: int, max_per_vehicle: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_per_vehicle = max_per_vehicle
+        self.queue_timeout = queue_timeout
+        self._global = asyncio.Semaphore(max_concurrent)
+        self._vehicles = {}  # vehicle_id -> [semaphore, users]
+        self.active = 0
+        self.rejected = 0
+
+    async def _acquire(self, sem: asyncio.Semaphore, what: str, wait: bool):
+        if wait:
+            await sem.acquire()
+            return
+        try:
+            await asyncio.wait_for(sem.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise OverloadedError(f"Too many concurrent runs ({what}). Try again shortly.")
+
+    @asynccontextmanager
+    async def slot(self, vehicle_id: str, wait: bool = False):
+        """`wait=True` waits for a slot as long as it takes (background workers)."""
+        entry = self._vehicles.setdefault(vehicle_id, [asyncio.Semaphore(self.max_per_vehicle), 0])
+        entry[1] += 1
+        try:
+            await self._acquire(entry[0], f"vehicle {vehicle_id}", wait)
+            try:
+                await self._acquire(self._global, "global", wait)
+                self.active += 1
+                try:
+                    yield
+                finally:
+                    self.active -= 1
+                    self._global.release()
+            finally:
+                entry[0].release()
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._vehicles.pop(vehicle_id, None)
+
+    def waiting(self) -> "WaitingLimiter":
+        """The same limits, but slot() waits instead of raising OverloadedError."""
+        return WaitingLimiter(self)
+
+    def stats(self) -> dict:
+        return {
+            "active_runs": self.active,
+            "max_concurrent": self.max_concurrent,
+            "max_per_vehicle": self.max_per_vehicle,
+            "vehicles_in_flight": len(self._vehicles),
+            "rejected": self.rejected,
+        }
+
+
+class WaitingLimiter:
+    """RunLimiter view for queued jobs: they share the caps but never get rejected."""
+
+    def __init__(self, limiter: RunLimiter):
+        self.limiter = limiter
+
+    def slot(self, vehicle_id: str):
+        return self.limiter.slot(vehicle_id, wait=True)
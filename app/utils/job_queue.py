@@ -0,0 +1,233 @@
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import traceback
+from typing import Optional
+
+from app.utils.concurrency import OverloadedError
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueue:
+    """
+    Bounded in-process worker pool for graph runs.
+
+    submit() returns a job ID straight away; `workers` asyncio tasks pull jobs
+    and await `handler(payload, job_id)`. When more than `max_depth` jobs are
+    waiting, submit() raises OverloadedError, so overload shows up as queue
+    depth instead of HTTP timeouts. With `db_path` set, jobs are also written
+    to SQLite: queued/running jobs are picked up again after a restart and
+    finished results stay readable.
+    """
+
+    def __init__(self, handler, workers: int, max_depth: int,
+                 result_ttl_s: int = 3600, db_path: str = ""):
+        self.handler = handler
+        self.workers = workers
+        self.max_depth = max_depth
+        self.result_ttl_s = result_ttl_s
+        self._jobs = {}     # job_id -> record dict
+        self._events = {}   # job_id -> asyncio.Event (set when finished)
+        self._queue = None
+        self._tasks = []
+        self._db = None
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+        if db_path:
+            try:
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS jobs ("
+                    " job_id TEXT PRIMARY KEY, vehicle_id TEXT, payload TEXT, status TEXT,"
+                    " result TEXT, error TEXT, submitted_at REAL, started_at REAL, finished_at REAL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ [Job Queue] Persistence disabled: {e}")
+                self._db = None
+
+    # ------------------------------------------
+    # Lifecycle
+    # ------------------------------------------
+    async def start(self):
+        """Starts the workers (idempotent) and re-queues unfinished persisted jobs."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        for job in self._recover():
+            self._jobs[job["job_id"]] = job
+            self._events[job["job_id"]] = asyncio.Event()
+            self._queue.put_nowait(job["job_id"])
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        print(f"🧵 [Job Queue] {self.workers} workers started ({self._queue.qsize()} recovered jobs)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _recover(self):
+        if self._db is None:
+            return []
+        rows = self._db.execute(
+            "SELECT job_id, vehicle_id, payload, submitted_at FROM jobs"
+            " WHERE status IN (?, ?) ORDER BY submitted_at", (QUEUED, RUNNING)
+        ).fetchall()
+        return [self._record(r[0], r[1], json.loads(r[2]), r[3]) for r in rows]
+
+    # ------------------------------------------
+    # Submit / lookup
+    # ------------------------------------------
+    @staticmethod
+    def _record(job_id, vehicle_id, payload, submitted_at):
+        return {
+            "job_id": job_id,
+            "vehicle_id": vehicle_id,
+            "payload": payload,
+            "status": QUEUED,
+            "result": None,
+            "error": None,
+            "submitted_at": submitted_at,
+            "started_at": None,
+            "finished_at": None,
+        }
+
+    async def submit(self, payload: dict) -> dict:
+        await self.start()
+        self._prune()
+
+        depth = self._queue.qsize()
+        if depth >= self.max_depth:
+            self.rejected += 1
+            # Rough drain time for the backlog ahead of this request
+            raise OverloadedError(f"Job queue full ({depth} waiting). Try again shortly.",
+                                  retry_after=max(1, depth // max(self.workers, 1)))
+
+        job = self._record(uuid.uuid4().hex[:12], payload.get("vehicle_id"), payload, time.time())
+        self._jobs[job["job_id"]] = job
+        self._events[job["job_id"]] = asyncio.Event()
+        self._save(job)
+        self._queue.put_nowait(job["job_id"])
+        return self.public(job, position=depth + 1)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is None and self._db is not None:
+            row = self._db.execute(
+                "SELECT job_id, vehicle_id, payload, status, result, error,"
+                " submitted_at, started_at, finished_at FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row:
+                job = dict(zip(["job_id", "vehicle_id", "payload", "status", "result", "error",
+                                "submitted_at", "started_at", "finished_at"], row))
+                job["payload"] = json.loads(job["payload"])
+                job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """Long-poll: returns the job once finished or after `timeout` seconds."""
+        event = self._events.get(job_id)
+        if event is not None and timeout > 0:
+            try:
+                await asyncio.wait_for(event.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.get(job_id)
+
+    def public(self, job: dict, position: int = None) -> dict:
+        """Status view of a job (no payload / result body)."""
+        view = {
+            "job_id": job["job_id"],
+            "vehicle_id": job["vehicle_id"],
+            "status": job["status"],
+            "error": job["error"],
+            "submitted_at": job["submitted_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+        }
+        if position is not None:
+            view["queue_position"] = position
+        if job["started_at"]:
+            view["queued_s"] = round(job["started_at"] - job["submitted_at"], 3)
+        if job["finished_at"] and job["started_at"]:
+            view["run_s"] = round(job["finished_at"] - job["started_at"], 3)
+        return view
+
+    # ------------------------------------------
+    # Workers
+    # ------------------------------------------
+    async def _worker(self, index: int):
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            try:
+                if job is None:
+                    continue
+                job["status"] = RUNNING
+                job["started_at"] = time.time()
+                self._save(job)
+                try:
+                    job["result"] = await self.handler(job["payload"], job_id)
+                    job["status"] = DONE
+                    self.completed += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"❌ [Job Queue] Job {job_id} failed: {e}")
+                    traceback.print_exc()
+                    job["status"] = FAILED
+                    job["error"] = str(e) or e.__class__.__name__
+                    self.failed += 1
+                job["finished_at"] = time.time()
+                self._save(job)
+                self._events[job_id].set()
+            finally:
+                self._queue.task_done()
+
+    # ------------------------------------------
+    # Persistence / housekeeping
+    # ------------------------------------------
+    def _save(self, job: dict):
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, vehicle_id, payload, status, result, error,"
+            " submitted_at, started_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job["job_id"], job["vehicle_id"], json.dumps(job["payload"], default=str),
+             job["status"], json.dumps(job["result"], default=str) if job["result"] else None,
+             job["error"], job["submitted_at"], job["started_at"], job["finished_at"])
+        )
+        self._db.commit()
+
+    def _prune(self):
+        """Forgets finished jobs older than result_ttl_s."""
+        cutoff = time.time() - self.result_ttl_s
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished_at"] and job["finished_at"] < cutoff]
+        for job_id in expired:
+            self._jobs.pop(job_id, None)
+            self._events.pop(job_id, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (cutoff,))
+            self._db.commit()
+
+    def stats(self) -> dict:
+        running = sum(1 for job in self._jobs.values() if job["status"] == RUNNING)
+        return {
+            "workers": self.workers,
+            "started": bool(self._tasks),
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_depth": self.max_depth,
+            "running": running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "persistent": self._db is not None,
+        }
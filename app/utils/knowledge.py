@@ -1,27 +1,160 @@
 import json
 import os
+import re
+import threading
 
 # Load the JSON data
 KB_PATH = os.path.join(os.path.dirname(__file__), "../knowledge_base.json")
 
+DTC_PATTERN = re.compile(r"\b[PBCU][0-9A-F]{4}\b", re.IGNORECASE)
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_GRAM = 3  # n-gram size of the substring index
+
+
 def load_knowledge_base():
     with open(KB_PATH, "r") as f:
         return json.load(f)
 
+
+def _grams(text: str) -> set:
+    return {text[i:i + _GRAM] for i in range(len(text) - _GRAM + 1)}
+
+# ==========================================
+# 📚 IN-MEMORY INDEX
+# ==========================================
+class _Snapshot:
+    """One parsed version of the knowledge base plus its lookup tables."""
+
+    def __init__(self, kb: list, stamp: tuple):
+        self.stamp = stamp
+        self.entries = [{"part": item["subcategory"], "steps": item["diagnosis_steps"]} for item in kb]
+        self.symptoms = []      # distinct lowercased symptom strings
+        self.symptom_entries = []  # symptom id -> entry ids, in KB order
+        self.grams = {}         # trigram -> set of symptom ids
+        self.tokens = {}        # word token -> set of symptom ids
+        self.codes = {}         # DTC code -> entry ids mentioning it
+
+        symptom_ids = {}
+        for entry_id, item in enumerate(kb):
+            for symptom in item["symptoms"]:
+                text = symptom.lower()
+                sid = symptom_ids.get(text)
+                if sid is None:
+                    sid = symptom_ids[text] = len(self.symptoms)
+                    self.symptoms.append(text)
+                    self.symptom_entries.append([])
+                    for gram in _grams(text):
+                        self.grams.setdefault(gram, set()).add(sid)
+                    for token in _TOKEN_PATTERN.findall(text):
+                        self.tokens.setdefault(token, set()).add(sid)
+                if entry_id not in self.symptom_entries[sid]:
+                    self.symptom_entries[sid].append(entry_id)
+
+            text = f"{item.get('subcategory', '')} {' '.join(item['symptoms'])} {json.dumps(item['diagnosis_steps'])}"
+            for code in DTC_PATTERN.findall(text):
+                ids = self.codes.setdefault(code.upper(), [])
+                if entry_id not in ids:
+                    ids.append(entry_id)
+
+        self.results = {}  # lowered term -> entry ids (memo for this version)
+
+    def _matching_symptoms(self, term: str) -> set:
+        if len(term) >= _GRAM:
+            # Every trigram of the term must occur in the symptom; verify the
+            # substring afterwards so matches stay exactly the linear scan's.
+            candidates = None
+            for gram in sorted(_grams(term), key=lambda g: len(self.grams.get(g, ()))):
+                ids = self.grams.get(gram)
+                if not ids:
+                    return set()
+                candidates = set(ids) if candidates is None else candidates & ids
+                if not candidates:
+                    return set()
+            return {sid for sid in candidates if term in self.symptoms[sid]}
+        if term.isalnum():
+            # A short alphanumeric term can only match inside a single word
+            return {sid for token, ids in self.tokens.items() if term in token for sid in ids}
+        return {sid for sid, text in enumerate(self.symptoms) if term in text}
+
+    def entry_ids(self, term: str) -> list:
+        key = term.lower()
+        ids = self.results.get(key)
+        if ids is None:
+            found = set()
+            for sid in self._matching_symptoms(key):
+                found.update(self.symptom_entries[sid])
+            found.update(self.codes.get(term.upper(), ()))
+            ids = sorted(found)  # KB order, like the original scan
+            if len(self.results) < 4096:
+                self.results[key] = ids
+        return ids
+
+
+class KnowledgeIndex:
+    """
+    Loads the knowledge base once and reloads it only when the file changes
+    (mtime / size). Lookups keep the original semantics: a term matches an
+    entry when it is a case-insensitive substring of one of its symptoms.
+    DTC codes mentioned anywhere in an entry match that entry as well.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.reloads = 0
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _stamp(self) -> tuple:
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def snapshot(self) -> _Snapshot:
+        stamp = self._stamp()
+        snap = self._snapshot
+        if snap is not None and snap.stamp == stamp:
+            return snap
+        with self._lock:
+            if self._snapshot is None or self._snapshot.stamp != stamp:
+                with open(self.path, "r") as f:
+                    kb = json.load(f)
+                self._snapshot = _Snapshot(kb, stamp)
+                self.reloads += 1
+                print(f"📚 [Knowledge] Indexed {len(kb)} entries "
+                      f"({len(self._snapshot.symptoms)} symptoms, {len(self._snapshot.codes)} DTC codes)")
+            return self._snapshot
+
+    def lookup_many(self, terms) -> dict:
+        """{term: [{"part", "steps"}]} for every term, against one KB version."""
+        snap = self.snapshot()
+        results = {}
+        for term in terms:
+            term = str(term)
+            if term not in results:
+                results[term] = [dict(snap.entries[i]) for i in snap.entry_ids(term)]
+        return results
+
+    def stats(self) -> dict:
+        snap = self._snapshot
+        return {
+            "entries": len(snap.entries) if snap else 0,
+            "symptoms": len(snap.symptoms) if snap else 0,
+            "dtc_codes": len(snap.codes) if snap else 0,
+            "memoized_terms": len(snap.results) if snap else 0,
+            "reloads": self.reloads,
+        }
+
+
+KNOWLEDGE_INDEX = KnowledgeIndex(KB_PATH)
+
+
 def find_diagnosis_steps(symptom_keyword: str):
     """
     Searches the Knowledge Base for parts related to a symptom.
     Example: Input 'overheating' -> Returns steps for Radiator, Water Pump, etc.
     """
-    kb = load_knowledge_base()
-    relevant_steps = []
-
-    for item in kb:
-        # Check if the symptom keyword exists in the item's symptom list
-        if any(symptom_keyword.lower() in s.lower() for s in item["symptoms"]):
-            relevant_steps.append({
-                "part": item["subcategory"],
-                "steps": item["diagnosis_steps"]
-            })
-    
-    return relevant_steps
\ No newline at end of file
+    return KNOWLEDGE_INDEX.lookup_many([symptom_keyword])[str(symptom_keyword)]
+
+
+def find_diagnosis_steps_bulk(terms) -> dict:
+    """Same as find_diagnosis_steps for several terms in one pass: {term: hits}."""
+    return KNOWLEDGE_INDEX.lookup_many(terms)
@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import threading
+
+import numpy as np
+
+from app.config import settings
+from app.utils.knowledge import KB_PATH
+
+# ==========================================
+# ✂️ TOKENIZATION
+# ==========================================
+_WORD = re.compile(r"[a-z0-9]+")
+_DTC = re.compile(r"\b[PBCU][0-9A-F]{4}\b", re.IGNORECASE)
+_STOPWORDS = {
+    "a", "an", "and", "at", "by", "for", "from", "in", "is", "of", "on", "or",
+    "the", "to", "with", "when", "while", "check", "inspect", "c", "psi",
+}
+
+# Domain wording the manual doesn't use literally (stemmed forms). Expansions
+# are added to the query at EXPANSION_WEIGHT.
+QUERY_SYNONYMS = {
+    "overheat": ["hot", "temperature", "coolant"],
+    "hot": ["overheat", "temperature", "coolant"],
+    "temp": ["temperature", "coolant"],
+    "oil": ["lubrication", "pressure"],
+    "misfire": ["rough", "idle", "spark", "ignition"],
+    "lean": ["fuel", "vacuum", "air"],
+    "battery": ["electrical", "charging", "alternator"],
+    "voltage": ["electrical", "battery", "alternator"],
+    "rpm": ["idle", "engine"],
+}
+EXPANSION_WEIGHT = 0.5
+
+# Field boosts (term frequency multipliers) for BM25
+FIELD_WEIGHTS = {"symptoms": 2.0, "category": 1.5, "steps": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "ed", "s"):
+        if word.endswith(suffix) and len(word) > len(suffix) + 2:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> list:
+    return [_stem(w) for w in _WORD.findall(str(text).lower()) if w not in _STOPWORDS]
+
+
+def _entry_fields(item: dict) -> dict:
+    steps = []
+    for s in item.get("diagnosis_steps", []):
+        if isinstance(s, dict):
+            steps.append(s.get("step", ""))
+            steps.extend(s.get("result", []))
+        else:
+            steps.append(str(s))
+    return {
+        "symptoms": " ".join(item.get("symptoms", [])),
+        "category": f"{item.get('category', '')} {item.get('subcategory', '')}",
+        "steps": " ".join(steps),
+    }
+
+# ==========================================
+# 📈 BM25 INDEX (term-major sparse matrix)
+# ==========================================
+class ManualRetriever:
+    """
+    BM25 over the service manual. The weight matrix is precomputed at load
+    time and stored column-compressed (one slice of doc ids + weights per
+    term), so scoring a query is a gather + bincount over the query terms'
+    slices. Reloads when knowledge_base.json changes, like KnowledgeIndex.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._stamp = None
+        self._lock = threading.Lock()
+        self.entries = []
+        self.vocab = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.float32)
+
+    def _ensure_fresh(self):
+        st = os.stat(self.path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp != self._stamp:
+                with open(self.path, "r") as f:
+                    self._build(json.load(f))
+                self._stamp = stamp
+
+    def _build(self, kb: list):
+        doc_tf = []  # per doc: {term: boosted tf}
+        for item in kb:
+            tf = {}
+            for field, text in _entry_fields(item).items():
+                for token in tokenize(text):
+                    tf[token] = tf.get(token, 0.0) + FIELD_WEIGHTS[field]
+            doc_tf.append(tf)
+
+        n_docs = len(kb)
+        lengths = np.array([sum(tf.values()) for tf in doc_tf], dtype=np.float64)
+        avg_len = lengths.mean() if n_docs else 1.0
+        vocab = {t: i for i, t in enumerate(sorted({t for tf in doc_tf for t in tf}))}
+
+        # COO triplets -> sorted by term -> CSC arrays
+        rows, cols, tfs = [], [], []
+        for doc, tf in enumerate(doc_tf):
+            for term, freq in tf.items():
+                rows.append(doc)
+                cols.append(vocab[term])
+                tfs.append(freq)
+        rows = np.array(rows, dtype=np.int32)
+        cols = np.array(cols, dtype=np.int64)
+        tfs = np.array(tfs, dtype=np.float64)
+
+        df = np.bincount(cols, minlength=len(vocab))
+        idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows] / avg_len)
+        weights = idf[cols] * tfs * (BM25_K1 + 1) / (tfs + norm)
+
+        order = np.argsort(cols, kind="stable")
+        self.doc_ids = rows[order]
+        self.weights = weights[order].astype(np.float32)
+        self.indptr = np.concatenate(([0], np.cumsum(df))).astype(np.int64)
+        self.vocab = vocab
+        self.entries = [{"part": item["subcategory"], "category": item.get("category"),
+                         "steps": item["diagnosis_steps"]} for item in kb]
+        print(f"📈 [Retrieval] BM25 index: {n_docs} entries, {len(vocab)} terms, {len(self.weights)} weights")
+
+    def _query_weights(self, query: str) -> dict:
+        terms = {}
+        for token in tokenize(query):
+            terms[token] = terms.get(token, 0.0) + 1.0
+            for synonym in QUERY_SYNONYMS.get(token, ()):
+                terms.setdefault(synonym, EXPANSION_WEIGHT)
+        return terms
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every entry for `query` (float32 array, KB order)."""
+        self._ensure_fresh()
+        cols = [(self.vocab[t], w) for t, w in self._query_weights(query).items() if t in self.vocab]
+        if not cols:
+            return np.zeros(len(self.entries), dtype=np.float32)
+        starts = self.indptr[[c for c, _ in cols]]
+        ends = self.indptr[[c + 1 for c, _ in cols]]
+        lengths = ends - starts
+        # Flattened positions of every query term's slice
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        query_w = np.repeat(np.array([w for _, w in cols], dtype=np.float32), lengths)
+        return np.bincount(self.doc_ids[positions], weights=self.weights[positions] * query_w,
+                           minlength=len(self.entries)).astype(np.float32)
+
+    def top_k(self, query: str, k: int = None) -> list:
+        """The k best-scoring entries: [{"part", "category", "steps", "score"}]."""
+        k = k or settings.RETRIEVAL_TOP_K
+        scores = self.scores(query)
+        hits = np.flatnonzero(scores > 0)
+        if hits.size == 0:
+            return []
+        if hits.size > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.lexsort((hits, -scores[hits]))]  # score desc, KB order on ties
+        return [{**self.entries[i], "score": round(float(scores[i]), 4)} for i in hits]
+
+    def part_scores(self, query: str) -> dict:
+        """{part name (lowercased): best score} for re-ranking other hit lists."""
+        scores = self.scores(query)
+        best = {}
+        for i in np.flatnonzero(scores > 0):
+            key = str(self.entries[i]["part"]).strip().lower()
+            best[key] = max(best.get(key, 0.0), float(scores[i]))
+        return best
+
+
+RETRIEVER = ManualRetriever(KB_PATH)
+
+
+def build_query(issues, dtc_codes=(), describe=None) -> str:
+    """
+    Retrieval query from the rule engine's issue text and the active DTCs.
+    Readings in parentheses are dropped; DTCs are expanded to their
+    descriptions via `describe(code)` when given.
+    """
+    if isinstance(issues, (list, tuple)):
+        issues = " ".join(map(str, issues))
+    parts = [re.sub(r"\([^)]*\)", " ", str(issues or ""))]
+    for code in dtc_codes or ():
+        code = str(code).upper()
+        parts.append(code)
+        description = describe(code) if describe is not None and _DTC.fullmatch(code) else ""
+        if description and not description.startswith("Unknown"):
+            parts.append(description)
+    return " ".join(parts)
+
+
+def top_k(query: str, k: int = None) -> list:
+    return RETRIEVER.top_k(query, k)
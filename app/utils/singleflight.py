@@ -0,0 +1,85 @@
+import time
+import json
+import asyncio
+import hashlib
+
+
+def input_fingerprint(payload: dict, ignore=("trace",)) -> str:
+    """Stable hash of a request body (keys in `ignore` don't change the result)."""
+    body = {k: v for k, v in payload.items() if k not in ignore}
+    raw = json.dumps(body, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key onto one execution.
+
+    The first caller (leader) starts `fn()` as its own task; callers arriving
+    while it runs await the same task. A finished result is reused for
+    `fresh_s` seconds. Errors reach every waiter but are never reused.
+    The task is shielded, so a disconnecting caller doesn't cancel the
+    run for the others.
+    """
+
+    def __init__(self, fresh_s: float, max_entries: int = 1024):
+        self.fresh_s = fresh_s
+        self.max_entries = max_entries
+        self._inflight = {}  # key -> asyncio.Task
+        self._recent = {}    # key -> (result, finished_at)
+        self.leaders = 0
+        self.coalesced = 0
+        self.fresh_hits = 0
+
+    async def do(self, key: str, fn):
+        """Returns (result, shared). `shared` is True when another call produced it."""
+        recent = self._recent.get(key)
+        if recent is not None:
+            if time.monotonic() - recent[1] < self.fresh_s:
+                self.fresh_hits += 1
+                return recent[0], True
+            del self._recent[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), True
+
+        self.leaders += 1
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task), False
+
+    def _finish(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None or self.fresh_s <= 0:
+            return
+        self._recent[key] = (task.result(), time.monotonic())
+        if len(self._recent) > self.max_entries:
+            self._prune()
+
+    def _prune(self):
+        now = time.monotonic()
+        for key in [k for k, (_, ts) in self._recent.items() if now - ts >= self.fresh_s]:
+            del self._recent[key]
+        # Still too many fresh entries: drop the oldest
+        while len(self._recent) > self.max_entries:
+            del self._recent[next(iter(self._recent))]
+
+    def forget(self, key: str = None):
+        """Drops the fresh result for one key (or all keys)."""
+        if key is None:
+            self._recent.clear()
+        else:
+            self._recent.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "fresh_entries": len(self._recent),
+            "fresh_s": self.fresh_s,
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "fresh_hits": self.fresh_hits,
+        }
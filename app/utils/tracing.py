@@ -0,0 +1,162 @@
+import time
+import uuid
+import random
+import bisect
+import threading
+import functools
+import inspect
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from app.config import settings
+
+# ==========================================
+# 📊 LATENCY HISTOGRAMS (always on, cheap)
+# ==========================================
+BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+
+class Histogram:
+    __slots__ = ("counts", "total_ms", "count", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.count = 0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.total_ms += ms
+        self.count += 1
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for i, c in enumerate(self.counts):
+            running += c
+            if running >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "max_ms": round(self.max_ms, 2),
+            "buckets": dict(zip([f"le_{b}" for b in BUCKETS_MS] + ["le_inf"], self.counts)),
+        }
+
+
+_HISTOGRAMS = {}
+_HIST_LOCK = threading.Lock()
+
+
+def observe(kind: str, name: str, ms: float):
+    key = f"{kind}:{name}"
+    hist = _HISTOGRAMS.get(key)
+    if hist is None:
+        with _HIST_LOCK:
+            hist = _HISTOGRAMS.setdefault(key, Histogram())
+    hist.observe(ms)
+
+
+def get_histograms() -> dict:
+    return {key: hist.summary() for key, hist in sorted(_HISTOGRAMS.items())}
+
+
+def reset_histograms():
+    with _HIST_LOCK:
+        _HISTOGRAMS.clear()
+
+# ==========================================
+# 🧵 PER-RUN TRACES (sampled)
+# ==========================================
+class Trace:
+    def __init__(self, run_id: str, sampled: bool):
+        self.run_id = run_id
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def add(self, kind: str, name: str, start: float, ms: float, attrs: dict):
+        if self.sampled:
+            self.spans.append({
+                "kind": kind,
+                "name": name,
+                "start_ms": round((start - self.started) * 1000, 2),
+                "duration_ms": round(ms, 2),
+                **attrs,
+            })
+
+    def to_dict(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def start_trace(run_id: str = None, sample: bool = None) -> Trace:
+    """Binds a run ID (and optional span collection) to the current context."""
+    if sample is None:
+        sample = settings.TRACE_SAMPLE_RATE > 0 and random.random() < settings.TRACE_SAMPLE_RATE
+    trace = Trace(run_id or uuid.uuid4().hex[:12], sample)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_run_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.run_id if trace else None
+
+
+@contextmanager
+def span(kind: str, name: str, **attrs):
+    """
+    Times a block. Always feeds the '<kind>:<name>' histogram; also records a
+    span on the current trace when that run is sampled.
+    """
+    if not settings.TRACING_ENABLED:
+        yield attrs
+        return
+
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except Exception as e:
+        attrs["error"] = e.__class__.__name__
+        raise
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        observe(kind, name, ms)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(kind, name, start, ms, attrs)
+
+
+def traced_node(name: str, fn):
+    """Wraps a graph node (sync or async) in a 'node:<name>' span."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state):
+            with span("node", name):
+                return await fn(state)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def sync_wrapper(state):
+        with span("node", name):
+            return fn(state)
+    return sync_wrapper
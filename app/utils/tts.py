@@ -0,0 +1,37 @@
+import time
+
+from app.config import settings
+from app.utils.tracing import span
+
+# One silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz, ~26 ms).
+# Header FF FB 90 00 followed by a zeroed payload decodes as silence.
+_SILENT_FRAME = b"\xff\xfb\x90\x00" + b"\x00" * 413
+_FRAMES_PER_SECOND = 38
+
+
+def _fake_tts(text: str, path: str):
+    """Offline stub: writes a silent MP3 roughly as long as the spoken text."""
+    from app.config.fake_llm import sample_latency, seeded_rng
+
+    time.sleep(sample_latency(settings.FAKE_TTS_LATENCY, seeded_rng(settings.FAKE_LLM_SEED, text)))
+    seconds = max(1, len(text.split()) * 0.4)
+    with open(path, "wb") as f:
+        f.write(_SILENT_FRAME * int(seconds * _FRAMES_PER_SECOND))
+
+
+def _gtts(text: str, path: str):
+    from gtts import gTTS  # network-bound, only imported when actually used
+
+    gTTS(text=text, lang="en", slow=False).save(path)
+
+
+def synthesize_speech(text: str, path: str):
+    """
+    Renders `text` to an MP3 at `path` (blocking).
+    Backend is chosen by TTS_BACKEND: 'gtts' (default) or 'fake' (offline).
+    """
+    with span("tts", settings.TTS_BACKEND, chars=len(text)):
+        if settings.TTS_BACKEND == "fake":
+            _fake_tts(text, path)
+        else:
+            _gtts(text, path)
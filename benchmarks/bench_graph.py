@@ -0,0 +1,142 @@
+"""
+End-to-end benchmark for the agent graph, fully offline.
+
+Uses the fake LLM + TTS backends and the local JSON data backend, so the
+numbers reflect the graph's own overhead plus a reproducible simulated
+LLM latency. Examples:
+
+    python benchmarks/bench_graph.py --runs 20 --concurrency 4
+    python benchmarks/bench_graph.py --latency fixed:0          # pure graph overhead
+    python benchmarks/bench_graph.py --sequential --no-cache    # old linear chain, no cache
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline agent graph benchmark")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per vehicle")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--vehicles", default="", help="Comma-separated IDs (default: all in collected_data.json)")
+    parser.add_argument("--latency", default="lognormal:800:0.35", help="Fake LLM latency spec")
+    parser.add_argument("--tts-latency", default="uniform:300:900", help="Fake TTS latency spec")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-cache", action="store_true", help="Disable the LLM response cache")
+    parser.add_argument("--sequential", action="store_true", help="Use the linear (non fan-out) graph")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def configure_env(args):
+    # Must happen before any app module reads app.config.settings
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "TTS_BACKEND": "fake",
+        "DATA_BACKEND": "local",
+        "FAKE_LLM_LATENCY": args.latency,
+        "FAKE_TTS_LATENCY": args.tts_latency,
+        "FAKE_LLM_SEED": str(args.seed),
+        "LLM_CACHE_ENABLED": "false" if args.no_cache else "true",
+        "LLM_CACHE_PATH": "",  # memory-only, so every benchmark starts cold
+    })
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def run_benchmark(args):
+    from app.agents.master import build_graph
+    from app.utils.audio_cache import AUDIO_RENDERER
+    from app.config.llm import get_fake_llm
+    from app.agents.prompting import get_prompt_totals
+    from app.data.repositories import DATA_FILE
+
+    # Keep benchmark audio out of the repo
+    AUDIO_RENDERER.audio_dir = tempfile.mkdtemp(prefix="bench_audio_")
+
+    graph = build_graph(parallel=not args.sequential)
+    fake_llm = get_fake_llm()
+
+    if args.vehicles:
+        vehicles = args.vehicles.split(",")
+    else:
+        with open(DATA_FILE, "r") as f:
+            vehicles = list(json.load(f).get("vehicles", {}))
+
+    jobs = [v for _ in range(args.runs) for v in vehicles]
+    limiter = asyncio.Semaphore(args.concurrency)
+    latencies = {}
+
+    async def one_run(vehicle_id):
+        async with limiter:
+            start = time.perf_counter()
+            result = await graph.ainvoke({"vehicle_id": vehicle_id, "error_message": None,
+                                          "ueba_alert_triggered": False})
+            latencies.setdefault(result.get("risk_level", "UNKNOWN"), []).append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_run(v) for v in jobs))
+    wall = time.perf_counter() - start
+
+    all_latencies = [x for values in latencies.values() for x in values]
+    return {
+        "runs": len(jobs),
+        "concurrency": args.concurrency,
+        "graph": "sequential" if args.sequential else "parallel",
+        "llm_cache": not args.no_cache,
+        "wall_seconds": round(wall, 3),
+        "runs_per_second": round(len(jobs) / wall, 2),
+        "llm_calls": fake_llm.calls,
+        "simulated_llm_seconds": round(fake_llm.simulated_seconds, 3),
+        "latency_ms": {
+            "mean": round(statistics.mean(all_latencies) * 1000, 1),
+            "p50": round(percentile(all_latencies, 50) * 1000, 1),
+            "p95": round(percentile(all_latencies, 95) * 1000, 1),
+        },
+        "latency_ms_by_risk": {
+            level: round(statistics.mean(values) * 1000, 1) for level, values in latencies.items()
+        },
+        "prompt_tokens": {
+            node: {"mean": t["tokens_mean"], "max": t["tokens_max"], "budget": t["budget"]}
+            for node, t in get_prompt_totals().items()
+        },
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_env(args)
+    report = asyncio.run(run_benchmark(args))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return report
+
+    print("\n" + "=" * 50)
+    print(f"⏱️  {report['runs']} runs | {report['graph']} graph | cache={'on' if report['llm_cache'] else 'off'} "
+          f"| concurrency {report['concurrency']}")
+    print(f"   Wall: {report['wall_seconds']}s ({report['runs_per_second']} runs/s)")
+    print(f"   Latency ms: mean {report['latency_ms']['mean']} | p50 {report['latency_ms']['p50']} "
+          f"| p95 {report['latency_ms']['p95']}")
+    print(f"   By risk level: {report['latency_ms_by_risk']}")
+    print(f"   LLM calls: {report['llm_calls']} (simulated {report['simulated_llm_seconds']}s)")
+    print(f"   Prompt tokens: {report['prompt_tokens']}")
+    print("=" * 50)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Knowledge-base lookup benchmark: the original per-call implementation (parse
+the JSON file, scan every symptom) against the in-memory index in
+app.utils.knowledge. Checks that both return the same entries first.
+
+    python benchmarks/bench_knowledge.py --iterations 200
+    python benchmarks/bench_knowledge.py --terms overheating,oil,P0217 --json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+# Terms the diagnosis node actually searches for, plus a spread of KB wording
+DEFAULT_TERMS = ["overheating", "oil", "P0217", "P0524", "P0300", "P0171",
+                 "brake", "coolant leak", "vibration", "AC", "noise", "warning light", "xyz"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Knowledge-base lookup benchmark")
+    parser.add_argument("--iterations", type=int, default=100, help="Repetitions of the whole term list")
+    parser.add_argument("--terms", default="", help="Comma-separated search terms")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def legacy_find_diagnosis_steps(symptom_keyword: str, kb_path: str):
+    """The implementation before the index: reload + linear scan on every call."""
+    with open(kb_path, "r") as f:
+        kb = json.load(f)
+    relevant_steps = []
+    for item in kb:
+        if any(symptom_keyword.lower() in s.lower() for s in item["symptoms"]):
+            relevant_steps.append({"part": item["subcategory"], "steps": item["diagnosis_steps"]})
+    return relevant_steps
+
+
+def timed(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"mean_ms": round(statistics.mean(samples), 4),
+            "p50_ms": round(statistics.median(samples), 4),
+            "max_ms": round(max(samples), 4)}
+
+
+def run_benchmark(args):
+    from app.utils import knowledge
+
+    terms = args.terms.split(",") if args.terms else DEFAULT_TERMS
+    index = knowledge.KnowledgeIndex(knowledge.KB_PATH)
+
+    mismatches = [t for t in terms
+                  if legacy_find_diagnosis_steps(t, knowledge.KB_PATH) != index.lookup_many([t])[t]]
+
+    cold_start = time.perf_counter()
+    cold = knowledge.KnowledgeIndex(knowledge.KB_PATH)
+    cold.lookup_many(terms)
+    cold_ms = (time.perf_counter() - cold_start) * 1000
+
+    legacy = timed(lambda: [legacy_find_diagnosis_steps(t, knowledge.KB_PATH) for t in terms], args.iterations)
+    per_term = timed(lambda: [index.lookup_many([t]) for t in terms], args.iterations)
+    bulk = timed(lambda: index.lookup_many(terms), args.iterations)
+
+    return {
+        "terms": len(terms),
+        "iterations": args.iterations,
+        "results_match": not mismatches,
+        "mismatched_terms": mismatches,
+        "hits": {t: len(h) for t, h in index.lookup_many(terms).items()},
+        "index_build_ms": round(cold_ms, 3),
+        "legacy_all_terms": legacy,
+        "indexed_per_term_calls": per_term,
+        "indexed_bulk": bulk,
+        "speedup_bulk": round(legacy["mean_ms"] / max(bulk["mean_ms"], 1e-6), 1),
+        "index": index.stats(),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_benchmark(args)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return report
+
+    print("\n" + "=" * 50)
+    print(f"📚 {report['terms']} terms x {report['iterations']} iterations "
+          f"| results match legacy: {report['results_match']}")
+    if report["mismatched_terms"]:
+        print(f"   ❌ Mismatched terms: {report['mismatched_terms']}")
+    print(f"   Index build (cold): {report['index_build_ms']} ms")
+    print(f"   Legacy (parse + scan per term): {report['legacy_all_terms']}")
+    print(f"   Index, one call per term:       {report['indexed_per_term_calls']}")
+    print(f"   Index, bulk lookup:             {report['indexed_bulk']}")
+    print(f"   Speedup (bulk vs legacy): {report['speedup_bulk']}x")
+    print("=" * 50)
+    return report
+
+
+if __name__ == "__main__":
+    main()
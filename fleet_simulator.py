@@ -5,8 +5,11 @@ import random
 from concurrent.futures import ThreadPoolExecutor
 
 # Configuration
-API_URL = "http://localhost:8000/api/predictive/run"
+API_BASE = "http://localhost:8000/api/predictive"
 CSV_FILE = "engine_data.csv"
+# Runs are queued (/jobs) and polled, so no request has to wait out the whole AI chain
+POLL_WAIT_S = 20      # server-side long-poll per status request
+MAX_WAIT_S = 300      # give up on a job after this long
 
 # 1. Load Data
 try:
@@ -51,20 +54,43 @@ def get_critical_payload(vehicle):
     }
 
 def send_request(vehicle):
-    """Sends ONE request to the AI Backend."""
+    """Submits ONE analysis job to the AI Backend and polls until it finishes."""
     try:
         data = get_critical_payload(vehicle)
-        
-        # Timeout = 60s to wait for AI Diagnosis
-        response = requests.post(API_URL, json=data, timeout=60)
-        
-        print(f"🔥 {vehicle['vehicle_id']} (Critical) -> Status {response.status_code} | "
+
+        # 1. Submit (returns immediately with a job ID)
+        response = requests.post(f"{API_BASE}/jobs", json=data, timeout=10)
+        if response.status_code == 503:
+            print(f"🚦 {vehicle['vehicle_id']} Rejected: queue full "
+                  f"(retry after {response.headers.get('Retry-After')}s)")
+            return
+        response.raise_for_status()
+        job = response.json()
+        print(f"📥 {vehicle['vehicle_id']} Queued as {job['job_id']} (position {job.get('queue_position')})")
+
+        # 2. Poll (each call holds at most POLL_WAIT_S on the server)
+        deadline = time.time() + MAX_WAIT_S
+        while time.time() < deadline:
+            status = requests.get(f"{API_BASE}/jobs/{job['job_id']}",
+                                  params={"wait": POLL_WAIT_S}, timeout=POLL_WAIT_S + 10).json()
+            if status["status"] in ("done", "failed"):
+                break
+        else:
+            print(f"❌ {vehicle['vehicle_id']} Still running after {MAX_WAIT_S}s (job {job['job_id']})")
+            return
+
+        if status["status"] == "failed":
+            print(f"❌ {vehicle['vehicle_id']} Job failed: {status['error']}")
+            return
+
+        print(f"🔥 {vehicle['vehicle_id']} (Critical) -> Done in {status.get('run_s')}s "
+              f"(queued {status.get('queued_s')}s) | "
               f"Temp={data['engine_temp_c']}°C | "
               f"Oil={data['oil_pressure_psi']} PSI | "
               f"Batt={data['battery_voltage']}V")
-        
+
     except requests.exceptions.Timeout:
-        print(f"❌ {vehicle['vehicle_id']} Timed Out (AI took too long)")
+        print(f"❌ {vehicle['vehicle_id']} Timed Out (API unreachable)")
     except Exception as e:
         print(f"❌ {vehicle['vehicle_id']} Failed: {e}")
 
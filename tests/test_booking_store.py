@@ -0,0 +1,108 @@
+import sys
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+# Add project root to python path so imports work
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.data.booking_store import BookingStore
+from app.domain.service_calendar import ServiceCalendar
+
+DAY = date(2030, 1, 7)
+START = datetime(2030, 1, 7)
+
+
+def _booking(vin, slot_time="09:00", bay=0, slot_date="2030-01-07", center="Main"):
+    return {"vin": vin, "center": center, "slot_date": slot_date, "slot_time": slot_time, "bay": bay,
+            "priority": "High"}
+
+
+def test_slot_can_only_be_booked_once():
+    store = BookingStore()
+    first = _booking("V-1")
+    assert store.insert(first)
+    assert first["booking_id"].startswith("BK-") and first["status"] == "CONFIRMED"
+    assert not store.insert(_booking("V-2"))  # same center / date / time / bay
+    assert store.insert(_booking("V-2", bay=1))
+    assert store.insert(_booking("V-3", center="North"))
+    assert store.stats() == {"CONFIRMED": 3}
+
+
+def test_cancelled_slot_can_be_booked_again():
+    store = BookingStore()
+    booking = _booking("V-1")
+    store.insert(booking)
+    assert store.cancel(booking["booking_id"])["status"] == "CANCELLED"
+    assert store.cancel(booking["booking_id"]) is None  # already cancelled
+    assert store.insert(_booking("V-2"))
+    assert [b["vin"] for b in store.on_date("2030-01-07")] == ["V-2"]
+    assert len(store.for_vehicle("V-1", include_cancelled=True)) == 1
+
+
+def test_queries_by_vehicle_and_date():
+    store = BookingStore()
+    for i, day in enumerate(("2030-01-08", "2030-01-07", "2030-01-09")):
+        store.insert(_booking("V-1", slot_date=day))
+        store.insert(_booking(f"V-{i + 2}", slot_date=day, slot_time="10:00"))
+    assert [b["slot_date"] for b in store.for_vehicle("V-1")] == ["2030-01-07", "2030-01-08", "2030-01-09"]
+    assert [(b["vin"], b["slot_time"]) for b in store.on_date("2030-01-07")] == [("V-1", "09:00"), ("V-3", "10:00")]
+    assert store.on_date("2030-01-07", center="North") == []
+    plan = store._db.execute("EXPLAIN QUERY PLAN SELECT * FROM bookings WHERE vin = ?", ("V-1",)).fetchall()
+    assert "idx_bookings_vin" in " ".join(str(tuple(row)) for row in plan)
+
+
+def test_claim_next_skips_slots_booked_by_another_worker(tmp_path):
+    path = str(tmp_path / "bookings.sqlite")
+    worker_a, worker_b = BookingStore(path), BookingStore(path)
+    calendar_a, calendar_b = ServiceCalendar(9, 18, 1), ServiceCalendar(9, 18, 1)
+
+    first = worker_a.claim_next({"vin": "V-1", "center": "Main"}, calendar_a, START, 30)
+    # Worker B's calendar doesn't know about 09:00; the store refuses it and B moves on
+    second = worker_b.claim_next({"vin": "V-2", "center": "Main"}, calendar_b, START, 30)
+    assert (first["slot_date"], first["slot_time"]) == ("2030-01-07", "09:00")
+    assert (second["slot_date"], second["slot_time"]) == ("2030-01-07", "10:00")
+    assert not calendar_b.is_free(DAY, 9)
+
+
+def test_hydrate_marks_upcoming_bookings():
+    store = BookingStore()
+    store.insert(_booking("V-1", slot_time="09:00"))
+    store.insert(_booking("V-2", slot_time="10:00", bay=1))
+    store.insert(_booking("V-3", slot_date="2029-12-31"))  # in the past
+    store.insert(_booking("V-4", center="Closed"))  # center no longer configured
+    calendar = ServiceCalendar(9, 18, 2)
+    assert store.hydrate({"Main": calendar}, today=DAY) == 2
+    assert calendar.free_bays(DAY, 9) == [1]
+    assert calendar.free_bays(DAY, 10) == [0]
+
+
+def test_concurrent_bookings_never_double_allocate(tmp_path):
+    # Four "API workers" (own store connection + own calendar) share one file
+    path = str(tmp_path / "bookings.sqlite")
+    workers = [(BookingStore(path), ServiceCalendar(9, 18, 2)) for _ in range(4)]
+    results = []
+    lock = threading.Lock()
+
+    def book(store, calendar, worker_id):
+        mine = [store.claim_next({"vin": f"V-{worker_id}-{i}", "center": "Main"}, calendar, START, 365)
+                for i in range(60)]
+        with lock:
+            results.extend(mine)
+
+    threads = [threading.Thread(target=book, args=(store, calendar, n))
+               for n, (store, calendar) in enumerate(workers) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(results) == 480 and all(results)
+    slots = {(b["center"], b["slot_date"], b["slot_time"], b["bay"]) for b in results}
+    assert len(slots) == 480
+    assert len({b["booking_id"] for b in results}) == 480
+    assert workers[0][0].stats() == {"CONFIRMED": 480}
+    # No holes: 480 bookings at 18 slots a day fill the first 26 days completely
+    days = {b["slot_date"] for b in results}
+    assert min(days) == "2030-01-07"
+    assert len(workers[0][0].on_date((DAY + timedelta(days=25)).isoformat())) == 18
@@ -0,0 +1,22 @@
+import sys
+import os
+
+# Add project root to python path so imports work
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.domain import mapping
+from app.domain.mapping import describe_codes
+
+
+def test_catalog_codes_keep_catalog_severity():
+    entry, = describe_codes(["p0217 "])
+    assert entry == {"code": "P0217", "description": "Engine Coolant Over Temperature Condition",
+                     "system": "Fuel & Air Metering", "severity": "critical", "known": True}
+
+
+def test_mapping_only_codes_are_known(monkeypatch):
+    monkeypatch.setitem(mapping.DTC_MAPPING, "P2FFE", "Fleet Telematics Unit Fault")
+    known, unknown = describe_codes(["P2FFE", "P2FFF"])
+    assert known["known"] and known["severity"] == mapping.MAPPING_DEFAULT_SEVERITY
+    assert known["description"] == "Fleet Telematics Unit Fault" and known["system"] != "Unknown"
+    assert not unknown["known"] and unknown["severity"] is None
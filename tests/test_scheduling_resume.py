@@ -0,0 +1,53 @@
+import sys
+import os
+import sqlite3
+
+# Add project root to python path so imports work
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.agents.nodes.scheduling import scheduling_node, SchedulerService
+from app.data.booking_store import BOOKING_STORE, BookingStore
+from app.utils.tracing import start_trace
+
+
+def test_resumed_run_reuses_its_booking():
+    state = {"vehicle_id": "V-RESUME-1", "priority_level": "Critical"}
+    start_trace(run_id="run-resume-1")
+    first = scheduling_node(state)
+    # resume_analysis binds the same run ID and executes the scheduling node again
+    start_trace(run_id="run-resume-1")
+    second = scheduling_node(state)
+    assert first["booking_status"] == second["booking_status"] == "CONFIRMED"
+    assert (second["booking_id"], second["selected_slot"]) == (first["booking_id"], first["selected_slot"])
+    assert len(BOOKING_STORE.for_vehicle("V-RESUME-1")) == 1
+
+
+def test_other_runs_still_book():
+    state = {"vehicle_id": "V-RESUME-2", "priority_level": "Critical"}
+    start_trace(run_id="run-resume-2")
+    first = scheduling_node(state)
+    start_trace(run_id="run-resume-3")
+    second = scheduling_node(state)
+    assert first["booking_id"] != second["booking_id"]
+    # Once cancelled, the run's booking is no longer reused
+    SchedulerService.cancel_booking(second["booking_id"])
+    assert SchedulerService.book_slot("V-RESUME-2", "Critical", run_id="run-resume-3")["booking_id"] \
+        not in (first["booking_id"], second["booking_id"])
+
+
+def test_old_booking_files_gain_the_run_column(tmp_path):
+    path = str(tmp_path / "bookings.sqlite")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE bookings (booking_id TEXT PRIMARY KEY, vin TEXT NOT NULL, center TEXT NOT NULL,"
+               " slot_date TEXT NOT NULL, slot_time TEXT NOT NULL, bay INTEGER NOT NULL, service_type TEXT,"
+               " priority TEXT, status TEXT NOT NULL, notes TEXT, timestamp TEXT)")
+    db.execute("INSERT INTO bookings VALUES ('BK-OLD', 'V-1', 'Main', '2030-01-07', '09:00', 0,"
+               " NULL, 'High', 'CONFIRMED', NULL, NULL)")
+    db.commit()
+    db.close()
+
+    store = BookingStore(path)
+    assert store.get("BK-OLD")["run_id"] is None
+    assert store.insert({"vin": "V-2", "center": "Main", "slot_date": "2030-01-07", "slot_time": "10:00",
+                         "bay": 0, "run_id": "run-1"})
+    assert store.for_run("run-1")["vin"] == "V-2"
@@ -0,0 +1,142 @@
+import sys
+import os
+import random
+import threading
+from datetime import date, datetime, timedelta
+
+import pytest
+
+# Add project root to python path so imports work
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.domain.service_calendar import ServiceCalendar
+
+DAY = date(2030, 1, 7)
+START = datetime(2030, 1, 7)
+
+
+def test_claim_and_release_single_slot():
+    cal = ServiceCalendar(open_hour=9, close_hour=18, bays=1)
+    assert cal.is_free(DAY, 9)
+    assert cal.claim(DAY, 9) == 0
+    assert not cal.is_free(DAY, 9)
+    assert cal.claim(DAY, 9) is None  # already taken
+    assert cal.release(DAY, 9)
+    assert not cal.release(DAY, 9)  # releasing twice is a no-op
+    assert cal.is_free(DAY, 9)
+    assert cal.stats()["days_with_bookings"] == 0
+
+
+def test_claim_picks_first_free_bay():
+    cal = ServiceCalendar(bays=3)
+    assert [cal.claim(DAY, 10) for _ in range(4)] == [0, 1, 2, None]
+    cal.release(DAY, 10, bay=1)
+    assert cal.free_bays(DAY, 10) == [1]
+    assert cal.claim(DAY, 10) == 1
+    assert cal.claim(DAY, 11, bay=2) == 2
+    assert cal.free_bays(DAY, 11) == [0, 1]
+
+
+def test_rejects_slots_outside_opening_hours():
+    cal = ServiceCalendar(open_hour=9, close_hour=18, bays=2)
+    with pytest.raises(ValueError):
+        cal.claim(DAY, 18)
+    with pytest.raises(ValueError):
+        cal.claim(DAY, 8)
+    with pytest.raises(ValueError):
+        cal.claim(DAY, 9, bay=2)
+
+
+def test_next_free_skips_taken_slots_and_full_days():
+    cal = ServiceCalendar(open_hour=9, close_hour=12, bays=1)
+    for hour in (9, 10, 11):
+        cal.claim(DAY, hour)
+    cal.claim(DAY + timedelta(days=1), 9)
+    assert cal.next_free(START) == (DAY + timedelta(days=1), 10, 0)
+
+
+def test_next_free_ignores_slots_that_already_started():
+    cal = ServiceCalendar(open_hour=9, close_hour=18)
+    assert cal.next_free(START.replace(hour=10)) == (DAY, 10, 0)
+    assert cal.next_free(START.replace(hour=10, minute=1)) == (DAY, 11, 0)
+    assert cal.next_free(START.replace(hour=17, minute=30)) == (DAY + timedelta(days=1), 9, 0)
+    assert cal.next_free(START.replace(hour=6)) == (DAY, 9, 0)
+
+
+def test_next_free_respects_horizon():
+    cal = ServiceCalendar(open_hour=9, close_hour=10)
+    for offset in range(30):
+        cal.claim(DAY + timedelta(days=offset), 9)
+    assert cal.next_free(START, horizon_days=30) is None
+    assert cal.next_free(START, horizon_days=31) == (DAY + timedelta(days=30), 9, 0)
+    assert cal.claim_next(START, horizon_days=30) is None
+
+
+def test_matches_brute_force_under_thousands_of_bookings():
+    rng = random.Random(7)
+    cal = ServiceCalendar(open_hour=8, close_hour=20, bays=3)
+    taken = set()  # (ordinal, hour, bay) reference model
+
+    def reference_next(after):
+        from_hour = after.hour + (1 if after.minute else 0)
+        for offset in range(120):
+            ordinal = after.date().toordinal() + offset
+            for hour in range(8, 20):
+                if offset == 0 and hour < from_hour:
+                    continue
+                for bay in range(3):
+                    if (ordinal, hour, bay) not in taken:
+                        return date.fromordinal(ordinal), hour, bay
+        return None
+
+    for _ in range(5000):
+        day = DAY + timedelta(days=rng.randrange(60))
+        hour = rng.randrange(8, 20)
+        bay = rng.randrange(3)
+        key = (day.toordinal(), hour, bay)
+        if rng.random() < 0.8:
+            assert (cal.claim(day, hour, bay) is not None) == (key not in taken)
+            taken.add(key)
+        else:
+            assert cal.release(day, hour, bay) == (key in taken)
+            taken.discard(key)
+
+    for _ in range(300):
+        after = START + timedelta(days=rng.randrange(70), hours=rng.randrange(24), minutes=rng.choice((0, 30)))
+        assert cal.next_free(after, horizon_days=120) == reference_next(after)
+
+    for day_offset in range(60):
+        day = DAY + timedelta(days=day_offset)
+        expected = sum(1 for (o, _, _) in taken if o == day.toordinal())
+        assert cal.day_load(day) == expected
+
+
+def test_claim_next_fills_calendar_in_time_order():
+    cal = ServiceCalendar(open_hour=9, close_hour=18, bays=2)
+    slots = [cal.claim_next(START) for _ in range(18 * 5)]
+    expected = [(DAY + timedelta(days=d), h, b) for d in range(5) for h in range(9, 18) for b in range(2)]
+    assert slots == expected
+    assert cal.stats()["full_days"] == 5
+
+
+def test_concurrent_claim_next_never_double_books():
+    cal = ServiceCalendar(open_hour=9, close_hour=18, bays=4)
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        mine = [cal.claim_next(START, horizon_days=365) for _ in range(250)]
+        with lock:
+            results.extend(mine)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(results) == 2000
+    assert len(set(results)) == 2000
+    assert cal.stats()["slots_taken"] == 2000
+    # 2000 bookings at 36 slots per day fill the first 55 days completely
+    assert cal.stats()["full_days"] == 2000 // 36
@@ -0,0 +1,289 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+from multiprocessing import get_context, shared_memory
+
+# Configuration
+DEFAULT_DATA = "engine_data.csv"
+DEFAULT_LABEL = "Engine Condition"
+CACHE_DIR = os.path.join("data_samples", ".feature_cache")
+
+# Hyperparameter grid used when --grid is not given
+DEFAULT_GRID = {
+    "lr": [0.05, 0.2],
+    "l2": [0.0, 0.01],
+    "epochs": [200],
+}
+
+# ==========================================
+# 1. FEATURE MATRIX (Cached as .npy)
+# ==========================================
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of the source file, streamed so large archives don't load twice."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def parse_source(path, label):
+    """
+    Reads engine_data.csv or an exported telemetry archive (.json / .jsonl)
+    and returns a float64 matrix with the label as the LAST column.
+    """
+    if path.endswith(".jsonl"):
+        df = pd.read_json(path, lines=True)
+    elif path.endswith(".json"):
+        with open(path, "r") as f:
+            raw = json.load(f)
+        # Archives are either a list of rows or {"vehicle_id": row}
+        rows = list(raw.values()) if isinstance(raw, dict) else raw
+        df = pd.json_normalize(rows)
+    else:
+        df = pd.read_csv(path)
+
+    if label not in df.columns:
+        raise ValueError(f"Label column '{label}' not found in {path}")
+
+    features = df.drop(columns=[label]).select_dtypes(include="number")
+    matrix = np.column_stack([features.to_numpy(dtype=np.float64),
+                              df[label].to_numpy(dtype=np.float64)])
+    # Drop rows with missing sensor values
+    matrix = matrix[~np.isnan(matrix).any(axis=1)]
+    return np.ascontiguousarray(matrix), list(features.columns)
+
+def load_feature_matrix(path, label, cache_dir=CACHE_DIR):
+    """
+    Returns (matrix, columns, cache_hit). The parsed matrix is cached as
+    '<name>-<sha256>.npy' so re-runs on an unchanged file skip parsing.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    key = f"{os.path.splitext(os.path.basename(path))[0]}-{file_hash(path)[:16]}"
+    npy_path = os.path.join(cache_dir, f"{key}.npy")
+    meta_path = os.path.join(cache_dir, f"{key}.json")
+
+    if os.path.exists(npy_path) and os.path.exists(meta_path):
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        if meta.get("label") == label:
+            return np.load(npy_path), meta["columns"], True
+
+    matrix, columns = parse_source(path, label)
+
+    # Write to a temp name first so a crash never leaves a half-written cache
+    tmp_path = npy_path + ".tmp.npy"
+    np.save(tmp_path, matrix)
+    os.replace(tmp_path, npy_path)
+    with open(meta_path, "w") as f:
+        json.dump({"source": path, "label": label, "columns": columns}, f)
+
+    return matrix, columns, False
+
+# ==========================================
+# 2. MODEL (Logistic Regression, NumPy only)
+# ==========================================
+def train_logistic(X, y, lr, l2, epochs):
+    w = np.zeros(X.shape[1])
+    b = 0.0
+    n = len(y)
+    for _ in range(int(epochs)):
+        p = 1.0 / (1.0 + np.exp(-(X @ w + b)))
+        err = p - y
+        w -= lr * ((X.T @ err) / n + l2 * w)
+        b -= lr * err.mean()
+    return w, b
+
+def score_fold(matrix, folds, fold, params):
+    """Trains on every fold except `fold` and returns metrics on `fold`."""
+    test_mask = folds == fold
+    X, y = matrix[:, :-1], matrix[:, -1]
+
+    # Standardise with train-fold statistics only (no leakage)
+    mean = X[~test_mask].mean(axis=0)
+    std = X[~test_mask].std(axis=0)
+    std[std == 0] = 1.0
+    Xs = (X - mean) / std
+
+    w, b = train_logistic(Xs[~test_mask], y[~test_mask], **params)
+    pred = (Xs[test_mask] @ w + b) > 0
+    truth = y[test_mask] > 0.5
+
+    tp = int(np.sum(pred & truth))
+    fp = int(np.sum(pred & ~truth))
+    fn = int(np.sum(~pred & truth))
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+    return {
+        "fold": int(fold),
+        "accuracy": round(float(np.mean(pred == truth)), 4),
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(f1, 4),
+    }
+
+# ==========================================
+# 3. PROCESS POOL (Shared-Memory Arrays)
+# ==========================================
+# Each worker attaches to the shared blocks once, in the initializer,
+# so tasks only carry (params, fold) instead of a pickled copy of the data.
+_WORKER = {}
+
+def _attach(spec):
+    shm = shared_memory.SharedMemory(name=spec["name"])
+    return shm, np.ndarray(spec["shape"], dtype=spec["dtype"], buffer=shm.buf)
+
+def _init_worker(matrix_spec, folds_spec):
+    _WORKER["matrix_shm"], _WORKER["matrix"] = _attach(matrix_spec)
+    _WORKER["folds_shm"], _WORKER["folds"] = _attach(folds_spec)
+
+def _run_task(task):
+    params, fold = task
+    start = time.perf_counter()
+    result = score_fold(_WORKER["matrix"], _WORKER["folds"], fold, params)
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return params, result
+
+def _share(array):
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[:] = array
+    return shm, {"name": shm.name, "shape": array.shape, "dtype": array.dtype.str}
+
+def run_parallel(matrix, folds, tasks, workers):
+    matrix_shm, matrix_spec = _share(matrix)
+    folds_shm, folds_spec = _share(folds)
+    try:
+        ctx = get_context()
+        with ctx.Pool(workers, initializer=_init_worker,
+                      initargs=(matrix_spec, folds_spec)) as pool:
+            return pool.map(_run_task, tasks, chunksize=1)
+    finally:
+        for shm in (matrix_shm, folds_shm):
+            shm.close()
+            shm.unlink()
+
+def run_serial(matrix, folds, tasks):
+    _WORKER["matrix"], _WORKER["folds"] = matrix, folds
+    try:
+        return [_run_task(task) for task in tasks]
+    finally:
+        _WORKER.clear()
+
+# ==========================================
+# 4. CLI
+# ==========================================
+def parse_grid(spec):
+    """'lr=0.05,0.2;l2=0,0.01;epochs=200' -> {'lr': [0.05, 0.2], ...}"""
+    if not spec:
+        return DEFAULT_GRID
+    grid = {}
+    for part in spec.split(";"):
+        name, values = part.split("=")
+        grid[name.strip()] = [float(v) for v in values.split(",")]
+    return grid
+
+def summarise(results):
+    """Groups fold results by parameter set and averages the metrics."""
+    grouped = {}
+    for params, fold_result in results:
+        grouped.setdefault(json.dumps(params, sort_keys=True), []).append(fold_result)
+
+    summary = []
+    for key, folds in grouped.items():
+        folds.sort(key=lambda r: r["fold"])
+        summary.append({
+            "params": json.loads(key),
+            "mean_f1": round(float(np.mean([r["f1"] for r in folds])), 4),
+            "mean_accuracy": round(float(np.mean([r["accuracy"] for r in folds])), 4),
+            "folds": folds,
+        })
+    return sorted(summary, key=lambda s: s["mean_f1"], reverse=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validated failure model training")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="CSV or exported telemetry archive (.json/.jsonl)")
+    parser.add_argument("--label", default=DEFAULT_LABEL)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--grid", default="", help="e.g. 'lr=0.05,0.2;l2=0,0.01;epochs=200'")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compare-serial", action="store_true", help="Also run serially and report speedup")
+    parser.add_argument("--output", default="", help="Optional path for the JSON report")
+    args = parser.parse_args(argv)
+
+    # 1. Load (or reuse) the feature matrix
+    start = time.perf_counter()
+    matrix, columns, cache_hit = load_feature_matrix(args.data, args.label, args.cache_dir)
+    load_seconds = time.perf_counter() - start
+    print(f"📂 {args.data}: {matrix.shape[0]} rows x {len(columns)} features "
+          f"({'cache hit' if cache_hit else 'parsed + cached'}, {load_seconds:.2f}s)")
+
+    # 2. Fold assignment + task list (every param set x every fold)
+    rng = np.random.default_rng(args.seed)
+    folds = (rng.permutation(matrix.shape[0]) % args.folds).astype(np.int32)
+    grid = parse_grid(args.grid)
+    param_sets = [dict(zip(grid, combo)) for combo in itertools.product(*grid.values())]
+    tasks = [(params, fold) for params in param_sets for fold in range(args.folds)]
+    print(f"🧪 {len(param_sets)} parameter sets x {args.folds} folds = {len(tasks)} tasks on {args.workers} workers")
+
+    # 3. Parallel run
+    start = time.perf_counter()
+    results = run_parallel(matrix, folds, tasks, args.workers)
+    parallel_seconds = time.perf_counter() - start
+
+    report = {
+        "data": args.data,
+        "rows": int(matrix.shape[0]),
+        "features": columns,
+        "cache_hit": cache_hit,
+        "load_seconds": round(load_seconds, 3),
+        "parallel": {
+            "workers": args.workers,
+            "wall_seconds": round(parallel_seconds, 3),
+            "tasks_per_second": round(len(tasks) / parallel_seconds, 2),
+        },
+        "results": summarise(results),
+    }
+
+    # 4. Optional serial baseline for the throughput comparison
+    if args.compare_serial:
+        start = time.perf_counter()
+        run_serial(matrix, folds, tasks)
+        serial_seconds = time.perf_counter() - start
+        report["serial"] = {
+            "wall_seconds": round(serial_seconds, 3),
+            "tasks_per_second": round(len(tasks) / serial_seconds, 2),
+        }
+        report["speedup"] = round(serial_seconds / parallel_seconds, 2)
+
+    # 5. Print summary
+    for entry in report["results"]:
+        print(f"   {entry['params']} -> F1 {entry['mean_f1']} | Acc {entry['mean_accuracy']}")
+        for fold in entry["folds"]:
+            print(f"      fold {fold['fold']}: acc={fold['accuracy']} f1={fold['f1']} ({fold['seconds']}s)")
+
+    print(f"⏱️  Parallel: {report['parallel']['wall_seconds']}s "
+          f"({report['parallel']['tasks_per_second']} tasks/s)")
+    if args.compare_serial:
+        print(f"⏱️  Serial:   {report['serial']['wall_seconds']}s "
+              f"({report['serial']['tasks_per_second']} tasks/s) | Speedup x{report['speedup']}")
+    print(f"🏆 Best: {report['results'][0]['params']} (F1 {report['results'][0]['mean_f1']})")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report saved to: {args.output}")
+
+    return report
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)